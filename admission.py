@@ -0,0 +1,192 @@
+"""
+Admission Control and Backpressure
+Without a limit every caller pushes work until the server's queue is so long that all
+of them time out together. The shared client asks the controller before sending
+anything upstream:
+
+- Token buckets per model, refilled at `tokens_per_second`, where a request costs its
+  estimated tokens (prompt + expected output). A request that would have to wait longer
+  than `max_wait_s` for tokens is rejected instead of queued.
+- Queue-length shedding: when more than `max_queued[class]` requests of that priority
+  class already wait in the scheduler for the model, new ones fail at once.
+- Both rejections raise ServerBusyError immediately, so callers can degrade (skip a
+  report, answer from cache, retry later) while the admitted requests still finish.
+- Estimates are corrected with the real token counts from the response.
+
+All limits live in one file, admission.json (or the file named by
+OLLAMA_ADMISSION_CONFIG):
+
+    from admission import controller, ServerBusyError
+
+    try:
+        text = client.generate("llama3", prompt)["response"]
+    except ServerBusyError:
+        text = "(busy, try again later)"
+    print(controller.stats)
+"""
+import json
+import os
+import threading
+import time
+
+from scheduler import PRIORITY_NAMES, scheduler as default_scheduler
+from tokencount import count_prompt_tokens
+
+# --- 1. Configuration ---
+CONFIG_PATH = os.environ.get("OLLAMA_ADMISSION_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "admission.json"))
+DEFAULT_CONFIG = {
+    "default": {"tokens_per_second": 2000, "burst": 8000},
+    "models": {},
+    "max_wait_s": 2.0,
+    "max_queued": {"interactive": 32, "batch": 256},
+    "default_output_tokens": 256,
+}
+
+
+class ServerBusyError(Exception):
+    """The request was rejected up front because the model is over its rate or queue limit."""
+
+
+def load_config(path: str = CONFIG_PATH) -> dict:
+    """DEFAULT_CONFIG overlaid with the JSON file at `path` (if it exists)."""
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for key, value in json.load(f).items():
+                if isinstance(value, dict) and isinstance(config.get(key), dict):
+                    config[key].update(value)
+                else:
+                    config[key] = value
+    return config
+
+
+# --- 2. Token Buckets ---
+class TokenBucket:
+    def __init__(self, tokens_per_second: float, burst: float):
+        self.rate = tokens_per_second
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float, max_wait_s: float):
+        """
+        Takes `cost` tokens and returns how long the caller must wait before sending, or None
+        (taking nothing) if that would be longer than `max_wait_s`.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            # A request larger than the whole bucket only needs a full bucket.
+            wait = (min(cost, self.burst) - self.tokens) / self.rate if self.tokens < min(cost, self.burst) else 0.0
+            if wait > max_wait_s:
+                return None
+            self.tokens -= cost
+            return wait
+
+    def adjust(self, tokens: float):
+        """Charges (or refunds, if negative) the difference between real and estimated cost."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.burst, self.tokens - tokens)
+
+
+# --- 3. Cost Estimates ---
+def actual_tokens(response: dict):
+    """Prompt + generated tokens reported by Ollama, or None if the response has no counts."""
+    if "prompt_eval_count" not in response and "eval_count" not in response:
+        return None
+    return response.get("prompt_eval_count", 0) + response.get("eval_count", 0)
+
+
+# --- 4. Controller ---
+class AdmissionController:
+    def __init__(self, config=None, scheduler=None):
+        self.config = config if config is not None else load_config()
+        self.scheduler = scheduler
+        self.stats = {"admitted": 0, "throttled": 0, "shed_rate": 0, "shed_queue": 0}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, model: str) -> TokenBucket:
+        with self._lock:
+            if model not in self._buckets:
+                limits = {**self.config["default"], **self.config["models"].get(model, {})}
+                self._buckets[model] = TokenBucket(limits["tokens_per_second"], limits["burst"])
+            return self._buckets[model]
+
+    def estimate(self, path: str, payload: dict) -> int:
+        """Estimated tokens for one request: counted prompt tokens + expected output."""
+        prompt_tokens = count_prompt_tokens(path, payload)
+        if path == "/api/embed":
+            return prompt_tokens
+        num_predict = (payload.get("options") or {}).get("num_predict")
+        output = num_predict if num_predict is not None and num_predict >= 0 else self.config["default_output_tokens"]
+        return prompt_tokens + output
+
+    def admit(self, path: str, payload: dict, priority: int, max_wait_s=None) -> int:
+        """
+        Blocks for at most `max_wait_s` until `payload` may be sent, or raises ServerBusyError.
+        Returns the estimated cost, to be passed to settle() with the response.
+        """
+        model = payload["model"]
+        max_queued = self.config["max_queued"].get(PRIORITY_NAMES[priority])
+        if max_queued is not None and self.scheduler is not None and self.scheduler.queued(model, priority) >= max_queued:
+            self.stats["shed_queue"] += 1
+            raise ServerBusyError(f"{model} is busy: {max_queued} {PRIORITY_NAMES[priority]} requests already queued")
+
+        cost = self.estimate(path, payload)
+        limit = self.config["max_wait_s"] if max_wait_s is None else min(max_wait_s, self.config["max_wait_s"])
+        wait = self._bucket(model).reserve(cost, limit)
+        if wait is None:
+            self.stats["shed_rate"] += 1
+            raise ServerBusyError(f"{model} is busy: over its token rate (request needs ~{cost} tokens)")
+        if wait > 0:
+            self.stats["throttled"] += 1
+            time.sleep(wait)
+        self.stats["admitted"] += 1
+        return cost
+
+    def settle(self, model: str, estimated: int, response: dict):
+        """Corrects the model's bucket with the real token count once the response is complete."""
+        actual = actual_tokens(response or {})
+        if actual is not None:
+            self._bucket(model).adjust(actual - estimated)
+
+
+# Shared instance used by ollamaclient
+controller = AdmissionController(scheduler=default_scheduler)
+
+
+if __name__ == "__main__":
+    # Overload a slow fake server and watch the excess fail fast instead of timing out.
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fakeollama import start_fake_servers
+    from loadbalancer import LoadBalancer
+    from ollamaclient import OllamaClient
+
+    servers = start_fake_servers(1, delay_s=0.5)
+    config = load_config()
+    config["models"]["llama3"] = {"tokens_per_second": 400, "burst": 1200}
+    demo = OllamaClient(balancer=LoadBalancer([servers[0].url]), coalesce=False,
+                        admission=AdmissionController(config, scheduler=controller.scheduler))
+
+    def call(i):
+        start = time.perf_counter()
+        try:
+            demo.generate("llama3", f"Question {i}", options={"num_predict": 100})
+            return "ok", time.perf_counter() - start
+        except ServerBusyError:
+            return "busy", time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=40) as pool:
+        results = list(pool.map(call, range(40)))
+    for outcome in ("ok", "busy"):
+        times = [t for o, t in results if o == outcome]
+        if times:
+            print(f"{outcome:>4}: {len(times):2d} requests, slowest {max(times):.2f}s")
+    print(demo.admission.stats)
@@ -0,0 +1,68 @@
+"""
+Agent Prefill Benchmark
+Compares the prompt-eval (prefill) tokens of the ReAct and tool-use agents' follow-up
+step when it pastes the first answer back into a new prompt versus when it continues
+from the `context` returned by /api/generate. The first step is the same call in both
+modes (its prefill only depends on what the previous query left in the prompt cache), so
+only the follow-up step is compared.
+
+    python agentbench.py               # against OLLAMA_ENDPOINTS / OLLAMA_HOST
+    python agentbench.py --fake        # against a local fakeollama.py server
+"""
+import argparse
+import contextlib
+import io
+import os
+
+QUERIES = {
+    "react": ["What is 234 * 89?", "What is 1024 / 16?", "What is 17 + 58 * 3?"],
+    "tooluse": ["What is the weather in Bangalore today?", "Is it humid in Mumbai?", "Weather in Delhi please"],
+}
+
+
+def fake_reply(prompt: str) -> str:
+    """Scripted answers so the agents take their tool step against the fake server."""
+    if "calculator[" in prompt:
+        return "Thought: I should multiply the numbers.\nAction: calculator[234 * 89]"
+    if "weather[" in prompt:
+        return "Action: weather[Bangalore]"
+    return "The final answer, based on the observation, is above."
+
+
+def run(agent, queries, continue_context: bool) -> int:
+    """Follow-up step prefill tokens, summed over `queries`."""
+    total = 0
+    for query in queries:
+        prefill = []
+        with contextlib.redirect_stdout(io.StringIO()):  # the agents print every step
+            agent(query, continue_context=continue_context, prefill=prefill)
+        total += sum(tokens or 0 for tokens in prefill[1:])
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fake", action="store_true", help="start and use a fakeollama.py server")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        from fakeollama import start_fake_servers
+        server = start_fake_servers(1)[0]
+        server.reply = fake_reply
+        os.environ["OLLAMA_ENDPOINTS"] = server.url  # read when the client is imported
+
+    import react
+    import tooluse
+    agents = {"react": react.react, "tooluse": tooluse.agent_weather}
+
+    print(f"{'agent':<8} {'paste-back':>11} {'context':>8} {'saved':>7}")
+    for name, agent in agents.items():
+        run(agent, QUERIES[name][:1], True)  # warm-up, so both modes see a loaded model
+        paste_back, context = (run(agent, QUERIES[name], continue_context) / len(QUERIES[name])
+                               for continue_context in (False, True))
+        print(f"{name:<8} {paste_back:>11.0f} {context:>8.0f} {1 - context / paste_back:>7.0%}")
+    print("(mean prompt-eval tokens of the follow-up step per query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 from openai import OpenAI
 import logging
+from loadbalancer import balancer
 log = logging.getLogger(OpenAI.__module__)
 log.setLevel(logging.DEBUG)
 log.addHandler(logging.StreamHandler())
-client = OpenAI(base_url='http://localhost:11434/v1/',api_key='ollama') # Placeholder API key for Ollama)
+client = OpenAI(base_url=f'{balancer.pick_url()}/v1/',api_key='ollama') # Placeholder API key for Ollama; replica chosen by loadbalancer.py
 
 chat_completion = client.chat.completions.create(messages=[{'role': 'user','content': 'Explain the concept of quantum entanglement.'}],model='llama3')                                              # Use the name of the model pulled with Ollama)
 
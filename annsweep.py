@@ -0,0 +1,86 @@
+"""
+ANN Parameter Sweep
+Builds flat, IVF and HNSW indexes (vectorindex.py) over the same vectors and reports,
+for each nprobe / ef_search value, recall@k against exact flat search and the mean
+query latency - the numbers needed to pick the index and tunables for a latency budget.
+
+    python annsweep.py                          # synthetic clustered vectors, 768 dims
+    python annsweep.py --n 1000000 --k 10 --kinds ivf
+    python annsweep.py --vectors embeddings.npy # real embeddings (float32, one per row)
+
+Searches run single-threaded, so latencies are per query on one core.
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from vectorindex import create_index, search_params
+
+NPROBE_VALUES = (1, 2, 4, 8, 16, 32, 64, 128)
+EF_SEARCH_VALUES = (16, 32, 64, 128, 256, 512)
+
+
+def synthetic_vectors(n: int, d: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Unit vectors around random topic centres, roughly like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, d)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=n)] + rng.normal(size=(n, d)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return sum(len(set(f) & set(t)) for f, t in zip(found, truth)) / (len(truth) * k)
+
+
+def timed_search(index, queries, k, params=None):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k, params=params)
+    return ids, 1000 * (time.perf_counter() - start) / len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=100_000, help="number of synthetic vectors")
+    parser.add_argument("--d", type=int, default=768, help="dimensions (nomic-embed-text: 768)")
+    parser.add_argument("--vectors", help=".npy file with real embeddings instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", nargs="+", default=["ivf", "hnsw"], choices=["ivf", "hnsw"])
+    args = parser.parse_args(argv)
+
+    faiss.omp_set_num_threads(1)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.n + args.queries, args.d)
+    # Held-out queries from the same distribution as the corpus
+    vectors, queries = vectors[:-args.queries], vectors[-args.queries:]
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    flat = create_index(vectors, "flat")
+    flat.add(vectors)
+    truth, flat_ms = timed_search(flat, queries, args.k)
+    print(f"\n{'index':<6} {'param':<14} {'recall@k':>9} {'ms/query':>9} {'speedup':>8}")
+    print(f"{'flat':<6} {'-':<14} {1.0:>9.3f} {flat_ms:>9.3f} {1.0:>7.1f}x")
+
+    for kind in args.kinds:
+        start = time.perf_counter()
+        index = create_index(vectors, kind)
+        index.add(vectors)
+        print(f"-- {kind}: built in {time.perf_counter() - start:.1f}s")
+        sweep = ("nprobe", NPROBE_VALUES) if kind == "ivf" else ("ef_search", EF_SEARCH_VALUES)
+        for value in sweep[1]:
+            params = search_params(index, **{sweep[0]: value})
+            if params is None:
+                print(f"{kind:<6} (fell back to flat: too few vectors)")
+                break
+            ids, ms = timed_search(index, queries, args.k, params)
+            print(f"{kind:<6} {f'{sweep[0]}={value}':<14} {recall_at_k(ids, truth):>9.3f} {ms:>9.3f} {flat_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Batched Multi-Question RAG
+rag_chain.invoke() per question costs one embedding request, one FAISS search and one
+generation each - and the offline cohort reports ask hundreds of questions, many of them
+the same question or questions that retrieve the same chunks. answer_batch() runs a list
+of questions as one job:
+
+- identical questions are answered once;
+- retrieval is batched: HybridRetriever.retrieve_many() embeds every question that needs
+  the vector search in one call and searches them as one FAISS query matrix;
+- each distinct set of retrieved chunks is packed (contextpacking.py) once, and each
+  distinct (context, question) prompt is generated once;
+- prompts sharing a context are queued next to each other, so the replica's prompt cache
+  reuses the instructions + context prefill (see promptcache.py);
+- generations run `max_concurrency` at a time (Runnable.batch); a generation that fails
+  doesn't cost the others: its questions get the exception as their answer.
+
+    from batchrag import answer_batch
+
+    answers, counts = answer_batch(questions, retriever, prompt | llm | StrOutputParser())
+    print(counts)  # {'questions': 300, 'unique_questions': 40, 'unique_contexts': 12, 'generations': 40, 'failed': 0}
+    failed = [q for q, a in zip(questions, answers) if isinstance(a, Exception)]
+
+`python batchrag.py` runs a synthetic cohort report through medicalrecords1's retriever
+and model, one question at a time and as a batch.
+"""
+import os
+
+from contextpacking import CONTEXT_TOKEN_BUDGET, pack_context, packing_stats
+
+# --- 1. Configuration ---
+MAX_CONCURRENCY = int(os.environ.get("RAG_MAX_CONCURRENCY", 4))  # generations in flight
+
+
+# --- 2. Batched Answering ---
+def retrieve_batch(retriever, questions: list) -> list:
+    """One list of Documents per question, in a single batched retrieval where the retriever supports it."""
+    if hasattr(retriever, "retrieve_many"):
+        return retriever.retrieve_many(questions)
+    return retriever.batch(questions)
+
+
+def answer_batch(questions, retriever, answer_chain, max_concurrency: int = MAX_CONCURRENCY,
+                 budget: int = CONTEXT_TOKEN_BUDGET, stats=packing_stats):
+    """
+    Returns (answers in the order of `questions`, {"questions", "unique_questions",
+    "unique_contexts", "generations", "failed"}). `answer_chain` takes {"context", "question"}.
+    A question whose generation raised gets the exception in place of its answer;
+    "failed" counts the generations that did.
+    """
+    questions = list(questions)
+    unique_questions = list(dict.fromkeys(questions))
+
+    contexts = {}  # chunk texts -> packed context
+    question_context = {}
+    for question, docs in zip(unique_questions, retrieve_batch(retriever, unique_questions)):
+        key = tuple(doc.page_content for doc in docs)
+        if key not in contexts:
+            context, counts = pack_context(docs, budget)
+            stats.record(docs, context, counts)
+            contexts[key] = context
+        question_context[question] = contexts[key]
+
+    # Same context, adjacent prompts: the prefix cache covers the context as well as the instructions.
+    prompts = sorted({(context, question) for question, context in question_context.items()})
+    outputs = answer_chain.batch([{"context": context, "question": question} for context, question in prompts],
+                                 config={"max_concurrency": max_concurrency}, return_exceptions=True)
+    answers = dict(zip(prompts, outputs))
+    counts = {"questions": len(questions), "unique_questions": len(unique_questions),
+              "unique_contexts": len(contexts), "generations": len(prompts),
+              "failed": sum(isinstance(output, Exception) for output in outputs)}
+    return [answers[(question_context[question], question)] for question in questions], counts
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    import medicalrecords1
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--distinct", action="store_true", help="no repeated questions: measure batching alone")
+    args = parser.parse_args()
+
+    # A cohort report asks the same few questions about every patient, plus some free-text ones.
+    templates = ["What medications is patient {p} currently taking?", "What conditions has patient {p} been diagnosed with?",
+                 "When did patient {p} last visit the clinic?", "Is a follow-up scheduled for patient {p}?"]
+    free_text = ["Who has joint pain?", "Which patients have allergies?", "Who was advised to change their diet?",
+                 "What blood pressure readings were recorded?", "Which patients take Metformin?"]
+    rng = random.Random(0)
+    pool = [t.format(p=p) for t in templates for p in ("P1001", "P1002")] + free_text
+    questions = [rng.choice(pool) for _ in range(args.questions)]
+    if args.distinct:
+        questions = [f"{question} (item {i})" for i, question in enumerate(questions)]
+
+    retriever = medicalrecords1.get_retriever()
+    rag_chain = medicalrecords1.get_rag_chain()
+    answer_chain = medicalrecords1.get_answer_chain()
+    rag_chain.invoke(questions[0])  # load the store and warm the model before timing
+
+    start = time.perf_counter()
+    sequential = [rag_chain.invoke(question) for question in questions]
+    sequential_s = time.perf_counter() - start
+    start = time.perf_counter()
+    batched, counts = answer_batch(questions, retriever, answer_chain, args.concurrency)
+    batched_s = time.perf_counter() - start
+
+    print(f"\n{len(questions)} questions one at a time: {sequential_s:.2f}s, {len(questions)} generations")
+    print(f"{len(questions)} questions as a batch:     {batched_s:.2f}s, {counts}")
+    print(f"speedup {sequential_s / batched_s:.1f}x, same answers: {batched == sequential}; "
+          f"hybrid routes {retriever.stats}")
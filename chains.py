@@ -3,7 +3,7 @@ Chains (LCEL)
 This example stitches the components together using the LangChain Expression Language (LCEL) pipe (|), demonstrating a full pipeline running on Ollama.
 """
 from langchain_core.output_parsers import StrOutputParser
-# ollama_model is the ChatOllama instance from section 1
+# ollama_model is the ChatOllama instance from section 1 (built lazily by modelregistry)
 # template is the ChatPromptTemplate instance from section 2
 from modeleg import ollama_model
 from prompttemplates import template
@@ -13,8 +13,9 @@ from prompttemplates import template
 chain = template | ollama_model | StrOutputParser()
 #StrOutputParser: Extracts the final text from the response object.
 
-# Invoke the chain, running the full sequence
-result = chain.invoke({"cuisine": "Mexican", "ingredient": "avocado"})
+if __name__ == "__main__":
+    # Invoke the chain, running the full sequence
+    result = chain.invoke({"cuisine": "Mexican", "ingredient": "avocado"})
 
-print("\n--- LCEL Chain Result (Ollama) ---")
-print(result)
\ No newline at end of file
+    print("\n--- LCEL Chain Result (Ollama) ---")
+    print(result)
@@ -0,0 +1,40 @@
+"""
+Single entry point for the examples.
+Every subsystem (LangChain, FAISS, LangGraph) is imported only by the command that
+needs it, so `python cli.py --help` and other cheap paths return immediately.
+
+    python cli.py medical      # RAG over the synthetic medical records
+    python cli.py trials       # metadata-filtered RAG over trial documents
+    python cli.py refine       # LangGraph writer/critic loop
+    python cli.py warmup       # preload Ollama models
+"""
+import argparse
+import importlib
+
+# command -> (module to load on first use, help text)
+COMMANDS = {
+    "medical": ("medicalrecords1", "Answer questions over the synthetic medical records (RAG)."),
+    "trials": ("metadatafiltering", "Metadata-filtered RAG over clinical trial documents."),
+    "refine": ("selfcorrection1", "Writer/critic refinement loop built with LangGraph."),
+    "warmup": ("modelregistry", "Preload the Ollama models used by the examples."),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Agentic AI examples running on Ollama.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(command, help=help_text)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    module_name, _ = COMMANDS[args.command]
+    # The subsystem is imported here, after argument parsing, and only for this command.
+    module = importlib.import_module(module_name)
+    return module.main()
+
+
+if __name__ == "__main__":
+    main()
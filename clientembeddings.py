@@ -0,0 +1,28 @@
+"""
+LangChain Embeddings over the Shared Client
+Drop-in replacement for OllamaEmbeddings that sends its requests through
+ollamaclient.client, so vector-store ingestion gets load balancing and is scheduled as
+BATCH work while query embeddings stay INTERACTIVE.
+"""
+from langchain_core.embeddings import Embeddings
+
+from ollamaclient import client
+from scheduler import BATCH, INTERACTIVE
+
+INGEST_BATCH_SIZE = 64  # texts per /api/embed request
+
+
+class ClientEmbeddings(Embeddings):
+    def __init__(self, model: str = "nomic-embed-text", tenant: str = "default"):
+        self.model = model
+        self.tenant = tenant
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = []
+        for i in range(0, len(texts), INGEST_BATCH_SIZE):
+            batch = texts[i:i + INGEST_BATCH_SIZE]
+            vectors.extend(client.embed(self.model, batch, priority=BATCH, tenant=self.tenant)["embeddings"])
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        return client.embed(self.model, text, priority=INTERACTIVE, tenant=self.tenant)["embeddings"][0]
@@ -0,0 +1,176 @@
+"""
+Token-Budgeted Context Packing
+Piping a retriever straight into a prompt's {context} stringifies the Document list -
+"[Document(metadata={...}, page_content='...\\n    ...')]" - so the prompt carries reprs,
+escaped newlines, indentation and the chunk_overlap text twice, and its size follows the
+chunk sizes instead of a budget. Prefill time grows linearly with those tokens.
+
+pack_context() turns the retrieved chunks into plain text, in relevance order:
+
+- whitespace is normalised and the Document repr is gone;
+- a chunk already contained in the packed text is dropped, and the part of a chunk that
+  overlaps a neighbouring window (chunk_overlap) is cut;
+- chunks are added until CONTEXT_TOKEN_BUDGET is reached; the last one is cut on a
+  sentence or word boundary if at least MIN_PARTIAL_TOKENS of it fit.
+
+    from contextpacking import context_packer, packing_stats
+
+    chain = {"context": retriever | context_packer(), "question": RunnablePassthrough()} | prompt | llm
+    print(packing_stats.report())  # prompt tokens the stringified Documents would have cost, and saved
+"""
+import os
+import re
+import threading
+
+from langchain_core.runnables import RunnableLambda
+
+from tokencount import count_tokens
+
+# --- 1. Configuration ---
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("RAG_CONTEXT_TOKENS", 1024))
+MIN_PARTIAL_TOKENS = 32   # don't bother with a cut-off chunk smaller than this
+MIN_OVERLAP_CHARS = 20    # shorter shared edges are coincidence, not a chunk_overlap window
+MAX_OVERLAP_CHARS = 400   # longest window edge searched for (chunk_overlap is 50 here)
+SEPARATOR = "\n\n"
+
+
+# --- 2. Cleaning and Overlap ---
+def clean_text(text: str) -> str:
+    """Strips per-line indentation and collapses runs of blank lines."""
+    lines = [" ".join(line.split()) for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _edge_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def remove_overlap(text: str, packed: list) -> str:
+    """`text` minus what the already packed chunks contain ("" if it adds nothing)."""
+    for other in packed:
+        if text in other:
+            return ""
+        head = _edge_overlap(other, text)   # `other` was the window before this one
+        if head:
+            text = text[head:].lstrip()
+        tail = _edge_overlap(text, other)   # ... or the window after it
+        if tail:
+            text = text[:-tail].rstrip()
+    return text
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of `text` within `max_tokens`, cut at a sentence or word boundary."""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    prefix = text[:low]
+    sentence = max(prefix.rfind(". "), prefix.rfind(".\n"), prefix.rfind("\n"))
+    if sentence >= len(prefix) // 2:
+        return prefix[:sentence + 1].rstrip()
+    return prefix[:prefix.rfind(" ")].rstrip() if " " in prefix else prefix
+
+
+# --- 3. Packing ---
+def pack_context(docs, budget: int = CONTEXT_TOKEN_BUDGET):
+    """Returns (context text, {"chunks", "packed", "deduplicated", "truncated", "dropped"})."""
+    packed = []
+    used = 0
+    counts = {"chunks": 0, "packed": 0, "deduplicated": 0, "truncated": 0, "dropped": 0}
+    separator_tokens = count_tokens(SEPARATOR)
+    for doc in docs:
+        counts["chunks"] += 1
+        text = remove_overlap(clean_text(getattr(doc, "page_content", str(doc))), packed)
+        if not text:
+            counts["deduplicated"] += 1
+            continue
+        remaining = budget - used - (separator_tokens if packed else 0)
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            if remaining < MIN_PARTIAL_TOKENS:
+                counts["dropped"] += 1
+                continue
+            text = truncate_to_tokens(text, remaining)
+            tokens = count_tokens(text)
+            counts["truncated"] += 1
+        packed.append(text)
+        used += tokens + (separator_tokens if len(packed) > 1 else 0)
+        counts["packed"] += 1
+    return SEPARATOR.join(packed), counts
+
+
+class ContextPackingStats:
+    """Prompt tokens of the stringified Document list versus the packed context."""
+
+    def __init__(self):
+        self._totals = {"calls": 0, "raw_tokens": 0, "packed_tokens": 0, "chunks": 0,
+                        "deduplicated": 0, "truncated": 0, "dropped": 0}
+        self._lock = threading.Lock()
+
+    def record(self, docs, context: str, counts: dict):
+        raw = count_tokens(str(docs))  # what "{context}" would have received without packing
+        with self._lock:
+            t = self._totals
+            t["calls"] += 1
+            t["raw_tokens"] += raw
+            t["packed_tokens"] += count_tokens(context)
+            for key in ("chunks", "deduplicated", "truncated", "dropped"):
+                t[key] += counts[key]
+
+    def report(self) -> dict:
+        with self._lock:
+            report = dict(self._totals)
+        report["tokens_saved"] = report["raw_tokens"] - report["packed_tokens"]
+        report["saved_rate"] = report["tokens_saved"] / report["raw_tokens"] if report["raw_tokens"] else 0.0
+        return report
+
+
+# Shared instance the packers report to
+packing_stats = ContextPackingStats()
+
+
+def context_packer(budget: int = CONTEXT_TOKEN_BUDGET, stats: ContextPackingStats = packing_stats):
+    """Runnable: retrieved Documents -> packed context string."""
+
+    def pack(docs):
+        context, counts = pack_context(docs, budget)
+        stats.record(docs, context, counts)
+        return context
+
+    return RunnableLambda(pack, name="pack_context")
+
+
+if __name__ == "__main__":
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    # Overlapping windows of one long note, retrieved out of order, plus a duplicate.
+    note = """
+    Patient ID: P1001, Name: John Doe
+    Date of Visit: 2025-10-20
+    Diagnosis: Type 2 Diabetes Mellitus (ICD-10: E11.9)
+    Medication: Metformin 500mg, twice daily.
+    Notes: Patient's A1C level is 7.5%. Advised diet modification and increased physical activity.
+    Follow-up: Repeat A1C in three months. Referred to a dietitian for a structured meal plan.
+    Screening: Annual retinal exam and foot exam ordered; kidney function panel within normal limits.
+    Vitals: Blood pressure 132/84 mmHg, heart rate 76 bpm, BMI 31.2. Weight down 2kg since last visit.
+    Education: Reviewed hypoglycemia symptoms and glucose meter use; patient demonstrated correct technique.
+    Plan: Continue Metformin; consider adding an SGLT2 inhibitor if A1C remains above 7% at follow-up.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=50, separators=[" "])
+    chunks = splitter.split_documents([Document(page_content=note, metadata={"source": "ehr-export.csv", "row": 1})])
+    retrieved = [chunks[2], chunks[1], chunks[3], chunks[1], chunks[0]]
+    for budget in (1024, 100):
+        context, counts = pack_context(retrieved, budget)
+        packing_stats.record(retrieved, context, counts)
+        print(f"budget {budget}: {counts}, {count_tokens(str(retrieved))} -> {count_tokens(context)} tokens")
+    print(f"\n{context}\n")
+    print(packing_stats.report())
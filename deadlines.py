@@ -0,0 +1,158 @@
+"""
+Deadlines, Cancellation and Latency Tracking
+A workflow sets one deadline and every sub-call made underneath it (in the same thread,
+in asyncio tasks, or through asyncio.to_thread) sees the same budget via a ContextVar.
+
+    with deadline_scope(60):              # the whole workflow has 60s
+        with deadline_scope(20):          # this step gets at most 20s (never more than the parent)
+            client.generate(...)          # times out / stops streaming when the budget is gone
+
+CancelToken lets one piece of code abort a call running elsewhere, e.g. the losing
+copy of a hedged request; LatencyTracker keeps the p95 used to decide when to hedge.
+"""
+import collections
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class DeadlineExceeded(TimeoutError):
+    """The workflow's time budget ran out before the call finished."""
+
+
+class RequestCancelled(Exception):
+    """The call was cancelled because its result is no longer needed."""
+
+
+# --- 1. Deadlines ---
+class Deadline:
+    def __init__(self, seconds: float, parent=None):
+        at = time.monotonic() + seconds
+        self.at = min(at, parent.at) if parent is not None else at
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("Workflow deadline exceeded")
+
+    def __repr__(self):
+        return f"Deadline(remaining={self.remaining():.2f}s)"
+
+
+_current_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline():
+    """The innermost active Deadline, or None if the caller set no budget."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Runs the block under a deadline `seconds` from now, capped by any enclosing deadline."""
+    deadline = Deadline(seconds, parent=current_deadline())
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def no_deadline():
+    """Runs the block with no deadline, e.g. work shared by callers that each have their own budget."""
+    token = _current_deadline.set(None)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def remaining_or(default: float) -> float:
+    """Time left under the current deadline, or `default` if there is none."""
+    deadline = current_deadline()
+    return default if deadline is None else min(default, deadline.remaining())
+
+
+# --- 2. Cancellation ---
+class CancelToken:
+    """
+    Thread-safe cancellation flag. Callbacks (e.g. closing an HTTP response) run when the
+    token is cancelled; a token linked to a parent is cancelled together with it.
+    """
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent.add_callback(self.cancel)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def add_callback(self, fn):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn()
+
+    def remove_callback(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass  # best effort: the resource may already be closed
+
+    def check(self):
+        if self.cancelled:
+            raise RequestCancelled("Request cancelled")
+
+
+# --- 3. Latency Tracking ---
+class LatencyTracker:
+    """Rolling window of recent latencies per key (model name)."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def mean(self, key: str):
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        return sum(samples) / len(samples) if samples else None
+
+    def percentile(self, key: str, pct: float):
+        """The pct-th percentile, or None until min_samples latencies have been seen."""
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))  # nearest-rank method
+        return ordered[rank - 1]
@@ -0,0 +1,78 @@
+"""
+Dimension Reduction Benchmark
+Builds the same index (vectorindex.py) over PCA-projected and Matryoshka-truncated
+vectors at several dimensions and reports index size, recall@k against full-dimension
+exact search and query latency - with and without re-ranking RERANK_FACTOR * k
+candidates on the full vectors (the two-stage search build_vectorstore() does).
+
+    python dimbench.py                              # synthetic vectors, 768 dims
+    python dimbench.py --vectors embeddings.npy     # real nomic-embed-text embeddings
+    python dimbench.py --kind hnsw --dims 256 128
+
+Synthetic vectors get a decaying per-dimension scale, so - as in a Matryoshka-trained
+model - the leading dimensions carry most of the signal. Only real embeddings say how
+well truncation works for a given model.
+
+Latency does not always fall with dimension: a 512-float row stride hits cache aliasing
+in FAISS's BLAS path, so 512 dims can search slower than 768. Measure before choosing.
+"""
+import argparse
+
+import faiss
+import numpy as np
+
+from annsweep import recall_at_k, synthetic_vectors
+from quantbench import index_bytes, timed_search
+from vectorindex import RERANK_FACTOR, create_index
+
+
+def matryoshka_like(n: int, d: int) -> np.ndarray:
+    vectors = synthetic_vectors(n, d) * (1.0 / np.sqrt(1.0 + np.arange(d) / 16.0)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=100_000, help="number of synthetic vectors")
+    parser.add_argument("--d", type=int, default=768, help="dimensions (nomic-embed-text: 768)")
+    parser.add_argument("--vectors", help=".npy file with real embeddings instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kind", default="flat", choices=["flat", "ivf", "hnsw"])
+    parser.add_argument("--dims", type=int, nargs="+", default=[512, 256, 128, 64])
+    parser.add_argument("--rerank", type=int, default=RERANK_FACTOR, help="candidates fetched per result")
+    args = parser.parse_args(argv)
+
+    faiss.omp_set_num_threads(1)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = matryoshka_like(args.n + args.queries, args.d)
+    vectors, queries = vectors[:-args.queries], vectors[-args.queries:]
+    d = vectors.shape[1]
+    print(f"{len(vectors)} vectors x {d} dims, {len(queries)} queries, k={args.k}, index={args.kind}")
+
+    full = create_index(vectors, args.kind, None, reduction=None)
+    full.add(vectors)
+    flat = create_index(vectors, "flat", None, reduction=None)
+    flat.add(vectors)
+    _, truth = flat.search(queries, args.k)
+    ids, full_ms = timed_search(full, queries, args.k)
+    full_size = index_bytes(full)
+
+    print(f"\n{'reduction':<11} {'dims':>5} {'rerank':<7} {'index MB':>9} {'recall@k':>9} {'ms/query':>9} {'speedup':>8}")
+    print(f"{'-':<11} {d:>5} {'-':<7} {full_size / 2**20:>9.1f} {recall_at_k(ids, truth):>9.3f} {full_ms:>9.3f} {1.0:>7.1f}x")
+    for reduction in ("pca", "matryoshka"):
+        for dims in [dims for dims in args.dims if dims < d]:
+            index = create_index(vectors, args.kind, None, reduction=reduction, reduced_dims=dims)
+            index.add(vectors)
+            size = index_bytes(index)
+            for label, exact, factor in (("no", None, 1), (f"{args.rerank}x", vectors, args.rerank)):
+                ids, ms = timed_search(index, queries, args.k, exact, factor)
+                print(f"{reduction:<11} {dims:>5} {label:<7} {size / 2**20:>9.1f} {recall_at_k(ids, truth):>9.3f} "
+                      f"{ms:>9.3f} {full_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Disk-Backed Docstore
+InMemoryDocstore keeps every chunk as a Python Document: for short chunks the str and
+dict overhead costs more RAM than the vectors themselves, yet a query only ever reads k
+of them. SQLiteDocstore keeps the chunks in a SQLite file and fetches the top-k hits on
+demand, with a small LRU for the hot ones.
+
+Chunks can point at the full record they were split from ("parent documents"). The
+parents are stored alongside and only loaded when asked for:
+
+    from diskdocstore import SQLiteDocstore, split_with_parents
+
+    chunks, parents = split_with_parents(documents, text_splitter)
+    docstore = SQLiteDocstore("medical.sqlite")
+    docstore.add_parents(parents)
+    vectorstore = build_vectorstore(chunks, embeddings, docstore=docstore)
+
+    hit = vectorstore.similarity_search(question, k=2)[0]
+    record = docstore.parent(hit)        # the whole visit note, read from disk now
+"""
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import weakref
+
+from langchain_core.documents import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+# --- 1. Configuration ---
+DEFAULT_CACHE_SIZE = 256  # documents kept decoded in memory
+PARENT_ID_KEY = "parent_id"
+
+
+# --- 2. LRU Cache ---
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss counters."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "cached": len(self._items)}
+
+
+# --- 3. Parent Documents ---
+def parent_id(doc) -> str:
+    """Content + metadata hash: CSV rows with the same text but different metadata stay separate parents."""
+    key = json.dumps([doc.page_content, doc.metadata], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def split_with_parents(documents, text_splitter):
+    """Splits `documents` into chunks tagged with metadata[PARENT_ID_KEY]; returns (chunks, {id: parent})."""
+    parents = {parent_id(doc): doc for doc in documents}
+    tagged = [Document(page_content=doc.page_content, metadata={**doc.metadata, PARENT_ID_KEY: pid})
+              for pid, doc in parents.items()]
+    return text_splitter.split_documents(tagged), parents
+
+
+# --- 4. SQLite Docstore ---
+def _close_database(conn, remove_path=None):
+    conn.close()
+    if remove_path is not None:
+        try:
+            os.remove(remove_path)
+        except OSError:
+            pass
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    Chunks and parent documents in one SQLite file (a temporary one by default, deleted
+    on close() or when the store is garbage collected).
+    Safe to share between threads; open the same file read-only from other processes.
+    """
+
+    def __init__(self, path=None, cache_size: int = DEFAULT_CACHE_SIZE, read_only: bool = False):
+        temporary = path is None
+        if temporary:
+            fd, path = tempfile.mkstemp(prefix="rag-docstore-", suffix=".sqlite")
+            os.close(fd)
+        self.path = path
+        uri = f"file:{path}?mode=ro" if read_only else f"file:{path}"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._close = weakref.finalize(self, _close_database, self._conn, path if temporary else None)
+        self._lock = threading.Lock()
+        self.cache = LRUCache(cache_size)
+        if not read_only:
+            with self._lock, self._conn:
+                for table in ("chunks", "parents"):
+                    self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                                       "(id TEXT PRIMARY KEY, page_content TEXT, metadata TEXT)")
+
+    def _insert(self, table: str, texts: dict):
+        rows = [(key, doc.page_content, json.dumps(doc.metadata)) for key, doc in texts.items()]
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?)", rows)
+
+    def _fetch(self, table: str, ids: list) -> dict:
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, page_content, metadata FROM {table} WHERE id IN ({marks})",
+                                      list(ids)).fetchall()
+        return {key: Document(id=key, page_content=text, metadata=json.loads(meta)) for key, text, meta in rows}
+
+    # Docstore interface used by the FAISS vector store
+    def add(self, texts: dict) -> None:
+        try:
+            self._insert("chunks", texts)
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Tried to add ids that already exist: {set(texts)}") from None
+
+    def delete(self, ids: list) -> None:
+        marks = ",".join("?" * len(ids))
+        with self._lock, self._conn:
+            deleted = self._conn.execute(f"DELETE FROM chunks WHERE id IN ({marks})", list(ids)).rowcount
+        if not deleted:
+            raise ValueError(f"Tried to delete ids that does not  exist: {ids}")
+        for key in ids:
+            self.cache.discard(key)
+
+    def search(self, search: str):
+        doc = self.cache.get(search)
+        if doc is None:
+            doc = self._fetch("chunks", [search]).get(search)
+            if doc is None:
+                return f"ID {search} not found."
+            self.cache.put(search, doc)
+        return doc
+
+    def mget(self, ids: list) -> list:
+        """Documents for `ids` (None where missing) with one query for all cache misses."""
+        found = {key: self.cache.get(key) for key in ids}
+        missing = [key for key, doc in found.items() if doc is None]
+        for key, doc in self._fetch("chunks", missing).items():
+            self.cache.put(key, doc)
+            found[key] = doc
+        return [found[key] for key in ids]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    # Parent documents
+    def add_parents(self, parents: dict) -> None:
+        self._insert("parents", parents)
+
+    def parent(self, doc):
+        """The full document `doc` was split from, or None if it has no (stored) parent."""
+        pid = doc.metadata.get(PARENT_ID_KEY)
+        return None if pid is None else self._fetch("parents", [pid]).get(pid)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+if __name__ == "__main__":
+    import sys
+    import tracemalloc
+
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    # Memory still held once the chunks are stored: InMemoryDocstore vs SQLiteDocstore
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    def visit_notes():
+        return {str(i): Document(page_content=f"Patient ID: P{i:05d}. Visit note {i}: vitals normal, no changes.",
+                                 metadata={"row": i, "source": "visits.csv", PARENT_ID_KEY: f"record-{i // 4}"})
+                for i in range(n)}
+
+    for name, make in (("InMemoryDocstore", InMemoryDocstore), ("SQLiteDocstore", SQLiteDocstore)):
+        store = make()
+        tracemalloc.start()
+        store.add(visit_notes())
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{name:<17} {n} chunks: {held / 2**20:7.1f} MB held in Python objects")
+    for key in ["7", "42", "7", "99", "42"]:
+        store.search(key)
+    print(f"SQLiteDocstore LRU after 5 lookups: {store.stats()}")
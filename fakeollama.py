@@ -0,0 +1,182 @@
+"""
+Fake Ollama Server
+A tiny stdlib HTTP server that speaks enough of the Ollama API (/api/generate, /api/chat,
+/api/embed, /api/tags, /api/ps, /api/version) to exercise the client, load balancer and
+friends locally - no model, no GPU, instant answers.
+
+    from fakeollama import start_fake_servers
+
+    servers = start_fake_servers(3, delay_s=0.1)   # three replicas on free ports
+    servers[1].fail = True                          # make one of them return 500s
+    ... use [s.url for s in servers] ...
+    for s in servers: s.shutdown()
+
+Run `python fakeollama.py 11434` to stand one up in place of the real server.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tokencount import count_tokens
+
+EMBEDDING_DIM = 8
+MODELS = ["llama3", "mistral", "nomic-embed-text"]
+CONTEXT_TEXT_LIMIT = 256  # returned contexts remembered, oldest dropped first
+
+
+def fake_embedding(text: str) -> list:
+    """Deterministic pseudo-embedding so identical text always maps to the same vector."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(b - 128) / 128 for b in digest[:EMBEDDING_DIM]]
+
+
+def fake_instance(schema: dict, root=None):
+    """A minimal value matching a JSON schema, as a schema-constrained (`format`) answer."""
+    root = root or schema
+    if "$ref" in schema:
+        schema = root.get("$defs", {})[schema["$ref"].split("/")[-1]]
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: fake_instance(prop, root) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [fake_instance(schema.get("items", {"type": "string"}), root)]
+    return {"integer": 1, "number": 1.0, "boolean": True, "null": None}.get(kind, "example")
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # keep demo output clean
+
+    def _send_json(self, body: dict, status: int = 200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path in ("/api/tags", "/api/ps"):
+            self._send_json({"models": [{"name": f"{m}:latest", "size": 1024 ** 3} for m in MODELS]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server.requests += 1
+        if server.fail:
+            self._send_json({"error": "fake server failure"}, 500)
+            return
+
+        if self.path == "/api/embed":
+            time.sleep(server.delay_s)
+            inputs = payload.get("input", "")
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json({"model": payload.get("model"), "embeddings": [fake_embedding(t) for t in inputs]})
+            return
+        if self.path == "/api/generate":
+            prompt = payload.get("prompt", "")
+            full_prompt = (payload.get("system") or "") + prompt
+        elif self.path == "/api/chat":
+            messages = payload.get("messages") or [{"content": ""}]
+            prompt = messages[-1].get("content", "")
+            full_prompt = "".join(m.get("content") or "" for m in messages)
+        else:
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        context = payload.get("context") or []
+        with server.lock:
+            previous = server.last_prompt.get(payload.get("model"), "")
+            # The model's cache now holds the text behind `context` followed by this prompt.
+            history = server.context_text.get(tuple(context), "")
+            server.last_prompt[payload.get("model")] = history + full_prompt
+        if context:
+            # A /api/generate context already holds the earlier turns: only the new prompt is evaluated.
+            evaluated = max(1, count_tokens(prompt))
+        else:
+            # Like the real server, only the part after the prefix shared with the model's
+            # previous prompt is evaluated (tokens as tokencount.py counts them, 1ms each).
+            shared = len(os.path.commonprefix([previous, full_prompt]))
+            evaluated = max(1, count_tokens(full_prompt[shared:]))
+
+        if isinstance(payload.get("format"), dict):
+            text = json.dumps(fake_instance(payload["format"]))  # constrained decoding always matches
+        elif server.reply:
+            text = server.reply(prompt)
+        else:
+            text = f"[{server.name}] {prompt.strip()[:60]}"
+        stats = {
+            "done": True,
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": evaluated * 1_000_000,
+            "eval_count": count_tokens(text),
+            "load_duration": 0,
+            "context": context + [len(w) for w in (full_prompt + " " + text).split()],  # one fake id per word
+        }
+        with server.lock:
+            server.context_text[tuple(stats["context"])] = history + full_prompt + " " + text
+            if len(server.context_text) > CONTEXT_TEXT_LIMIT:
+                del server.context_text[next(iter(server.context_text))]
+        body_key = "response" if self.path == "/api/generate" else "message"
+
+        def body(piece):
+            return piece if body_key == "response" else {"role": "assistant", "content": piece}
+
+        if payload.get("stream", True):
+            # NDJSON, one word per chunk, like the real server; delay_s is spread over the chunks
+            words = text.split(" ")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            try:
+                for word in words:
+                    time.sleep(server.delay_s / len(words))
+                    chunk = {"model": payload.get("model"), body_key: body(word + " "), "done": False}
+                    self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write((json.dumps({"model": payload.get("model"), body_key: body(""), **stats}) + "\n").encode("utf-8"))
+            except (BrokenPipeError, ConnectionResetError):
+                server.aborted += 1  # the client hung up mid-generation
+        else:
+            time.sleep(server.delay_s)
+            self._send_json({"model": payload.get("model"), body_key: body(text), **stats})
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay_s: float = 0.0, name=None):
+        super().__init__(("127.0.0.1", port), FakeOllamaHandler)
+        self.delay_s = delay_s
+        self.fail = False
+        self.requests = 0
+        self.aborted = 0
+        self.reply = None  # optional fn(prompt) -> answer text, e.g. to script an agent's actions
+        self.last_prompt = {}  # model -> previous prompt, for the simulated prompt cache
+        self.context_text = {}  # returned context -> the text it stands for
+        self.lock = threading.Lock()
+        self.name = name or f"fake:{self.server_address[1]}"
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def start_fake_servers(count: int = 3, delay_s: float = 0.0) -> list:
+    """Starts `count` fake replicas on free ports, each in its own background thread."""
+    return [FakeOllamaServer(delay_s=delay_s, name=f"replica-{i}").start() for i in range(count)]
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 11434
+    print(f"Fake Ollama listening on http://127.0.0.1:{port}")
+    FakeOllamaServer(port).serve_forever()
@@ -0,0 +1,159 @@
+"""
+Hybrid Retrieval Benchmark
+Generates a synthetic corpus of visit notes (patient IDs, ICD-10 codes, medications) and
+compares dense (FAISS), BM25 and hybrid retrieval (hybridretrieval.py) per query type:
+
+- id:       "What medication is patient P10042 taking?"
+- icd:      "Which visits were coded E11.9?"
+- id+icd:   "Is patient P10042 being treated for E11.9?"
+- semantic: "persistent knee pain with cartilage wear" (no identifiers)
+
+recall@k is the share of the top-k that should be there (out of min(k, relevant)).
+
+    python hybridbench.py                   # 5,000 patients, offline hashing embeddings
+    python hybridbench.py --ollama --n 300  # real nomic-embed-text through the shared client
+
+The offline embeddings hash character trigrams, so - like a real embedding model - they
+see P10042 and P10043 as near-identical.
+"""
+import argparse
+import random
+import time
+import zlib
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from hybridretrieval import BM25Index, HybridRetriever, tokenize
+from vectorindex import build_vectorstore
+
+CONDITIONS = [
+    ("Type 2 Diabetes Mellitus", "E11.9", "Metformin 500mg twice daily", "A1C elevated, advised diet changes"),
+    ("Essential hypertension", "I10.0", "Lisinopril 10mg daily", "blood pressure 150/95, reduce salt"),
+    ("Osteoarthritis of the knee", "M17.9", "Celecoxib 200mg daily", "persistent knee pain, cartilage wear on X-ray"),
+    ("Seasonal allergic rhinitis", "J30.2", "Cetirizine 10mg as needed", "symptoms triggered by pollen"),
+    ("Asthma, mild intermittent", "J45.2", "Albuterol inhaler as needed", "wheezing after exercise"),
+    ("Hypothyroidism", "E03.9", "Levothyroxine 50mcg daily", "fatigue, TSH elevated"),
+    ("Major depressive disorder", "F32.9", "Sertraline 50mg daily", "low mood for several weeks"),
+    ("Gastro-esophageal reflux", "K21.9", "Omeprazole 20mg daily", "heartburn after meals"),
+    ("Migraine without aura", "G43.0", "Sumatriptan 50mg as needed", "recurring throbbing headaches"),
+    ("Hyperlipidemia", "E78.5", "Atorvastatin 20mg nightly", "LDL cholesterol high"),
+    ("Chronic low back pain", "M54.5", "Physiotherapy and ibuprofen", "lower back stiffness in the morning"),
+    ("Iron deficiency anemia", "D50.9", "Ferrous sulfate 325mg daily", "pale, low ferritin"),
+]
+SEMANTIC_QUERIES = {
+    "Type 2 Diabetes Mellitus": "high blood sugar managed with diet and metformin",
+    "Osteoarthritis of the knee": "persistent knee pain with cartilage wear",
+    "Migraine without aura": "patients with recurring throbbing headaches",
+    "Gastro-esophageal reflux": "heartburn after eating",
+    "Hypothyroidism": "tired all the time with a high TSH",
+}
+
+
+class HashingEmbeddings(Embeddings):
+    """Offline stand-in for an embedding model: hashed character trigrams, L2-normalised."""
+
+    def __init__(self, size: int = 512):
+        self.size = size
+
+    def _embed(self, text: str) -> list:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in tokenize(text):
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                vector[zlib.crc32(padded[i:i + 3].encode()) % self.size] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def synthetic_records(patients: int, seed: int = 0):
+    """One Document per visit; metadata holds the patient ID and condition."""
+    rng = random.Random(seed)
+    docs = []
+    for number in range(patients):
+        patient = f"P{10000 + number}"
+        for visit in range(rng.randint(1, 4)):
+            name, icd, medication, note = rng.choice(CONDITIONS)
+            text = (f"Patient ID: {patient}. Date of Visit: 2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}. "
+                    f"Diagnosis: {name} (ICD-10: {icd}). Medication: {medication}. Notes: {note}.")
+            docs.append(Document(page_content=text, metadata={"patient": patient, "icd": icd, "condition": name}))
+    return docs
+
+
+def queries(docs, count: int, seed: int = 1):
+    """(query type, query, relevance test) triples."""
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        doc = rng.choice(docs)
+        patient, icd, condition = doc.metadata["patient"], doc.metadata["icd"], doc.metadata["condition"]
+        cases.append(("id", f"What medication is patient {patient} taking?",
+                      lambda d, p=patient: d.metadata["patient"] == p))
+        cases.append(("icd", f"Which visits were coded {icd}?", lambda d, c=icd: d.metadata["icd"] == c))
+        cases.append(("id+icd", f"Is patient {patient} being treated for {icd}?",
+                      lambda d, p=patient, c=icd: d.metadata["patient"] == p and d.metadata["icd"] == c))
+        if condition in SEMANTIC_QUERIES:
+            cases.append(("semantic", SEMANTIC_QUERIES[condition], lambda d, c=condition: d.metadata["condition"] == c))
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=5000, help="number of patients (1-4 visits each)")
+    parser.add_argument("--queries", type=int, default=100, help="sampled visits to build queries from")
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--ollama", action="store_true", help="embed with nomic-embed-text instead of hashing")
+    args = parser.parse_args(argv)
+
+    docs = synthetic_records(args.n)
+    if args.ollama:
+        from clientembeddings import ClientEmbeddings
+        embeddings = ClientEmbeddings("nomic-embed-text")
+    else:
+        embeddings = HashingEmbeddings()
+    start = time.perf_counter()
+    vectorstore = build_vectorstore(docs, embeddings)
+    embed_s = time.perf_counter() - start
+    start = time.perf_counter()
+    keyword_index = BM25Index(docs)
+    bm25_s = time.perf_counter() - start
+    print(f"{len(docs)} visit notes: FAISS built in {embed_s:.1f}s, BM25 in {bm25_s:.1f}s ({len(keyword_index.postings)} terms)")
+
+    hybrid = HybridRetriever(vectorstore=vectorstore, keyword_index=keyword_index, k=args.k)
+    methods = {
+        "dense": lambda q: vectorstore.similarity_search(q, k=args.k),
+        "bm25": lambda q: keyword_index.search(q, args.k),
+        "hybrid": hybrid.invoke,
+    }
+    relevant_counts = {}
+    results = {}
+    for kind, query, is_relevant in queries(docs, args.queries):
+        if query not in relevant_counts:
+            relevant_counts[query] = sum(map(is_relevant, docs))
+        best = min(args.k, relevant_counts[query])
+        for name, search in methods.items():
+            start = time.perf_counter()
+            found = search(query)
+            elapsed = time.perf_counter() - start
+            stats = results.setdefault((kind, name), [0.0, 0.0, 0])
+            stats[0] += sum(map(is_relevant, found)) / best
+            stats[1] += elapsed
+            stats[2] += 1
+
+    print(f"\n{'queries':<9} {'method':<7} {'recall@k':>9} {'ms/query':>9}")
+    for kind in ("id", "icd", "id+icd", "semantic"):
+        for name in methods:
+            recall, seconds, count = results.get((kind, name), (0.0, 0.0, 0))
+            if count:
+                print(f"{kind:<9} {name:<7} {recall / count:>9.3f} {1000 * seconds / count:>9.2f}")
+    print(f"\nhybrid routes: {hybrid.stats}")
+
+
+if __name__ == "__main__":
+    main()
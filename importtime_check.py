@@ -0,0 +1,88 @@
+"""
+Cold-Start Regression Check
+Imports each module in a fresh interpreter with `python -X importtime` and fails when
+its cumulative import time goes over the budget. Run it after touching imports:
+
+    python importtime_check.py                              # default modules and budget
+    python importtime_check.py cli medicalrecords1 --budget-ms 150
+
+Exit code is 1 if any module is over budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Importing these must not pull in LangChain, FAISS or LangGraph.
+DEFAULT_MODULES = [
+    "cli",
+    "lazyimports",
+    "modelregistry",
+    "modeleg",
+    "medicalrecords1",
+    "metadatafiltering",
+    "selfcorrection1",
+]
+DEFAULT_BUDGET_MS = 100.0
+RUNS = 3  # best-of-N to smooth out disk cache noise
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Parses `-X importtime` output into {module: (self_us, cumulative_us)}.
+    Only top-level imports are kept (nested ones are indented in the last column).
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].rstrip()
+        if name.startswith("  "):
+            continue
+        timings[name.strip()] = (int(parts[0]), int(parts[1]))
+    return timings
+
+
+def measure(module: str) -> float:
+    """Returns the best-of-RUNS cumulative import time of `module` in milliseconds."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    best = None
+    for _ in range(RUNS):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, env=env, cwd=here,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+        total_ms = parse_importtime(proc.stderr).get(module, (0, 0))[1] / 1000
+        best = total_ms if best is None else min(best, total_ms)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for module in args.modules:
+        try:
+            total_ms = measure(module)
+        except RuntimeError as e:
+            print(f"❌ {module}: {e}")
+            failures += 1
+            continue
+        status = "✅" if total_ms <= args.budget_ms else "❌"
+        print(f"{status} {module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        if total_ms > args.budget_ms:
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
 #Often, you don't just want text back from the LLM; you want structured data (like JSON) so your code can easily process it. This uses a Pydantic Schema and a special parser.
+#The schema is passed to Ollama's `format` parameter, which constrains decoding to it: the answer always parses, and the prompt no longer needs the long format instructions.
 
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.callbacks.stdout import StdOutCallbackHandler
 from pydantic import BaseModel, Field
 from langchain_core.output_parsers import JsonOutputParser
+from outputrepair import repair_stats, repairing
+from streamingjson import iter_partial_models
+from structuredoutput import constrained_model, stats
 import langchain
 langchain.verbose=True
 langchain.debug=True
@@ -17,18 +20,21 @@ class Recipe(BaseModel):
 
 # 2. Setup the Parser and the Model
 parser = JsonOutputParser(pydantic_object=Recipe)
-ollama_model = ChatOllama(model="llama3", temperature=0)
+# Recipe's JSON schema goes to Ollama as `format`: the model can only produce matching JSON.
+ollama_model = constrained_model(Recipe, temperature=0)
 
-# 3. Define the Prompt Template
+# 3. Define the Prompt Template (no format instructions: the schema is enforced by the server)
 prompt = ChatPromptTemplate.from_messages(
     [
-        ("system", "You are an expert chef. Your goal is to extract recipe information from the user's text and format it perfectly as JSON according to the following schema:\n{format_instructions}"),
+        ("system", "You are an expert chef. Extract the recipe information from the user's text as JSON."),
         ("human", "{user_input}")
     ]
-).partial(format_instructions=parser.get_format_instructions())
+)
 
 # 4. Create the Chain and Invoke
-structured_chain = prompt | ollama_model | parser
+# Same as prompt | ollama_model | parser, but every call is counted in structuredoutput.stats
+# The parser repairs malformed output locally (outputrepair.py) before giving up.
+structured_chain = stats.measure("schema", prompt, ollama_model, repairing(parser))
 
 user_input = "Tell me about a quick recipe for scrambled eggs. It should take about 5 minutes."
 
@@ -36,4 +42,10 @@ print("--- Structured Output Chain Result ---")
 # The result will be a Pydantic object (or a dict if the parser is omitted)
 recipe_object = structured_chain.invoke({"user_input": user_input},config={"callbacks":[StdOutCallbackHandler()]})
 
-print(recipe_object)
\ No newline at end of file
+print(recipe_object)
+print(stats.report())
+print("Local repair:", repair_stats.report())
+
+# Streaming: fields are validated and printed as they complete, not after the whole answer.
+for partial_recipe in iter_partial_models(Recipe, (prompt | ollama_model).stream({"user_input": user_input})):
+    print(partial_recipe.model_dump(exclude_unset=True))
@@ -0,0 +1,76 @@
+"""
+Deferred Imports
+langchain_community, FAISS, langgraph and the text splitters take seconds to import.
+Scripts declare them through lazy_import() so the real import only happens the first
+time an attribute is used, and expose their expensive module-level objects
+(vector stores, chains, graphs) through lazy_attributes() so they are built on first access.
+
+    from lazyimports import lazy_import, lazy_attributes
+
+    lc_vectorstores = lazy_import("langchain_community.vectorstores")
+
+    def get_vectorstore():
+        return lc_vectorstores.FAISS.from_documents(...)   # FAISS imported here
+
+    __getattr__ = lazy_attributes(vectorstore=get_vectorstore)
+"""
+import functools
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a module that is imported the first time one of its attributes is read."""
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_name"])
+                    self.__dict__["_module"] = module
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Returns a proxy for module `name`; nothing is imported until an attribute is used."""
+    return LazyModule(name)
+
+
+def lazy_attributes(**factories):
+    """
+    Builds a module-level __getattr__ (PEP 562) that creates each attribute with its
+    factory on first access and reuses the result afterwards.
+
+    Note: names resolved this way are only visible to importers (`module.vectorstore`
+    or `from module import vectorstore`); code inside the module should call the factory.
+    """
+    cached = {name: functools.cache(factory) for name, factory in factories.items()}
+
+    def __getattr__(name):
+        factory = cached.get(name)
+        if factory is None:
+            raise AttributeError(f"module has no attribute {name!r}")
+        return factory()
+
+    return __getattr__
@@ -3,31 +3,46 @@ LLM Fundamentals & Prompt Engineering - OLLAMA Version
 This tutorial uses local models via Ollama (no API keys required).
 
 Install dependencies:
-    pip install ollama
+    pip install requests
 Start Ollama service (if not running):
     ollama serve
 """
 
-import ollama
 import json
 import time
 
+from ollamaclient import client
+from promptcache import StaticPrefixPrompt, prefix_stats
+from scheduler import BATCH, INTERACTIVE
+
 # Default local model — change if you prefer mistral, phi3, qwen2, etc.
 DEFAULT_MODEL = "llama3"
 
 # ---------------------------------------------
 # Basic Completion
 # ---------------------------------------------
-def send_completion(prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300):
+def send_completion(prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300, priority=INTERACTIVE,
+                    template=None):
     """
     Sends a prompt to a local Ollama model and returns text output.
+    Use priority=BATCH for bulk runs so they don't delay interactive users.
+    With a StaticPrefixPrompt `template`, `prompt` is a dict of its fields and the
+    template's static prefix is served from the server's prompt cache.
     """
     try:
-        response = ollama.chat(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            options={"temperature": temperature, "num_predict": max_tokens}
+        if template is None:
+            messages, fields = [{"role": "user", "content": prompt}], {}
+        else:
+            messages, fields = template.messages(**prompt), template.request_fields()
+        response = client.chat(
+            model,
+            messages,
+            priority=priority,
+            options={"temperature": temperature, "num_predict": max_tokens},
+            **fields
         )
+        if template is not None:
+            template.record(messages, response)
         return response["message"]["content"]
     except Exception as e:
         return f"Error: {e}"
@@ -36,8 +51,11 @@ def send_completion(prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300
 # ---------------------------------------------
 # Few-shot Classification
 # ---------------------------------------------
-few_shot_template = """
-You are an assistant that classifies movie reviews as Positive or Negative.
+# Instructions and examples are the static prefix (identical on every call, so Ollama
+# reuses their cached prefill); only the review itself is new each time.
+few_shot_template = StaticPrefixPrompt(
+    "few-shot-reviews",
+    system="""You are an assistant that classifies movie reviews as Positive or Negative.
 
 Examples:
 Review: "I loved the movie. The story was touching and the acting superb."
@@ -46,14 +64,13 @@ Label: Positive
 Review: "Boring, too long, and predictable."
 Label: Negative
 
-Now classify the following review:
-Review: "{review}"
-Label:
-"""
+Now classify the following review:""",
+    template="""Review: "{review}"
+Label:""",
+)
 
 def classify_review(review):
-    prompt = few_shot_template.format(review=review)
-    return send_completion(prompt, temperature=0.0, max_tokens=20)
+    return send_completion({"review": review}, temperature=0.0, max_tokens=20, template=few_shot_template)
 
 
 # ---------------------------------------------
@@ -62,8 +79,15 @@ def classify_review(review):
 if __name__ == "__main__":
     print("🔹 LLM Fundamentals Demo — Ollama Version")
     
-    review = "The plot was amazing and the visuals were stunning."
+    reviews = [
+        "The plot was amazing and the visuals were stunning.",
+        "I walked out halfway through.",
+        "A heartfelt story with a brilliant cast.",
+    ]
     print("\nFew-shot classification:")
-    print(classify_review(review))
+    for review in reviews:
+        print(f"{review} -> {classify_review(review)}")
+    # After the first review, the instructions and examples come from the prompt cache.
+    print("\nPrompt prefix cache:", prefix_stats.report())
     
    
\ No newline at end of file
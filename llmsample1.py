@@ -3,29 +3,33 @@ LLM Fundamentals & Prompt Engineering - OLLAMA Version
 This tutorial uses local models via Ollama (no API keys required).
 
 Install dependencies:
-    pip install ollama
+    pip install requests
 Start Ollama service (if not running):
     ollama serve
 """
 
-import ollama
 import json
 import time
 
+from ollamaclient import client
+from scheduler import BATCH, INTERACTIVE
+
 # Default local model — change if you prefer mistral, phi3, qwen2, etc.
 DEFAULT_MODEL = "llama3"
 
 # ---------------------------------------------
 # Basic Completion
 # ---------------------------------------------
-def send_completion(prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300):
+def send_completion(prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300, priority=INTERACTIVE):
     """
     Sends a prompt to a local Ollama model and returns text output.
+    Use priority=BATCH for bulk runs so they don't delay interactive users.
     """
     try:
-        response = ollama.chat(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
+        response = client.chat(
+            model,
+            [{"role": "user", "content": prompt}],
+            priority=priority,
             options={"temperature": temperature, "num_predict": max_tokens}
         )
         return response["message"]["content"]
@@ -59,8 +63,8 @@ def get_embedding(text, model="nomic-embed-text"):
     Pull model first: ollama pull nomic-embed-text
     """
     try:
-        res = ollama.embeddings(model=model, prompt=text)
-        return res["embedding"]
+        res = client.embed(model, text)
+        return res["embeddings"][0]
     except Exception as e:
         print("Embedding error:", e)
         return None
@@ -82,8 +86,9 @@ def cosine_similarity(a, b):
 def compare_prompts(prompt_a, prompt_b, test_inputs, model=DEFAULT_MODEL):
     results = []
     for text in test_inputs:
-        out_a = send_completion(prompt_a.format(text), model=model)
-        out_b = send_completion(prompt_b.format(text), model=model)
+        # Bulk evaluation: scheduled behind interactive traffic
+        out_a = send_completion(prompt_a.format(text), model=model, priority=BATCH)
+        out_b = send_completion(prompt_b.format(text), model=model, priority=BATCH)
         results.append({"input": text, "A": out_a.strip(), "B": out_b.strip()})
     return results
 
@@ -3,31 +3,46 @@ LLM Fundamentals & Prompt Engineering - OLLAMA Version
 This tutorial uses local models via Ollama (no API keys required).
 
 Install dependencies:
-    pip install ollama
+    pip install requests
 Start Ollama service (if not running):
     ollama serve
 """
 
-import ollama
 import json
 import time
 
+from ollamaclient import client
+from promptcache import StaticPrefixPrompt, prefix_stats
+from scheduler import BATCH, INTERACTIVE
+
 # Default local model — change if you prefer mistral, phi3, qwen2, etc.
 DEFAULT_MODEL = "llama3"
 
 # ---------------------------------------------
 # Basic Completion
 # ---------------------------------------------
-def send_completion(prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300):
+def send_completion(prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300, priority=INTERACTIVE,
+                    template=None):
     """
     Sends a prompt to a local Ollama model and returns text output.
+    Use priority=BATCH for bulk runs so they don't delay interactive users.
+    With a StaticPrefixPrompt `template`, `prompt` is a dict of its fields and the
+    template's static prefix is served from the server's prompt cache.
     """
     try:
-        response = ollama.chat(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            options={"temperature": temperature, "num_predict": max_tokens}
+        if template is None:
+            messages, fields = [{"role": "user", "content": prompt}], {}
+        else:
+            messages, fields = template.messages(**prompt), template.request_fields()
+        response = client.chat(
+            model,
+            messages,
+            priority=priority,
+            options={"temperature": temperature, "num_predict": max_tokens},
+            **fields
         )
+        if template is not None:
+            template.record(messages, response)
         return response["message"]["content"]
     except Exception as e:
         return f"Error: {e}"
@@ -36,8 +51,11 @@ def send_completion(prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=300
 # ---------------------------------------------
 # Few-shot Classification
 # ---------------------------------------------
-few_shot_template = """
-You are an assistant that classifies movie reviews as Positive or Negative.
+# Instructions and examples are the static prefix (identical on every call, so Ollama
+# reuses their cached prefill); only the review itself is new each time.
+few_shot_template = StaticPrefixPrompt(
+    "few-shot-reviews",
+    system="""You are an assistant that classifies movie reviews as Positive or Negative.
 
 Examples:
 Review: "I loved the movie. The story was touching and the acting superb."
@@ -46,14 +64,13 @@ Label: Positive
 Review: "Boring, too long, and predictable."
 Label: Negative
 
-Now classify the following review:
-Review: "{review}"
-Label:
-"""
+Now classify the following review:""",
+    template="""Review: "{review}"
+Label:""",
+)
 
 def classify_review(review):
-    prompt = few_shot_template.format(review=review)
-    return send_completion(prompt, temperature=0.0, max_tokens=20)
+    return send_completion({"review": review}, temperature=0.0, max_tokens=20, template=few_shot_template)
 
 
 # ---------------------------------------------
@@ -82,8 +99,8 @@ def get_embedding(text, model="nomic-embed-text"):
     Pull model first: ollama pull nomic-embed-text
     """
     try:
-        res = ollama.embeddings(model=model, prompt=text)
-        return res["embedding"]
+        res = client.embed(model, text)
+        return res["embeddings"][0]
     except Exception as e:
         print("Embedding error:", e)
         return None
@@ -133,8 +150,9 @@ def cosine_similarity(a, b):
 def compare_prompts(prompt_a, prompt_b, test_inputs, model=DEFAULT_MODEL):
     results = []
     for text in test_inputs:
-        out_a = send_completion(prompt_a.format(text), model=model)
-        out_b = send_completion(prompt_b.format(text), model=model)
+        # Bulk evaluation: scheduled behind interactive traffic
+        out_a = send_completion(prompt_a.format(text), model=model, priority=BATCH)
+        out_b = send_completion(prompt_b.format(text), model=model, priority=BATCH)
         results.append({"input": text, "A": out_a.strip(), "B": out_b.strip()})
     return results
 
@@ -144,6 +162,11 @@ def compare_prompts(prompt_a, prompt_b, test_inputs, model=DEFAULT_MODEL):
 # ---------------------------------------------
 if __name__ == "__main__":
     print("🔹 LLM Fundamentals Demo — Ollama Version")
+
+    print("\nFew-shot classification:")
+    for review in ["The plot was amazing and the visuals were stunning.", "Boring from start to finish."]:
+        print(f"{review} -> {classify_review(review)}")
+    print("Prompt prefix cache:", prefix_stats.report())
     
     print("\nEmbedding similarity demo:")
     emb1 = get_embedding("king")
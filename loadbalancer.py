@@ -0,0 +1,212 @@
+"""
+Client-Side Load Balancer for Ollama Replicas
+Spreads requests over several Ollama servers instead of one hard-coded localhost:11434.
+
+- Least outstanding requests: each call goes to the replica with the fewest in-flight calls.
+- Session pinning: calls with the same session_id stay on one replica so its KV cache is reused.
+- Ejection: a replica that fails EJECT_AFTER_FAILURES times in a row is skipped for EJECT_FOR_S.
+- Per-endpoint concurrency: at most MAX_CONCURRENCY in-flight calls per replica; callers wait.
+
+    OLLAMA_ENDPOINTS=http://box1:11434,http://box2:11434 python react.py
+
+    from loadbalancer import balancer
+    with balancer.acquire(session_id="user-42") as endpoint:
+        requests.post(f"{endpoint.url}/api/chat", json=...)
+"""
+import collections
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from modelregistry import OLLAMA_HOST
+
+# --- 1. Configuration ---
+OLLAMA_ENDPOINTS = [u.strip().rstrip("/") for u in os.environ.get("OLLAMA_ENDPOINTS", OLLAMA_HOST).split(",") if u.strip()]
+MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "4"))
+EJECT_AFTER_FAILURES = 3
+EJECT_FOR_S = 30.0
+MAX_PINNED_SESSIONS = 10_000
+
+
+class NoHealthyEndpointError(RuntimeError):
+    """Every replica is ejected (or excluded), so there is nowhere to send the request."""
+
+
+class Endpoint:
+    def __init__(self, url: str, max_concurrency: int = MAX_CONCURRENCY):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def has_capacity(self) -> bool:
+        return self.outstanding < self.max_concurrency
+
+    def __repr__(self):
+        return f"Endpoint({self.url!r}, outstanding={self.outstanding}, failures={self.consecutive_failures})"
+
+
+class LoadBalancer:
+    def __init__(self, urls=None, max_concurrency: int = MAX_CONCURRENCY,
+                 eject_after: int = EJECT_AFTER_FAILURES, eject_for_s: float = EJECT_FOR_S):
+        self.endpoints = [Endpoint(url, max_concurrency) for url in (urls or OLLAMA_ENDPOINTS)]
+        self.eject_after = eject_after
+        self.eject_for_s = eject_for_s
+        self._sessions = collections.OrderedDict()  # session_id -> Endpoint (LRU)
+        self._cond = threading.Condition()
+
+    # --- 2. Endpoint Selection ---
+    def _candidates(self, exclude, now):
+        healthy = [e for e in self.endpoints if e.url not in exclude and e.is_healthy(now)]
+        if not healthy:
+            raise NoHealthyEndpointError(f"No healthy Ollama endpoint among {[e.url for e in self.endpoints]}")
+        return healthy
+
+    def _choose(self, session_id, exclude, now):
+        """Returns the endpoint to use, or None if the right one is at capacity."""
+        healthy = self._candidates(exclude, now)
+        pinned = self._sessions.get(session_id) if session_id is not None else None
+        if pinned is not None and pinned in healthy:
+            self._sessions.move_to_end(session_id)
+            # Wait for the pinned replica rather than losing its KV cache.
+            return pinned if pinned.has_capacity() else None
+
+        available = [e for e in healthy if e.has_capacity()]
+        if not available:
+            return None
+        fewest = min(e.outstanding for e in available)
+        # Random tie-break so independent processes don't all start on the first replica.
+        endpoint = random.choice([e for e in available if e.outstanding == fewest])
+        self._pin(session_id, endpoint)
+        return endpoint
+
+    def _pin(self, session_id, endpoint):
+        """Pins `session_id` to `endpoint`, evicting the least recently used session past MAX_PINNED_SESSIONS."""
+        if session_id is None:
+            return
+        self._sessions[session_id] = endpoint
+        self._sessions.move_to_end(session_id)
+        if len(self._sessions) > MAX_PINNED_SESSIONS:
+            self._sessions.popitem(last=False)
+
+    def pick_url(self, session_id=None) -> str:
+        """
+        Base URL for clients that can't route per request (ChatOllama, the OpenAI client).
+        With a session_id the same replica is returned every time.
+        """
+        with self._cond:
+            now = time.monotonic()
+            pinned = self._sessions.get(session_id) if session_id is not None else None
+            if pinned is not None and pinned.is_healthy(now):
+                self._sessions.move_to_end(session_id)
+                return pinned.url
+            healthy = self._candidates((), now)
+            fewest = min(e.outstanding for e in healthy)
+            endpoint = random.choice([e for e in healthy if e.outstanding == fewest])
+            self._pin(session_id, endpoint)
+            return endpoint.url
+
+    @contextmanager
+    def acquire(self, session_id=None, exclude=(), timeout=None):
+        """
+        Reserves a slot on the best replica for the duration of the `with` block.
+        Raising out of the block counts as a failure of that replica.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                endpoint = self._choose(session_id, exclude, time.monotonic())
+                if endpoint is not None:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free Ollama endpoint slot")
+                # Wake up on release, or in time to notice an ejection expiring.
+                self._cond.wait(min(remaining or self.eject_for_s, self.eject_for_s))
+            endpoint.outstanding += 1
+            endpoint.total_requests += 1
+        ok = False
+        try:
+            yield endpoint
+            ok = True
+        finally:
+            self.release(endpoint, ok)
+
+    def release(self, endpoint: Endpoint, ok: bool):
+        with self._cond:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.consecutive_failures = 0
+            else:
+                endpoint.consecutive_failures += 1
+                endpoint.total_failures += 1
+                if endpoint.consecutive_failures >= self.eject_after:
+                    endpoint.ejected_until = time.monotonic() + self.eject_for_s
+                    print(f"⚠️ Ejecting {endpoint.url} for {self.eject_for_s:.0f}s after {endpoint.consecutive_failures} failures")
+            self._cond.notify_all()
+
+    # --- 3. Health Checks ---
+    def check_health(self, timeout: float = 2.0) -> dict:
+        """Probes every replica; healthy ones are reinstated, dead ones ejected. Returns {url: ok}."""
+        import requests
+
+        results = {}
+        for endpoint in self.endpoints:
+            try:
+                requests.get(f"{endpoint.url}/api/version", timeout=timeout).raise_for_status()
+                ok = True
+            except Exception:
+                ok = False
+            with self._cond:
+                if ok:
+                    endpoint.consecutive_failures = 0
+                    endpoint.ejected_until = 0.0
+                else:
+                    endpoint.ejected_until = time.monotonic() + self.eject_for_s
+                self._cond.notify_all()
+            results[endpoint.url] = ok
+        return results
+
+    def snapshot(self) -> list:
+        with self._cond:
+            now = time.monotonic()
+            return [
+                {"url": e.url, "outstanding": e.outstanding, "healthy": e.is_healthy(now),
+                 "requests": e.total_requests, "failures": e.total_failures}
+                for e in self.endpoints
+            ]
+
+
+# Shared instance used by ollamaclient and the examples
+balancer = LoadBalancer()
+
+
+if __name__ == "__main__":
+    # Demo against three local fake servers (see fakeollama.py); one of them is down.
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fakeollama import start_fake_servers
+    from ollamaclient import OllamaClient
+
+    servers = start_fake_servers(3, delay_s=0.05)
+    servers[2].fail = True
+    demo_client = OllamaClient(LoadBalancer([s.url for s in servers], max_concurrency=2))
+
+    def ask(i):
+        return demo_client.generate("llama3", f"question {i}", session_id=f"user-{i % 4}")["response"]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(ask, range(24)))
+    print("\n".join(answers[:4]), "...")
+    for row in demo_client.balancer.snapshot():
+        print(row)
+    for s in servers:
+        s.shutdown()
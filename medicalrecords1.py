@@ -1,12 +1,22 @@
 import os
-from langchain_ollama import ChatOllama
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import functools
+import hashlib
+
+from lazyimports import lazy_import, lazy_attributes
+from modelregistry import get_model
+from promptcache import StaticPrefixPrompt, prefix_stats
+
+# The LangChain subsystems are only imported when first used (see lazyimports.py), so
+# importing this module, or `python cli.py --help`, does not pay for them.
+lc_documents = lazy_import("langchain_core.documents")
+lc_runnables = lazy_import("langchain_core.runnables")
+lc_output_parsers = lazy_import("langchain_core.output_parsers")
+mmapstore = lazy_import("mmapstore")
+diskdocstore = lazy_import("diskdocstore")
+hybridretrieval = lazy_import("hybridretrieval")
+chunking = lazy_import("chunking")
+contextpacking = lazy_import("contextpacking")
+batchrag = lazy_import("batchrag")
 
 # --- A. Synthetic Medical Records ---
 # In a real application, you would load these from files (PDF, JSON, EHR export).
@@ -42,74 +52,175 @@ medical_records = [
     """
 ]
 
-# Convert strings into LangChain Document objects
-documents = [Document(page_content=record) for record in medical_records]
+# RAG Prompt Template (used in section C)
+# The template instructs the LLM to use the provided context and remain factual.
+# The instructions are the static prefix: sent first and byte-identical on every call, so
+# Ollama reuses their cached prefill and only evaluates the context and question.
+RAG_INSTRUCTIONS = """You are a highly specialized medical assistant. Your task is to accurately and concisely answer the question
+based ONLY on the medical records provided in the context below. Do not use external knowledge.
+If the information is not in the context, state that explicitly."""
+
+RAG_PROMPT_TEMPLATE = StaticPrefixPrompt(
+    "medical-rag",
+    system=RAG_INSTRUCTIONS,
+    template="""CONTEXT:
+{context}
+
+QUESTION: {question}
+""",
+)
+
 
 # --- B. Chunking and Embedding ---
-# 1. Split documents into smaller, semantically coherent chunks (Crucial for RAG)
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-docs = text_splitter.split_documents(documents)
+@functools.cache
+def split_records():
+    # Convert strings into LangChain Document objects
+    documents = [lc_documents.Document(page_content=record) for record in medical_records]
 
-# 2. Initialize Ollama Embeddings (Uses nomic-embed-text or the model you pulled)
-print("Initializing Ollama Embeddings...")
-ollama_embeddings = OllamaEmbeddings(model="nomic-embed-text")
+    # 1. Split documents into smaller, semantically coherent chunks (Crucial for RAG)
+    # Each chunk keeps the id of the full record it came from (its parent document).
+    # Splitting runs on a process pool and repeated boilerplate chunks are dropped before
+    # they are embedded (see chunking.py).
+    text_splitter = chunking.DedupingSplitter(chunk_size=500, chunk_overlap=50)
+    chunks, parents = diskdocstore.split_with_parents(documents, text_splitter)
+    print(f"Chunking: {text_splitter.report()}")
+    return chunks, parents
 
-# 3. Create FAISS Vector Store
-# FAISS is an efficient, in-memory index for fast similarity search.
-print("Creating FAISS index (Embedding documents)...")
-vectorstore = FAISS.from_documents(docs, ollama_embeddings)
-retriever = vectorstore.as_retriever(search_kwargs={"k": 2}) # Retrieve top 2 relevant documents
 
-# --- C. RAG Chain Definition ---
-# 1. Initialize Ollama LLM
-ollama_llm = ChatOllama(model="llama3", temperature=0)
+def get_docs():
+    return split_records()[0]
 
-# 2. Define the RAG Prompt Template
-# The template instructs the LLM to use the provided context and remain factual.
-RAG_PROMPT_TEMPLATE = """
-You are a highly specialized medical assistant. Your task is to accurately and concisely answer the question
-based ONLY on the medical records provided in the context below. Do not use external knowledge.
-If the information is not in the context, state that explicitly.
 
-CONTEXT:
-{context}
+def get_parents():
+    return split_records()[1]
 
-QUESTION: {question}
-"""
-rag_prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
-
-# 3. Construct the RAG Chain using LCEL
-rag_chain = (
-    # Pass the question to the retriever, and the result (context) to the prompt template
-    {"context": retriever, "question": RunnablePassthrough()}
-    | rag_prompt
-    | ollama_llm
-    | StrOutputParser()
+
+@functools.cache
+def get_vectorstore():
+    # 2. Initialize Ollama Embeddings (Uses nomic-embed-text or the model you pulled)
+    print("Initializing Ollama Embeddings...")
+    ollama_embeddings = get_model("nomic-embed-text")
+
+    # 3. Open the FAISS Vector Store
+    # The store is embedded and written to RAG_STORE_DIR once; every later process (or worker)
+    # memory-maps the same files instead of building a private copy, see mmapstore.py.
+    # The index kind (flat / ivf / hnsw) comes from RAG_INDEX, see vectorindex.py.
+    print("Opening FAISS index (embedding documents on first run)...")
+    source_key = hashlib.sha256("\x00".join(medical_records).encode("utf-8")).hexdigest()
+    return mmapstore.load_or_build(os.path.join(mmapstore.STORE_DIR, "medical-records"), get_docs,
+                                   ollama_embeddings, source_key=source_key, get_parents=get_parents)
+
+
+def get_full_record(chunk):
+    # The whole visit note a retrieved chunk was split from, read from disk only when asked for
+    return get_vectorstore().docstore.parent(chunk)
+
+
+@functools.cache
+def get_retriever():
+    # Retrieve top 2 relevant documents. Questions naming a patient ID or ICD-10 code (P1001, E11.9)
+    # are answered from the BM25 keyword index directly; the rest fuse BM25 and FAISS results.
+    # With an ANN index add e.g. search_kwargs={"nprobe": 16} or {"ef_search": 128}.
+    return hybridretrieval.HybridRetriever(
+        vectorstore=get_vectorstore(),
+        keyword_index=hybridretrieval.BM25Index(get_docs()),
+        k=2,
+    )
+
+
+# --- C. RAG Chain Definition ---
+@functools.cache
+def get_answer_chain():
+    # 1. Initialize Ollama LLM, pinned to the replica (and keep_alive) of the template's cached prefix
+    ollama_llm = RAG_PROMPT_TEMPLATE.bind_model(get_model("llama3", temperature=0, **RAG_PROMPT_TEMPLATE.chat_model_options()))
+
+    # 2. Build the RAG Prompt from RAG_PROMPT_TEMPLATE (system instructions + human context/question)
+    rag_prompt = RAG_PROMPT_TEMPLATE.chat_prompt()
+
+    # {"context", "question"} -> answer
+    return rag_prompt | ollama_llm | lc_output_parsers.StrOutputParser()
+
+
+@functools.cache
+def get_rag_chain():
+    # 3. Construct the RAG Chain using LCEL
+    return (
+        # Pass the question to the retriever, and the chunks - packed into a token budget - to the prompt template
+        {"context": get_retriever() | contextpacking.context_packer(), "question": lc_runnables.RunnablePassthrough()}
+        | get_answer_chain()
+    )
+
+
+def answer_questions(questions):
+    # Many questions at once: one embedding call and one FAISS search for all of them, each
+    # distinct context packed and each distinct prompt generated once (see batchrag.py).
+    answers, counts = batchrag.answer_batch(questions, get_retriever(), get_answer_chain())
+    print(f"Batch: {counts}")
+    return answers
+
+
+# `from medicalrecords1 import vectorstore` still works; the index is built on first access.
+__getattr__ = lazy_attributes(
+    docs=get_docs,
+    vectorstore=get_vectorstore,
+    retriever=get_retriever,
+    answer_chain=get_answer_chain,
+    rag_chain=get_rag_chain,
 )
 
+
 # --- D. Query the RAG System ---
-user_query = "What medications is patient P1001 currently taking and for what conditions?"
-
-print(f"\n--- Querying Patient Records ---")
-print(f"User Query: {user_query}")
-print("-" * 30)
-
-# Execute the RAG chain:
-# 1. Question is embedded.
-# 2. FAISS finds the most similar documents (records P1001's diabetes and joint pain).
-# 3. Those documents are inserted into the RAG_PROMPT_TEMPLATE as CONTEXT.
-# 4. Ollama (llama3) reads the context and the question to generate the final answer.
-final_answer = rag_chain.invoke(user_query)
-
-print(f"\n✅ LLM (Ollama) Answer:")
-print(final_answer)
-
-# Example of a query where the answer is NOT in the documents
-query_outside_context = "What is the recommended dosage for Penicillin for children?"
-print(f"\n--- Querying Outside Context ---")
-print(f"User Query: {query_outside_context}")
-print("-" * 30)
-
-final_answer_out = rag_chain.invoke(query_outside_context)
-print(f"\n✅ LLM (Ollama) Answer:")
-print(final_answer_out)
\ No newline at end of file
+def main():
+    rag_chain = get_rag_chain()
+
+    user_query = "What medications is patient P1001 currently taking and for what conditions?"
+
+    print(f"\n--- Querying Patient Records ---")
+    print(f"User Query: {user_query}")
+    print("-" * 30)
+
+    # Execute the RAG chain:
+    # 1. Question is embedded.
+    # 2. FAISS finds the most similar documents (records P1001's diabetes and joint pain).
+    # 3. Those documents are packed into plain text and inserted into the RAG_PROMPT_TEMPLATE as CONTEXT.
+    # 4. Ollama (llama3) reads the context and the question to generate the final answer.
+    final_answer = rag_chain.invoke(user_query)
+
+    print(f"\n✅ LLM (Ollama) Answer:")
+    print(final_answer)
+
+    # The retriever only loaded the matching chunks; the full source record is fetched on demand.
+    top_chunk = get_retriever().invoke(user_query)[0]
+    print(f"\n📄 Full record behind the top match:\n{get_full_record(top_chunk).page_content.strip()}")
+
+    # Example of a query where the answer is NOT in the documents
+    query_outside_context = "What is the recommended dosage for Penicillin for children?"
+    print(f"\n--- Querying Outside Context ---")
+    print(f"User Query: {query_outside_context}")
+    print("-" * 30)
+
+    final_answer_out = rag_chain.invoke(query_outside_context)
+    print(f"\n✅ LLM (Ollama) Answer:")
+    print(final_answer_out)
+
+    # Reports ask many questions at once: answer them as one batch instead of a loop of invoke() calls
+    report_questions = [
+        "What medications is patient P1001 currently taking?",
+        "What medications is patient P1002 currently taking?",
+        "Who has joint pain?",
+        "Which patients have allergies?",
+        "What medications is patient P1001 currently taking?",
+    ]
+    print(f"\n--- Batch of {len(report_questions)} Questions ---")
+    for question, answer in zip(report_questions, answer_questions(report_questions)):
+        if isinstance(answer, Exception):
+            answer = f"❌ failed: {answer!r}"  # the other questions are still answered
+        print(f"Q: {question}\nA: {answer}\n")
+
+    # The later queries re-used the instructions' prefill from the first one.
+    print(f"\n📊 Prompt prefix cache: {prefix_stats.report()}")
+    print(f"📊 Context packing: {contextpacking.packing_stats.report()}")
+
+
+if __name__ == "__main__":
+    main()
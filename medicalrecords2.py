@@ -1,12 +1,13 @@
 import os
 from langchain_ollama import ChatOllama
 from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import CSVLoader # <-- NEW
+from promptcache import StaticPrefixPrompt, prefix_stats
+from vectorindex import build_vectorstore
+from diskdocstore import SQLiteDocstore, split_with_parents
+from chunking import DedupingSplitter
 
 # --- A. Data Loading from CSV ---
 # In a real app, for PDF/Word/Excel, you would use loaders like 
@@ -23,36 +24,51 @@ loader = CSVLoader(
 documents = loader.load()
 
 # --- B. Chunking and Embedding ---
-# Each row of the CSV is now a LangChain Document. We still chunk for better retrieval.
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-docs = text_splitter.split_documents(documents)
+# Each row of the CSV is now a LangChain Document. We still chunk for better retrieval;
+# every chunk remembers the row it came from, so the full row can be loaded on demand.
+# The splitter skips duplicate and near-duplicate chunks (repeated boilerplate), so they are
+# never embedded. It stays in-process here: this script has no __main__ guard, so pool
+# workers started with "spawn" (Windows, macOS) would re-run it.
+text_splitter = DedupingSplitter(chunk_size=500, chunk_overlap=50, max_workers=1)
+docs, parent_rows = split_with_parents(documents, text_splitter)
+print(f"Chunking: {text_splitter.report()}")
 
 # 1. Initialize Ollama Embeddings (nomic-embed-text)
 print("Initializing Ollama Embeddings and creating FAISS index...")
 ollama_embeddings = OllamaEmbeddings(model="nomic-embed-text")
 
-# 2. Create FAISS Vector Store
-vectorstore = FAISS.from_documents(docs, ollama_embeddings)
+# 2. Create FAISS Vector Store (flat, IVF or HNSW index depending on RAG_INDEX, see vectorindex.py)
+# The chunks and rows live in a SQLite file, not in memory: a query only reads its top-k hits.
+docstore = SQLiteDocstore()
+docstore.add_parents(parent_rows)
+vectorstore = build_vectorstore(docs, ollama_embeddings, docstore=docstore)
 retriever = vectorstore.as_retriever(search_kwargs={"k": 2})
 
 # 
 
 # --- C. RAG Chain Definition ---
-# 1. Initialize Ollama LLM (llama3)
-ollama_llm = ChatOllama(model="llama3", temperature=0)
-
-# 2. Define the RAG Prompt Template
-RAG_PROMPT_TEMPLATE = """
-You are a highly specialized medical assistant. Your task is to accurately and concisely answer the question
+# 1. Define the RAG Prompt Template
+# The instructions are a static, byte-identical system message sent first, so Ollama
+# reuses their cached prefill and only evaluates the retrieved rows and the question.
+RAG_INSTRUCTIONS = """You are a highly specialized medical assistant. Your task is to accurately and concisely answer the question
 based ONLY on the medical records provided in the context below. Do not use external knowledge.
-If the information is not in the context, state that explicitly.
+If the information is not in the context, state that explicitly."""
 
-CONTEXT:
+RAG_PROMPT_TEMPLATE = StaticPrefixPrompt(
+    "medical-csv-rag",
+    system=RAG_INSTRUCTIONS,
+    template="""CONTEXT:
 {context}
 
 QUESTION: {question}
-"""
-rag_prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
+""",
+)
+rag_prompt = RAG_PROMPT_TEMPLATE.chat_prompt()
+
+# 2. Initialize Ollama LLM (llama3) on the template's replica, with its keep_alive
+ollama_llm = RAG_PROMPT_TEMPLATE.bind_model(
+    ChatOllama(model="llama3", temperature=0, **RAG_PROMPT_TEMPLATE.chat_model_options())
+)
 
 # 3. Construct the RAG Chain using LCEL
 rag_chain = (
@@ -87,11 +103,16 @@ final_answer_2 = rag_chain.invoke(user_query_2)
 print(f"\n✅ LLM (Ollama) Answer:")
 print(final_answer_2)
 
+# Query 2 re-used the prefill of the instructions from query 1.
+print(f"\n📊 Prompt prefix cache: {prefix_stats.report()}")
+# Only the retrieved chunks were read from the docstore (and kept in its LRU).
+print(f"📊 Docstore cache: {docstore.stats()}")
+
 """
 Key Takeaways for Data Loading
 Document Loaders: The loader.load() step is the only part that changes when switching document types (e.g., from CSVLoader to PyPDFLoader). All loaders output a list of Document objects.
 
 Metadata: When loading a CSV, the CSVLoader automatically includes the row details as metadata in the LangChain Document object, which helps the RAG system retrieve the source of the information.
 
-Chunking: The RecursiveCharacterTextSplitter ensures that even if you load a large PDF or a massive CSV, the data is broken down into small, digestible chunks for accurate embedding and retrieval.
+Chunking: The text splitter (DedupingSplitter, a RecursiveCharacterTextSplitter that drops duplicate chunks) ensures that even if you load a large PDF or a massive CSV, the data is broken down into small, digestible chunks for accurate embedding and retrieval.
 """
\ No newline at end of file
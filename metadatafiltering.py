@@ -5,57 +5,94 @@ When you have different categories of data
  (e.g., patient notes vs. lab results), 
  you can use metadata attached to the documents to narrow the search before the LLM runs. This makes the search faster and more accurate.
 """
-from langchain_ollama import ChatOllama
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
+import functools
+
+from lazyimports import lazy_import, lazy_attributes
+from modelregistry import get_model
+
+# LangChain and FAISS are imported on first use (see lazyimports.py)
+lc_documents = lazy_import("langchain_core.documents")
+lc_prompts = lazy_import("langchain_core.prompts")
+lc_runnables = lazy_import("langchain_core.runnables")
+lc_output_parsers = lazy_import("langchain_core.output_parsers")
+shardedindex = lazy_import("shardedindex")
 
 # --- A. Documents with Metadata ---
 # Metadata allows us to filter the documents before they are retrieved.
-trial_docs = [
-    Document(page_content="Trial ID T001: Investigating drug X for cancer. Side effects were minimal. Efficacy results pending.", 
-             metadata={"phase": "Phase 2", "drug": "Drug X"}),
-    Document(page_content="Trial ID T002: Safety assessment of Drug Y in healthy volunteers. Completed with no serious adverse events.", 
-             metadata={"phase": "Phase 1", "drug": "Drug Y"}),
-    Document(page_content="Trial ID T003: Large-scale efficacy study of Drug Z. Shows significant improvement in patient outcomes.", 
-             metadata={"phase": "Phase 3", "drug": "Drug Z"}),
+# (page_content, metadata) pairs; turned into Document objects in get_trial_docs()
+trial_records = [
+    ("Trial ID T001: Investigating drug X for cancer. Side effects were minimal. Efficacy results pending.",
+     {"phase": "Phase 2", "drug": "Drug X"}),
+    ("Trial ID T002: Safety assessment of Drug Y in healthy volunteers. Completed with no serious adverse events.",
+     {"phase": "Phase 1", "drug": "Drug Y"}),
+    ("Trial ID T003: Large-scale efficacy study of Drug Z. Shows significant improvement in patient outcomes.",
+     {"phase": "Phase 3", "drug": "Drug Z"}),
 ]
 
+
+@functools.cache
+def get_trial_docs():
+    return [lc_documents.Document(page_content=text, metadata=metadata) for text, metadata in trial_records]
+
+
 # --- B. Embedding and Filtering Setup ---
-ollama_embeddings = OllamaEmbeddings(model="nomic-embed-text")
-vectorstore = FAISS.from_documents(trial_docs, ollama_embeddings)
-
-# Define a **specific retriever** that only retrieves documents where 'phase' equals 'Phase 1'
-phase_1_retriever = vectorstore.as_retriever(
-    search_kwargs={
-        "k": 3,
-        "filter": {"phase": "Phase 1"} # This is the key filtering step
-    }
-)
+@functools.cache
+def get_vectorstore():
+    ollama_embeddings = get_model("nomic-embed-text")
+    # One index per trial phase, each flat, IVF or HNSW depending on RAG_INDEX (see vectorindex.py).
+    # A phase filter only searches that phase's shard; see shardedindex.py.
+    return shardedindex.ShardedVectorStore.from_documents(get_trial_docs(), ollama_embeddings, shard_key="phase")
+
+
+def get_phase_1_retriever():
+    # Define a **specific retriever** that only retrieves documents where 'phase' equals 'Phase 1'
+    # (the query only goes to the 'Phase 1' shard)
+    return get_vectorstore().as_retriever(
+        search_kwargs={
+            "k": 3,
+            "filter": {"phase": "Phase 1"} # This is the key filtering step
+        }
+    )
+
 
 # --- C. RAG Chain and Query ---
-ollama_llm = ChatOllama(model="llama3", temperature=0)
-rag_prompt = ChatPromptTemplate.from_template("Answer the question based ONLY on the context: {context}\n\nQuestion: {question}")
-
-# Chain uses the pre-filtered retriever
-rag_chain_filtered = (
-    {"context": phase_1_retriever, "question": RunnablePassthrough()}
-    | rag_prompt
-    | ollama_llm
-    | StrOutputParser()
+@functools.cache
+def get_rag_chain_filtered():
+    ollama_llm = get_model("llama3", temperature=0)
+    rag_prompt = lc_prompts.ChatPromptTemplate.from_template("Answer the question based ONLY on the context: {context}\n\nQuestion: {question}")
+
+    # Chain uses the pre-filtered retriever
+    return (
+        {"context": get_phase_1_retriever(), "question": lc_runnables.RunnablePassthrough()}
+        | rag_prompt
+        | ollama_llm
+        | lc_output_parsers.StrOutputParser()
+    )
+
+
+__getattr__ = lazy_attributes(
+    trial_docs=get_trial_docs,
+    vectorstore=get_vectorstore,
+    phase_1_retriever=get_phase_1_retriever,
+    rag_chain_filtered=get_rag_chain_filtered,
 )
 
-user_query = "Summarize the findings of the Phase 1 trial regarding Drug Y."
 
-print(f"\n--- Metadata Filtered RAG System (Phase 1 Trials Only) ---")
-print(f"User Query: {user_query}")
-print("-" * 40)
+def main():
+    rag_chain_filtered = get_rag_chain_filtered()
+
+    user_query = "Summarize the findings of the Phase 1 trial regarding Drug Y."
+
+    print(f"\n--- Metadata Filtered RAG System (Phase 1 Trials Only) ---")
+    print(f"User Query: {user_query}")
+    print("-" * 40)
+
+    # The retriever will ignore T001 (Phase 2) and T003 (Phase 3) regardless of semantic similarity.
+    final_answer = rag_chain_filtered.invoke(user_query)
+
+    print(f"\n✅ LLM (Ollama) Answer:")
+    print(final_answer)
 
-# The retriever will ignore T001 (Phase 2) and T003 (Phase 3) regardless of semantic similarity.
-final_answer = rag_chain_filtered.invoke(user_query)
 
-print(f"\n✅ LLM (Ollama) Answer:")
-print(final_answer)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
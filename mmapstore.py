@@ -0,0 +1,262 @@
+"""
+Memory-Mapped Vector Store
+Every worker process that builds (or unpickles) its own FAISS store holds a private copy
+of the index, the vectors and the docstore: 16 workers, 16 copies. This module writes
+the store once to a directory that any number of processes open read-only:
+
+    <directory>/<version>/manifest.json   kind, quantization, count, dims
+                          index.faiss     the FAISS index, opened with mmap
+                          vectors.npy     float32 vectors for exact re-ranking (quantized/reduced only)
+                          docs.jsonl      one JSON document per line
+                          offsets.npy     byte offset of each line, np.memmap
+                          parents.sqlite  full parent documents, if any (see diskdocstore.py)
+
+Opening maps the files instead of reading them, so it takes milliseconds and the pages
+live in the OS page cache, shared by every process that maps them. Documents are decoded
+only when a search returns them, and a small LRU keeps the hot ones decoded.
+
+    from mmapstore import load_or_build
+
+    vectorstore = load_or_build("vectorstores/medical-records", get_docs, get_model("nomic-embed-text"),
+                                get_parents=get_parents)
+    hit = vectorstore.similarity_search(question, k=2)[0]
+    record = vectorstore.docstore.parent(hit)   # full parent document, read on demand
+
+A version is a hash of `source_key` (by default a hash of the documents themselves), kind,
+quantization and dimension reduction: a changed corpus is written to a new version
+directory next to the old one (delete stale ones by hand). Directories are written under a temporary name and renamed into place, so
+workers starting together never see a half-written store. `python mmapstore.py` opens
+one store from several processes and reports open time and private memory per process.
+"""
+import collections.abc
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+from diskdocstore import DEFAULT_CACHE_SIZE, LRUCache, SQLiteDocstore
+from vectorindex import (INDEX_KIND, QUANTIZATION, REDUCED_DIMS, REDUCTION, RERANK_FACTOR, TunableFAISS,
+                         create_index, needs_rerank)
+
+# --- 1. Configuration ---
+STORE_DIR = os.environ.get("RAG_STORE_DIR", "vectorstores")
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 3  # 2: parents.sqlite, 3: dimension reduction
+
+
+def docs_key(docs) -> str:
+    """Hash of the documents' text and metadata: changes whenever the corpus does."""
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(json.dumps([doc.page_content, doc.metadata], sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def store_version(source_key: str, kind: str, quantization, reduction=REDUCTION, reduced_dims: int = REDUCED_DIMS) -> str:
+    blob = json.dumps([FORMAT_VERSION, source_key, kind, quantization, reduction, reduced_dims])
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:12]
+
+
+# --- 2. Read-Only Docstore ---
+class MmapDocstore(Docstore):
+    """Documents stored one JSON object per line; ids are row numbers ("0", "1", ...)."""
+
+    def __init__(self, directory: str, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "docs.jsonl"), "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.cache = LRUCache(cache_size)
+        parents_path = os.path.join(directory, "parents.sqlite")
+        self._parents = SQLiteDocstore(parents_path, cache_size=0, read_only=True) if os.path.exists(parents_path) else None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def search(self, search: str):
+        doc = self.cache.get(search)
+        if doc is not None:
+            return doc
+        row = int(search)
+        if not 0 <= row < len(self):
+            return f"ID {search} not found."
+        record = json.loads(self._data[self.offsets[row]:self.offsets[row + 1]])
+        doc = Document(id=search, page_content=record["page_content"], metadata=record["metadata"])
+        self.cache.put(search, doc)
+        return doc
+
+    def parent(self, doc):
+        """The full document `doc` was split from, or None if the store has no parents."""
+        return None if self._parents is None else self._parents.parent(doc)
+
+    def delete(self, ids: list):
+        raise PermissionError("MmapDocstore is read-only; write a new store version instead")
+
+
+class RowIds(collections.abc.Mapping):
+    """index_to_docstore_id for a store whose docstore ids are its row numbers, without a dict of n entries."""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.count:
+            raise KeyError(row)
+        return str(row)
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __len__(self):
+        return self.count
+
+
+# --- 3. Writing and Opening ---
+def write_store(directory: str, docs, vectors: np.ndarray, kind: str = INDEX_KIND, quantization=QUANTIZATION,
+                parents=None, reduction=REDUCTION, reduced_dims: int = REDUCED_DIMS):
+    """
+    Writes a store for `docs` and their `vectors` to `directory` (which must not exist yet),
+    with `parents` ({parent_id: Document}, see diskdocstore.split_with_parents) if given.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".building-", dir=parent)
+    try:
+        index = create_index(vectors, kind, quantization, reduction=reduction, reduced_dims=reduced_dims)
+        index.add(vectors)
+        faiss.write_index(index, os.path.join(staging, "index.faiss"))
+        if needs_rerank(index):
+            np.save(os.path.join(staging, "vectors.npy"), vectors)  # for exact re-ranking
+
+        offsets = [0]
+        with open(os.path.join(staging, "docs.jsonl"), "wb") as f:
+            for doc in docs:
+                line = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(os.path.join(staging, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        if parents:
+            parent_store = SQLiteDocstore(os.path.join(staging, "parents.sqlite"))
+            parent_store.add_parents(parents)
+            parent_store.close()
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "kind": kind,
+            "quantization": quantization,
+            "reduction": f"{reduction}{reduced_dims}" if isinstance(index, faiss.IndexPreTransform) else None,
+            "count": len(vectors),
+            "dims": vectors.shape[1],
+            "ivf": faiss.try_extract_index_ivf(index) is not None,
+            "rerank": needs_rerank(index),
+        }
+        with open(os.path.join(staging, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, directory)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(os.path.join(directory, MANIFEST)):
+            raise
+        # Another process finished writing the same version first; use theirs.
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def open_store(directory: str, embeddings, rerank_factor: int = RERANK_FACTOR) -> TunableFAISS:
+    """Maps a store written by write_store(); nothing is copied into process memory."""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    # IVF lists and flat code arrays are mapped by different FAISS readers.
+    flags = faiss.IO_FLAG_READ_ONLY | (faiss.IO_FLAG_MMAP if manifest["ivf"] else faiss.IO_FLAG_MMAP_IFC)
+    index = faiss.read_index(os.path.join(directory, "index.faiss"), flags)
+    exact = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r") if manifest["rerank"] else None
+    return TunableFAISS(embeddings, index, MmapDocstore(directory), RowIds(manifest["count"]),
+                        exact_vectors=exact, rerank_factor=rerank_factor)
+
+
+def load_or_build(directory: str, get_docs, embeddings, kind: str = INDEX_KIND, quantization=QUANTIZATION,
+                  source_key=None, get_parents=None, reduction=REDUCTION, reduced_dims: int = REDUCED_DIMS) -> TunableFAISS:
+    """
+    Opens the store in `directory` for (source_key, kind, quantization, reduction), first embedding
+    `get_docs()` (and storing `get_parents()`) if no process has done so yet. Without a
+    `source_key`, get_docs() is called every time and its documents are hashed, so a
+    changed corpus never reopens a stale store; pass a cheaper key if you have one.
+    """
+    docs = None
+    if source_key is None:
+        docs = list(get_docs())
+        source_key = docs_key(docs)
+    path = os.path.join(directory, store_version(source_key, kind, quantization, reduction, reduced_dims))
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        docs = list(get_docs()) if docs is None else docs
+        vectors = embeddings.embed_documents([doc.page_content for doc in docs])
+        write_store(path, docs, vectors, kind, quantization, get_parents() if get_parents else None,
+                    reduction, reduced_dims)
+    return open_store(path, embeddings)
+
+
+# --- 4. Multi-Process Demo ---
+def _private_mb() -> float:
+    """Memory only this process uses (Linux; 0.0 elsewhere)."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return 0.0
+    return sum(int(fields[k].split()[0]) for k in ("Private_Clean", "Private_Dirty")) / 1024
+
+
+def _worker(directory: str, queries: np.ndarray, k: int):
+    import time
+    from langchain_core.embeddings import FakeEmbeddings
+
+    before = _private_mb()
+    start = time.perf_counter()
+    store = open_store(directory, FakeEmbeddings(size=queries.shape[1]))
+    open_ms = 1000 * (time.perf_counter() - start)
+    for query in queries:
+        store.similarity_search_by_vector(query.tolist(), k=k)
+    return os.getpid(), open_ms, _private_mb() - before
+
+
+def main(argv=None):
+    import argparse
+    import concurrent.futures
+    import time
+
+    from annsweep import synthetic_vectors
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=200_000, help="number of synthetic documents")
+    parser.add_argument("--d", type=int, default=768)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--kind", default=INDEX_KIND, choices=["flat", "ivf", "hnsw"])
+    args = parser.parse_args(argv)
+
+    vectors = synthetic_vectors(args.n, args.d)
+    docs = [Document(page_content=f"Synthetic record {i}", metadata={"row": i}) for i in range(args.n)]
+    directory = os.path.join(tempfile.mkdtemp(prefix="mmapstore-"), "store")
+    start = time.perf_counter()
+    write_store(directory, docs, vectors, args.kind, None)
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+    print(f"wrote {args.n} x {args.d} ({args.kind}) in {time.perf_counter() - start:.1f}s: {size / 2**20:.0f} MB on disk")
+
+    queries = vectors[:20]
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as pool:
+        results = list(pool.map(_worker, [directory] * args.workers, [queries] * args.workers, [5] * args.workers))
+    print(f"\n{'pid':>8} {'open ms':>8} {'private MB':>11}")
+    for pid, open_ms, private in results:
+        print(f"{pid:>8} {open_ms:>8.1f} {private:>11.1f}")
+    print(f"\nEach worker maps the same {size / 2**20:.0f} MB from the page cache instead of loading its own copy.")
+
+
+if __name__ == "__main__":
+    main()
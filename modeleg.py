@@ -1,18 +1,26 @@
-from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage, SystemMessage
+from lazyimports import lazy_attributes
+from modelregistry import get_model
 
-# Initialize the chat model, specifying the Ollama model name
-try:
-    ollama_model = ChatOllama(model="llama3", temperature=0.7)
-    
-    # Simple invoke with a list of messages
-    response = ollama_model.invoke([
-        SystemMessage(content="You are a polite, helpful AI running on a local server."),
-        HumanMessage(content="Explain the difference between LangChain and Ollama in one sentence.")
-    ])
+# ollama_model is built on first access (via the lazy registry), so importing
+# this module no longer constructs a model or calls the Ollama server.
+__getattr__ = lazy_attributes(ollama_model=lambda: get_model("llama3", temperature=0.7))
 
-    print("--- Model Invoke Result ---")
-    print(response.content)
 
-except Exception as e:
-    print(f"Error: Could not connect to Ollama. Ensure the server is running and 'llama3' is pulled. Details: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    # Initialize the chat model, specifying the Ollama model name
+    try:
+        ollama_model = get_model("llama3", temperature=0.7)
+
+        # Simple invoke with a list of messages
+        response = ollama_model.invoke([
+            SystemMessage(content="You are a polite, helpful AI running on a local server."),
+            HumanMessage(content="Explain the difference between LangChain and Ollama in one sentence.")
+        ])
+
+        print("--- Model Invoke Result ---")
+        print(response.content)
+
+    except Exception as e:
+        print(f"Error: Could not connect to Ollama. Ensure the server is running and 'llama3' is pulled. Details: {e}")
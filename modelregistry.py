@@ -0,0 +1,119 @@
+"""
+Lazy Model Registry
+Every script used to build (and often call) its Ollama model at import time, so simply
+importing a module cost a full LLM round trip. The registry builds each model the first
+time it is asked for and hands back the same instance afterwards.
+
+    from modelregistry import get_model, warm_up
+
+    llm = get_model("llama3")              # ChatOllama, built on first use
+    embeddings = get_model("nomic-embed-text")  # LangChain Embeddings (clientembeddings.py)
+    warm_up()                              # optional: load models on the server up front
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# --- 1. Known Models ---
+# "chat" models are wrapped in ChatOllama, "embedding" models in ClientEmbeddings.
+# The extra keys are the default constructor arguments used across the examples.
+MODEL_SPECS = {
+    "llama3": {"kind": "chat", "temperature": 0},
+    "mistral": {"kind": "chat", "temperature": 0.0},
+    "nomic-embed-text": {"kind": "embedding"},
+}
+
+_instances = {}
+_lock = threading.Lock()
+
+
+def _build(name: str, options: dict):
+    """Imports the LangChain wrapper only when a model is actually needed."""
+    spec = MODEL_SPECS.get(name, {"kind": "chat"})
+    kwargs = {k: v for k, v in spec.items() if k != "kind"}
+    kwargs.update(options)
+    if spec["kind"] == "embedding":
+        # Goes through the shared client: ingestion is scheduled as batch work.
+        from clientembeddings import ClientEmbeddings
+        return ClientEmbeddings(model=name, **kwargs)
+    from langchain_ollama import ChatOllama
+    return ChatOllama(model=name, **kwargs)
+
+
+def get_model(name: str, **options):
+    """
+    Returns the memoized model instance for `name`.
+    Different `options` (e.g. temperature) get their own instance.
+    """
+    key = (name, tuple(sorted(options.items())))
+    model = _instances.get(key)
+    if model is None:
+        with _lock:
+            model = _instances.get(key)
+            if model is None:
+                model = _build(name, options)
+                _instances[key] = model
+    return model
+
+
+def loaded_models() -> list:
+    """Names of the models that have been built so far (not necessarily loaded on the server)."""
+    return sorted({name for name, _ in _instances})
+
+
+def preload(name: str, keep_alive=None, host: str = OLLAMA_HOST) -> float:
+    """
+    Asks the Ollama server at `host` to load `name` into memory without generating anything.
+    An empty generate (or embed) request is Ollama's documented way to preload a model;
+    `keep_alive` (e.g. "30m", or 0 to unload) controls how long it stays resident.
+    Returns the seconds the request took.
+    """
+    import requests
+
+    spec = MODEL_SPECS.get(name, {"kind": "chat"})
+    payload = {"model": name}
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    start = time.perf_counter()
+    if spec["kind"] == "embedding":
+        r = requests.post(f"{host}/api/embed", json={**payload, "input": ""})
+    else:
+        r = requests.post(f"{host}/api/generate", json={**payload, "stream": False})
+    r.raise_for_status()
+    return time.perf_counter() - start
+
+
+def warm_up(names=None, parallel: bool = True) -> dict:
+    """
+    Builds the registry entries and preloads the models on the server.
+    Returns {model_name: seconds taken, or the exception raised}.
+    """
+    names = list(names or MODEL_SPECS)
+
+    def _warm(name):
+        try:
+            get_model(name)
+            return name, preload(name)
+        except Exception as e:
+            return name, e
+
+    if parallel and len(names) > 1:
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            return dict(pool.map(_warm, names))
+    return dict(_warm(name) for name in names)
+
+
+def main():
+    print("--- Warming up models ---")
+    for model_name, outcome in warm_up().items():
+        if isinstance(outcome, Exception):
+            print(f"❌ {model_name}: {outcome}")
+        else:
+            print(f"✅ {model_name}: ready in {outcome:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
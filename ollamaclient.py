@@ -0,0 +1,317 @@
+"""
+Shared Ollama Client
+One place for every raw HTTP call to Ollama (the `ollama_chat()` helpers in react.py,
+tooluse.py, ...). Requests are routed over the replicas in loadbalancer.balancer and
+retried once on another replica if a server is down or returns a 5xx.
+
+Generations are always streamed from the server (and reassembled for non-streaming
+callers) so a call can be abandoned mid-generation: when the current deadline
+(deadlines.deadline_scope) passes or its CancelToken is cancelled, the HTTP stream is
+closed and the replica stops generating. With hedge=True, a call that runs longer than
+the model's p95 latency gets a duplicate on another replica and the first answer wins.
+
+Every call first takes a turn from scheduler.scheduler: pass priority=BATCH (and a
+tenant) for bulk work so interactive requests are served first. Identical requests
+that are already in flight are coalesced into one upstream call (singleflight.py).
+Before anything is sent, admission.controller checks the model's token rate and queue
+length and raises ServerBusyError at once when the model is overloaded. Generations get
+a num_ctx sized to their prompt (tokencount.py); prompts that can't fit raise
+ContextOverflowError, or are trimmed with overflow="trim". Every response is recorded in
+residency.manager (or the `residency` passed in); models are only kept resident once
+that manager has been start()ed.
+
+    from ollamaclient import client
+
+    text = client.generate("llama3", "Why is the sky blue?")["response"]
+    summary = client.generate("llama3", long_doc, priority=BATCH, tenant="nightly-report")
+    reply = client.chat("llama3", [{"role": "user", "content": "Hi"}], session_id="user-42")
+    vectors = client.embed("nomic-embed-text", ["king", "queen"])["embeddings"]
+    for chunk in client.stream("/api/generate", {"model": "llama3", "prompt": "Hi"}):
+        print(chunk["response"], end="")
+"""
+import contextvars
+import functools
+import json
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from admission import controller as default_admission
+from deadlines import CancelToken, DeadlineExceeded, LatencyTracker, RequestCancelled, current_deadline, remaining_or
+from loadbalancer import NoHealthyEndpointError, balancer as default_balancer
+from residency import manager as default_residency
+from scheduler import INTERACTIVE, scheduler as default_scheduler
+from singleflight import SingleFlight, request_key
+from tokencount import sizer as default_sizer
+
+TIMEOUT_S = 300.0
+MAX_ATTEMPTS = 2  # first replica + one retry elsewhere
+HEDGE_PERCENTILE = 95
+HEDGE_POOL_SIZE = 16
+STREAMING_PATHS = ("/api/generate", "/api/chat")
+
+
+def merge_chunks(path: str, chunks: list) -> dict:
+    """Reassembles streamed chunks into the response a `"stream": false` call would return."""
+    if not chunks:
+        return {}
+    final = dict(chunks[-1])
+    if path == "/api/chat":
+        message = dict(final.get("message") or {"role": "assistant"})
+        message["content"] = "".join((c.get("message") or {}).get("content", "") for c in chunks)
+        tool_calls = [t for c in chunks for t in (c.get("message") or {}).get("tool_calls", [])]
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        final["message"] = message
+    else:
+        final["response"] = "".join(c.get("response", "") for c in chunks)
+    return final
+
+
+def abort_response(r):
+    """
+    Aborts a streaming response from another thread. r.close() would wait for the lock
+    held by the thread blocked reading it; shutting the socket down wakes that read at once.
+    """
+    sock = getattr(getattr(r.raw, "connection", None), "sock", None)
+    if sock is None:
+        # With a "Connection: close" response http.client hands the socket to the response body.
+        fp = getattr(getattr(r.raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    if sock is None:
+        r.close()
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed
+
+
+class OllamaClient:
+    def __init__(self, balancer=None, timeout: float = TIMEOUT_S, max_attempts: int = MAX_ATTEMPTS,
+                 hedge: bool = False, scheduler=None, coalesce: bool = True, admission=None,
+                 sizer=None, overflow: str = "error", residency=None):
+        self.balancer = balancer or default_balancer
+        self.residency = residency or default_residency
+        self.scheduler = scheduler or default_scheduler
+        self.admission = admission or default_admission
+        self.sizer = sizer or default_sizer
+        self.overflow = overflow
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.hedge = hedge
+        self.coalesce = coalesce
+        self.flights = SingleFlight()
+        self.latency = LatencyTracker()
+        self.stats = {"hedged": 0, "hedges_won": 0, "cancelled": 0, "deadline_exceeded": 0}
+        self.session = requests.Session()  # keeps connections to each replica alive
+        self._hedge_pool = None
+
+    # --- 1. Single Attempt ---
+    def _attempt(self, path: str, payload: dict, session_id, exclude: list, cancel):
+        """
+        Yields response chunks from one replica (a single chunk for non-streaming paths).
+        Deadline expiry and cancellation close the stream and are not held against the replica.
+        """
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.check()
+        if cancel is not None:
+            cancel.check()
+        streaming = path in STREAMING_PATHS
+        if streaming:
+            payload = {**payload, "stream": True}
+
+        interrupted = client_error = abort = None
+        with self.balancer.acquire(session_id=session_id, exclude=exclude, timeout=remaining_or(self.timeout)) as endpoint:
+            exclude.append(endpoint.url)
+            try:
+                r = self.session.post(f"{endpoint.url}{path}", json=payload, stream=streaming,
+                                      timeout=remaining_or(self.timeout))
+                with r:
+                    if cancel is not None:
+                        abort = functools.partial(abort_response, r)
+                        cancel.add_callback(abort)  # unblocks a read stuck waiting on the server
+                    if r.status_code >= 500:
+                        r.raise_for_status()  # replica problem: counts against this endpoint
+                    if r.status_code >= 400:
+                        client_error = requests.HTTPError(f"{r.status_code} {r.text}", response=r)
+                    elif not streaming:
+                        yield r.json()
+                    else:
+                        done = False
+                        for line in r.iter_lines():
+                            if cancel is not None:
+                                cancel.check()
+                            if deadline is not None:
+                                deadline.check()
+                            if line:
+                                chunk = json.loads(line)
+                                done = chunk.get("done", False)
+                                yield chunk
+                        if cancel is not None:
+                            cancel.check()  # a closed stream can also end quietly
+                        if not done:
+                            raise requests.ConnectionError(f"{endpoint.url} closed the stream before it was done")
+            except GeneratorExit:
+                return  # the caller stopped reading; closing the stream stops the generation
+            except (DeadlineExceeded, RequestCancelled) as e:
+                interrupted = e
+            except Exception as e:
+                if cancel is not None and cancel.cancelled:
+                    interrupted = RequestCancelled("Request cancelled")
+                elif deadline is not None and deadline.expired():
+                    interrupted = DeadlineExceeded(f"Workflow deadline exceeded during {path}")
+                else:
+                    raise
+            finally:
+                if abort is not None:
+                    cancel.remove_callback(abort)
+        if interrupted is not None:
+            self.stats["cancelled" if isinstance(interrupted, RequestCancelled) else "deadline_exceeded"] += 1
+            raise interrupted
+        if client_error is not None:
+            raise client_error  # 4xx: the request itself is wrong, don't retry
+
+    # --- 2. Retries and Coalescing ---
+    def _upstream(self, path: str, payload: dict, session_id, cancel, priority, tenant, exclude):
+        """
+        One real upstream call: passes admission control, waits for a scheduler turn, then
+        yields chunks, retrying on another replica if the first fails before sending anything.
+        """
+        tried = exclude if exclude is not None else []
+        last_error = None
+        cost = self.admission.admit(path, payload, priority, max_wait_s=remaining_or(self.timeout))
+        with self.scheduler.slot(payload["model"], priority, tenant, cancel=cancel):
+            start = time.perf_counter()
+            for _ in range(self.max_attempts):
+                started, last_chunk = False, None
+                try:
+                    for chunk in self._attempt(path, payload, session_id, tried, cancel):
+                        started, last_chunk = True, chunk
+                        yield chunk
+                    self.latency.record(payload["model"], time.perf_counter() - start)
+                    self.residency.record_response(payload["model"], last_chunk)
+                    self.admission.settle(payload["model"], cost, last_chunk)
+                    return
+                except NoHealthyEndpointError:
+                    if last_error is not None:
+                        raise last_error
+                    raise
+                except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                    if started or (isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code < 500):
+                        raise  # half-delivered streams and 4xx can't be retried transparently
+                    print(f"⚠️ {path} failed on {tried[-1] if tried else '?'}: {e}")
+                    last_error = e
+            raise last_error
+
+    def stream(self, path: str, payload: dict, session_id=None, cancel=None,
+               priority: int = INTERACTIVE, tenant: str = "default", exclude=None, coalesce=None):
+        """
+        Yields response chunks. An identical request already in flight is joined instead of
+        sent again (single-flight); every subscriber receives the whole stream.
+        """
+        payload = self._with_keep_alive(payload)
+        if path in STREAMING_PATHS:
+            payload = self.sizer.fit(path, payload, self.overflow)
+        if not (self.coalesce if coalesce is None else coalesce):
+            return self._upstream(path, payload, session_id, cancel, priority, tenant, exclude)
+
+        def upstream(flight_cancel):
+            # Runs once per flight with no deadline; it is cancelled when the last subscriber leaves.
+            return self._upstream(path, payload, session_id, flight_cancel, priority, tenant, exclude)
+
+        return self._subscribe(request_key(path, payload), upstream, cancel)
+
+    def _subscribe(self, key: str, upstream, cancel):
+        try:
+            yield from self.flights.stream(key, upstream, cancel)
+        except DeadlineExceeded:
+            self.stats["deadline_exceeded"] += 1  # this caller's deadline; the flight goes on for the others
+            raise
+
+    def _with_keep_alive(self, payload: dict) -> dict:
+        if payload.get("keep_alive") is None:
+            keep_alive = self.residency.keep_alive_for(payload["model"])
+            if keep_alive is not None:
+                return {**payload, "keep_alive": keep_alive}
+        return payload
+
+    def _call(self, path: str, payload: dict, session_id, cancel, priority, tenant, exclude=None, coalesce=None) -> dict:
+        return merge_chunks(path, list(self.stream(path, payload, session_id, cancel, priority, tenant, exclude, coalesce)))
+
+    # --- 3. Hedging ---
+    def _submit(self, *args):
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix="ollama-hedge")
+        # Each worker runs in a copy of the caller's context, so the deadline follows it.
+        return self._hedge_pool.submit(contextvars.copy_context().run, self._call, *args)
+
+    def _hedged_call(self, path: str, payload: dict, session_id, cancel, priority, tenant) -> dict:
+        p95 = self.latency.percentile(payload["model"], HEDGE_PERCENTILE)
+        if p95 is None or len(self.balancer.endpoints) < 2:
+            return self._call(path, payload, session_id, cancel, priority, tenant)
+
+        tried = []
+        tokens = {}
+        primary_token = CancelToken(parent=cancel)
+        primary = self._submit(path, payload, session_id, primary_token, priority, tenant, tried)
+        tokens[primary] = primary_token
+        done, _ = wait([primary], timeout=remaining_or(p95))
+        if not done and remaining_or(p95) > 0:
+            # Slower than 95% of recent calls: race a copy on a different replica.
+            self.stats["hedged"] += 1
+            backup_token = CancelToken(parent=cancel)
+            # Never coalesced: joining the primary's flight would defeat the hedge.
+            backup = self._submit(path, payload, None, backup_token, priority, tenant, list(tried), False)
+            tokens[backup] = backup_token
+
+        pending, errors = set(tokens), []
+        while pending:
+            done, pending = wait(pending, timeout=remaining_or(self.timeout), return_when=FIRST_COMPLETED)
+            if not done:
+                for future in pending:
+                    tokens[future].cancel()
+                self.stats["deadline_exceeded"] += 1
+                raise DeadlineExceeded(f"Workflow deadline exceeded during {path}")
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        tokens[other].cancel()  # stop the losing replica's generation
+                    if future is not primary:
+                        self.stats["hedges_won"] += 1
+                    return future.result()
+                errors.append(future.exception())
+        # Both copies failed; prefer a real error over "no other replica for the hedge".
+        real_errors = [e for e in errors if not isinstance(e, NoHealthyEndpointError)]
+        raise (real_errors or errors)[0]
+
+    # --- 4. Public API ---
+    def request(self, path: str, payload: dict, session_id=None, cancel=None,
+                priority: int = INTERACTIVE, tenant: str = "default") -> dict:
+        """Sends `payload` to `path` on the best replica and returns the complete JSON response."""
+        if self.hedge and path in STREAMING_PATHS:
+            return self._hedged_call(path, payload, session_id, cancel, priority, tenant)
+        return self._call(path, payload, session_id, cancel, priority, tenant)
+
+    def generate(self, model: str, prompt: str, session_id=None, cancel=None,
+                 priority: int = INTERACTIVE, tenant: str = "default", **fields) -> dict:
+        """/api/generate; extra fields (options, context, format...) pass through."""
+        return self.request("/api/generate", {"model": model, "prompt": prompt, **fields},
+                            session_id, cancel, priority, tenant)
+
+    def chat(self, model: str, messages: list, session_id=None, cancel=None,
+             priority: int = INTERACTIVE, tenant: str = "default", **fields) -> dict:
+        return self.request("/api/chat", {"model": model, "messages": messages, **fields},
+                            session_id, cancel, priority, tenant)
+
+    def embed(self, model: str, input, priority: int = INTERACTIVE, tenant: str = "default", **fields) -> dict:
+        """/api/embed; `input` may be a single string or a list of strings."""
+        return self.request("/api/embed", {"model": model, "input": input, **fields},
+                            priority=priority, tenant=tenant)
+
+
+# Shared instance used by the examples
+client = OllamaClient()
@@ -0,0 +1,324 @@
+"""
+Local Repair of Malformed JSON / XML Output
+When PydanticOutputParser, JsonOutputParser or XMLOutputParser fail, the only remedy
+used to be asking the model again - a full generation. Most failures are cosmetic and
+are fixed here, locally, before any retry:
+
+- JSON: code fences, prose before/after the object, single quotes, Python literals
+  (True/None), unquoted keys, trailing commas, unbalanced brackets or strings from a
+  truncated answer; then type coercion against the Pydantic model ("5 minutes" -> 5,
+  "eggs, butter" -> ["eggs", "butter"], "Prep Time Minutes" -> prep_time_minutes).
+- XML: code fences and prose, bare "&", stray closing tags, unclosed tags, several
+  top-level elements (wrapped in one <output> root).
+
+    from outputrepair import repairing, repair_stats
+
+    chain = prompt | llm | repairing(PydanticOutputParser(pydantic_object=Recipe))
+    print(repair_stats.report())     # how many re-asks the repair stage avoided
+
+`python outputrepair.py` runs the repair corpus below as a self-check.
+"""
+import json
+import re
+import threading
+import typing
+import xml.etree.ElementTree as ET
+
+from lazyimports import lazy_import
+
+lc_exceptions = lazy_import("langchain_core.exceptions")
+lc_output_parsers = lazy_import("langchain_core.output_parsers")
+lc_runnables = lazy_import("langchain_core.runnables")
+
+_FENCE = re.compile(r"```[\w-]*\s*(.*?)(?:```|$)", re.DOTALL)
+_XML_ENTITY = re.compile(r"&(?!(?:amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)")
+_XML_TAG = re.compile(r"<(/?)([A-Za-z_][\w.-]*)[^<>]*?(/?)>")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def _strip_fences(text: str) -> str:
+    match = _FENCE.search(text)
+    return match.group(1) if match else text
+
+
+# --- 1. JSON ---
+def _extract_json(text: str) -> str:
+    """From the first { or [ to its matching close (or the end, if the answer was cut off)."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    start = min(starts)
+    depth, quote, escape = 0, None, False
+    for i in range(start, len(text)):
+        c = text[i]
+        if quote:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _split_strings(text: str) -> list:
+    """[(is_string, segment)]; single-quoted strings come back re-encoded with double quotes."""
+    parts, buf, quote, escape = [], [], None, False
+    for c in text:
+        if quote is None:
+            if c in "\"'":
+                parts.append((False, "".join(buf)))
+                buf, quote = [], c
+            else:
+                buf.append(c)
+        elif escape:
+            buf.append(c)
+            escape = False
+        elif c == "\\":
+            buf.append(c)
+            escape = True
+        elif c == quote:
+            body = "".join(buf)
+            if quote == "'":
+                body = json.dumps(body.replace("\\'", "'"))[1:-1]
+            parts.append((True, f'"{body}"'))
+            buf, quote = [], None
+        else:
+            buf.append(c)
+    if quote is not None:
+        body = "".join(buf)
+        if escape:
+            body = body[:-1]
+        parts.append((True, '"' + (json.dumps(body)[1:-1] if quote == "'" else body) + '"'))  # truncated string
+    else:
+        parts.append((False, "".join(buf)))
+    return parts
+
+
+def _fix_bare(segment: str) -> str:
+    segment = re.sub(r"\bTrue\b", "true", segment)
+    segment = re.sub(r"\bFalse\b", "false", segment)
+    segment = re.sub(r"\bNone\b", "null", segment)
+    return re.sub(r"([{,]\s*)([A-Za-z_]\w*)(\s*:)", r'\1"\2"\3', segment)  # unquoted keys
+
+
+def _balance(text: str) -> str:
+    # Drop a dangling `, "key":` or trailing comma left by a cut-off answer.
+    text = re.sub(r'(,\s*)?"[^"]*"\s*:\s*$', "", text.rstrip())
+    text = re.sub(r",\s*$", "", text)
+    closers = []
+    for is_string, segment in _split_strings(text):
+        if is_string:
+            continue
+        for c in segment:
+            if c in "{[":
+                closers.append("}" if c == "{" else "]")
+            elif c in "}]" and closers:
+                closers.pop()
+    return text + "".join(reversed(closers))
+
+
+def repair_json(text: str) -> str:
+    text = _extract_json(_strip_fences(text)).strip()
+    text = "".join(segment if is_string else _fix_bare(segment) for is_string, segment in _split_strings(text))
+    text = _balance(text)
+    return re.sub(r",(\s*[}\]])", r"\1", text)  # trailing commas
+
+
+def _field_name(key: str, names: dict) -> str:
+    return names.get(re.sub(r"[\s-]+", "_", key.strip()).lower(), key)
+
+
+def coerce_fields(data: dict, model_cls) -> dict:
+    """Best-effort conversion of `data` towards `model_cls`'s field types and names."""
+    fields = model_cls.model_fields
+    names = {name.lower(): name for name in fields}
+    coerced = {}
+    for key, value in data.items():
+        name = _field_name(key, names)
+        annotation = fields[name].annotation if name in fields else None
+        if annotation in (int, float) and isinstance(value, str):
+            match = _NUMBER.search(value)
+            if match:
+                value = annotation(float(match.group()))
+        elif typing.get_origin(annotation) is list and isinstance(value, str):
+            value = [item.strip(" -*•") for item in re.split(r",|;|\n", value) if item.strip(" -*•")]
+        elif annotation is str and isinstance(value, (int, float)):
+            value = str(value)
+        elif annotation is str and isinstance(value, list):
+            value = ", ".join(map(str, value))
+        coerced[name] = value
+    return coerced
+
+
+def parse_json_output(text: str, model_cls=None):
+    """Repairs and parses `text`; with `model_cls`, coerces and validates it into the model."""
+    data = json.loads(repair_json(text))
+    if model_cls is None:
+        return data
+    return model_cls.model_validate(coerce_fields(data, model_cls) if isinstance(data, dict) else data)
+
+
+# --- 2. XML ---
+def repair_xml(text: str) -> str:
+    text = _strip_fences(text)
+    start = text.find("<")
+    if start == -1:
+        return text
+    text = _XML_ENTITY.sub("&amp;", text[start:])
+    out, stack, last, roots = [], [], 0, 0
+    for match in _XML_TAG.finditer(text):
+        if stack:
+            out.append(text[last:match.start()])  # prose between top-level elements is dropped
+        closing, name, self_closing = match.group(1), match.group(2), match.group(3)
+        if closing:
+            if name in stack:
+                while stack[-1] != name:
+                    out.append(f"</{stack.pop()}>")  # close what the model forgot to close
+                stack.pop()
+                out.append(match.group(0))
+            # else: a stray closing tag - dropped
+        else:
+            roots += not stack
+            out.append(match.group(0))
+            if not self_closing:
+                stack.append(name)
+        last = match.end()
+    if stack:
+        out.append(text[last:].split("<")[0])  # the cut-off element's text, without its half-written tag
+    out.extend(f"</{name}>" for name in reversed(stack))
+    xml = "".join(out)
+    return f"<output>{xml}</output>" if roots > 1 else xml
+
+
+# --- 3. Parser Wrapper ---
+class RepairStats:
+    def __init__(self):
+        self.counts = {"parsed": 0, "repaired": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def report(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        failures = counts["repaired"] + counts["failed"]
+        return {**counts, "retries_avoided": counts["repaired"],
+                "retry_avoided_rate": counts["repaired"] / failures if failures else 0.0}
+
+
+# Shared instance the wrapped parsers report to
+repair_stats = RepairStats()
+
+
+def repair_and_parse(parser, text: str):
+    """parser.parse(text); if that fails, parses the locally repaired text instead."""
+    try:
+        result = parser.parse(text)
+        repair_stats.record("parsed")
+        return result
+    except lc_exceptions.OutputParserException as first_error:
+        try:
+            if isinstance(parser, lc_output_parsers.XMLOutputParser):
+                result = parser.parse(repair_xml(text))
+            else:
+                model_cls = getattr(parser, "pydantic_object", None)
+                data = json.loads(repair_json(text))
+                if model_cls is not None and isinstance(data, dict):
+                    data = coerce_fields(data, model_cls)
+                result = parser.parse(json.dumps(data))
+        except Exception:
+            repair_stats.record("failed")
+            raise first_error  # the caller may still re-ask the model
+        repair_stats.record("repaired")
+        return result
+
+
+def repairing(parser):
+    """`parser` as a runnable with the local repair stage in front of any retry."""
+    return lc_runnables.RunnableLambda(lambda message: repair_and_parse(parser, getattr(message, "content", message)))
+
+
+# --- 4. Repair Corpus ---
+# (kind, raw model output, expected parse) - failures seen from llama3/mistral
+CORPUS = [
+    ("json", '{"dish_name": "Eggs", "ingredients": ["eggs"], "prep_time_minutes": 5}',
+     {"dish_name": "Eggs", "ingredients": ["eggs"], "prep_time_minutes": 5}),
+    ("json", 'Here is the recipe:\n```json\n{"dish_name": "Eggs", "ingredients": ["eggs", "butter"], "prep_time_minutes": 5}\n```\nEnjoy!',
+     {"dish_name": "Eggs", "ingredients": ["eggs", "butter"], "prep_time_minutes": 5}),
+    ("json", "{'dish_name': 'Chef\\'s Toast', 'ingredients': ['bread'], 'prep_time_minutes': 3}",
+     {"dish_name": "Chef's Toast", "ingredients": ["bread"], "prep_time_minutes": 3}),
+    ("json", '{"dish_name": "Pancakes", "ingredients": ["flour", "milk",], "prep_time_minutes": 20,}',
+     {"dish_name": "Pancakes", "ingredients": ["flour", "milk"], "prep_time_minutes": 20}),
+    ("json", '{"dish_name": "Soup", "ingredients": ["tomato", "basil"], "prep_time_minutes": "60 minutes"}',
+     {"dish_name": "Soup", "ingredients": ["tomato", "basil"], "prep_time_minutes": 60}),
+    ("json", '{"dish_name": "Guacamole", "ingredients": "avocado, lime, salt", "prep_time_minutes": "about 10"}',
+     {"dish_name": "Guacamole", "ingredients": ["avocado", "lime", "salt"], "prep_time_minutes": 10}),
+    ("json", '{"dish_name": "Omelette", "ingredients": ["eggs", "cheese"], "prep_time_minutes": 8',
+     {"dish_name": "Omelette", "ingredients": ["eggs", "cheese"], "prep_time_minutes": 8}),
+    ("json", '{"dish_name": "Rice", "prep_time_minutes": 25, "ingredients": ["rice", "wat',
+     {"dish_name": "Rice", "prep_time_minutes": 25, "ingredients": ["rice", "wat"]}),
+    ("json", '{dish_name: "Salad", ingredients: ["lettuce"], prep_time_minutes: 5}',
+     {"dish_name": "Salad", "ingredients": ["lettuce"], "prep_time_minutes": 5}),
+    ("json", '{"Dish Name": "Tea", "Ingredients": ["tea", "water"], "Prep Time Minutes": 4}',
+     {"dish_name": "Tea", "ingredients": ["tea", "water"], "prep_time_minutes": 4}),
+    ("json", '{"dish_name": "Curry {mild}", "ingredients": ["chicken"], "prep_time_minutes": 40} Note: serve hot!',
+     {"dish_name": "Curry {mild}", "ingredients": ["chicken"], "prep_time_minutes": 40}),
+    ("json", '{"dish_name": "Porridge", "ingredients": ["oats"], "prep_time_minutes": 5, "vegan": True, "notes": None}',
+     {"dish_name": "Porridge", "ingredients": ["oats"], "prep_time_minutes": 5}),
+    ("xml", "<dish_name>Eggs</dish_name>", {"dish_name": "Eggs"}),
+    ("xml", "Sure!\n```xml\n<recipe><dish_name>Eggs</dish_name><prep_time_minutes>5</prep_time_minutes></recipe>\n```",
+     {"recipe": [{"dish_name": "Eggs"}, {"prep_time_minutes": "5"}]}),
+    ("xml", "<recipe><dish_name>Mac & Cheese</dish_name></recipe>", {"recipe": [{"dish_name": "Mac & Cheese"}]}),
+    ("xml", "<recipe><dish_name>Eggs</dish_name><ingredients>eggs, butter</recipe>",
+     {"recipe": [{"dish_name": "Eggs"}, {"ingredients": "eggs, butter"}]}),
+    ("xml", "<recipe><dish_name>Eggs</dish_name></ingredients><prep_time_minutes>5</prep_time_minutes></recipe> Hope this helps",
+     {"recipe": [{"dish_name": "Eggs"}, {"prep_time_minutes": "5"}]}),
+    ("xml", "<dish_name>Eggs</dish_name>\n<prep_time_minutes>5</prep_time_minutes>",
+     {"output": [{"dish_name": "Eggs"}, {"prep_time_minutes": "5"}]}),
+    ("xml", "<recipe><dish_name>Eggs</dish_name><prep_time_minutes>5</prep_ti",
+     {"recipe": [{"dish_name": "Eggs"}, {"prep_time_minutes": "5"}]}),
+]
+
+
+def _xml_to_dict(element) -> dict:
+    """Same shape as XMLOutputParser's result."""
+    if element.text and element.text.strip() or len(element) == 0:
+        return {element.tag: element.text}
+    return {element.tag: [_xml_to_dict(child) for child in element]}
+
+
+if __name__ == "__main__":
+    import sys
+
+    from pydantic import BaseModel
+
+    class Recipe(BaseModel):
+        dish_name: str
+        ingredients: list[str] = []
+        prep_time_minutes: int
+
+    failures = 0
+    for kind, raw, expected in CORPUS:
+        try:
+            if kind == "json":
+                got = parse_json_output(raw, Recipe).model_dump(exclude_unset=True)
+            else:
+                got = _xml_to_dict(ET.fromstring(repair_xml(raw)))
+        except Exception as e:
+            got = f"{type(e).__name__}: {e}"
+        ok = got == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {kind}: {raw[:60]!r}" + ("" if ok else f"\n     got {got}\n     expected {expected}"))
+    print(f"\n{len(CORPUS) - failures}/{len(CORPUS)} repaired")
+    sys.exit(1 if failures else 0)
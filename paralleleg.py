@@ -1,65 +1,97 @@
-# pip install httpx
 import asyncio
-import httpx
 import json
 
+from admission import ServerBusyError
+from deadlines import CancelToken, DeadlineExceeded, deadline_scope
+from ollamaclient import OllamaClient
+
 # --- 1. Configuration ---
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "llama3"
-TIMEOUT_SECONDS = 300.0
+TIMEOUT_SECONDS = 300.0             # hard cap for any single call
+WORKFLOW_DEADLINE_SECONDS = 120.0   # budget for the whole report
+ANALYST_SHARE = 0.6                 # analysts get 60% of it, the aggregator the rest
+# Requests are spread over the replicas in OLLAMA_ENDPOINTS (see loadbalancer.py).
+# hedge=True: a call slower than the model's p95 is duplicated on another replica.
+client = OllamaClient(timeout=TIMEOUT_SECONDS, hedge=True)
+
 # --- 2. Worker Function (Async) ---
 async def fetch_ollama_response(prompt: str, task_name: str) -> dict:
     """Asynchronously calls the Ollama API for a specific task."""
     print(f"🤖 Starting {task_name}...")
     
-    # Payload for the Ollama /generate endpoint
-    payload = {
-        "model": MODEL_NAME,
-        "prompt": f"You are a specialized {task_name}. {prompt}. Output only the result.",
-        "stream": False 
+    # The shared client is blocking, so it runs in a worker thread;
+    # the analyst tasks still overlap and each one goes to the least busy replica.
+    # The current deadline travels into the thread with the context.
+    cancel = CancelToken()
+    try:
+        data = await asyncio.to_thread(
+            client.generate,
+            MODEL_NAME,
+            f"You are a specialized {task_name}. {prompt}. Output only the result.",
+            cancel=cancel,
+        )
+    except asyncio.CancelledError:
+        # Nobody is waiting for this result any more: close the HTTP stream so the
+        # replica stops generating instead of finishing an answer we will throw away.
+        cancel.cancel()
+        raise
+    print(f"✅ {task_name} finished.")
+    return {
+        "task_name": task_name,
+        "result": data.get("response", "No response found")
     }
-    
-    # Use httpx for asynchronous requests
-    async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
-        response = await client.post(OLLAMA_URL, json=payload)
-        response.raise_for_status()
-        
-        # Ollama returns a JSON response; extract the final 'response' field
-        data = response.json()
-        print(f"✅ {task_name} finished.")
-        return {
-            "task_name": task_name,
-            "result": data.get("response", "No response found")
-        }
 
 # --- 3. Coordinator/Aggregator Function ---
-async def run_parallel_analysis(user_query: str):
+async def run_parallel_analysis(user_query: str, deadline_seconds: float = WORKFLOW_DEADLINE_SECONDS):
     # --- Parallel Tasks Definition ---
     prompts_and_tasks = [
         (f"Analyze the market sentiment for 'Tesla' based on general news over the past 48 hours. Query: {user_query}", "Sentiment Analyst"),
         (f"Determine the key financial risks for 'Tesla' in Q3 2024 based on expert opinions. Query: {user_query}", "Financial Risk Analyst")
     ]
-    
-    # Create the list of concurrent tasks
-    tasks = [
-        fetch_ollama_response(prompt, task_name)
-        for prompt, task_name in prompts_and_tasks
-    ]
-    
-    # Run all tasks concurrently
-    parallel_results = await asyncio.gather(*tasks)
-    
-    # --- Aggregation (Final Ollama Call) ---
-    aggregation_prompt = f"""
-    You are the Final Investment Strategist. Synthesize the following two reports into a single, cohesive investment recommendation for Tesla.
-    
-    1. Sentiment Report: {parallel_results[0]['result']}
-    2. Financial Risk Report: {parallel_results[1]['result']}
-    
-    Provide a final 'BUY', 'HOLD', or 'SELL' recommendation and a brief justification.
-    """
 
-    final_result = await fetch_ollama_response(aggregation_prompt, "Aggregator")
+    with deadline_scope(deadline_seconds) as workflow:
+        # The analysts share a sub-deadline so the aggregator always has time left.
+        with deadline_scope(workflow.remaining() * ANALYST_SHARE) as analysts:
+            # Create the concurrent tasks (each copies the current context, deadline included)
+            tasks = [
+                asyncio.create_task(fetch_ollama_response(prompt, task_name))
+                for prompt, task_name in prompts_and_tasks
+            ]
+
+            # Run all tasks concurrently, but never past the analysts' deadline:
+            # one slow analyst no longer stalls the whole report.
+            done, pending = await asyncio.wait(tasks, timeout=analysts.remaining())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        parallel_results = []
+        for task, (_, task_name) in zip(tasks, prompts_and_tasks):
+            if task in done and task.exception() is None:
+                parallel_results.append(task.result())
+            elif task in done and isinstance(task.exception(), ServerBusyError):
+                # Shed by admission control: write the report without this analyst.
+                print(f"🚦 {task_name} skipped: {task.exception()}")
+                parallel_results.append({"task_name": task_name, "result": "(report unavailable: server busy)"})
+            elif task not in done or isinstance(task.exception(), DeadlineExceeded):
+                print(f"⏱️ {task_name} missed the deadline: {task.exception() if task in done else 'cancelled'}")
+                parallel_results.append({"task_name": task_name, "result": "(report unavailable: deadline exceeded)"})
+            else:
+                # Connection errors, HTTP 5xx on every replica, ...: a failure, not a timeout.
+                print(f"❌ {task_name} failed: {task.exception()!r}")
+                parallel_results.append({"task_name": task_name, "result": "(report unavailable: analysis failed)"})
+
+        # --- Aggregation (Final Ollama Call) ---
+        aggregation_prompt = f"""
+        You are the Final Investment Strategist. Synthesize the following two reports into a single, cohesive investment recommendation for Tesla.
+        
+        1. Sentiment Report: {parallel_results[0]['result']}
+        2. Financial Risk Report: {parallel_results[1]['result']}
+        
+        Provide a final 'BUY', 'HOLD', or 'SELL' recommendation and a brief justification.
+        """
+
+        final_result = await fetch_ollama_response(aggregation_prompt, "Aggregator")
     return final_result
 
 # --- 4. Run the Workflow ---
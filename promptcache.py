@@ -0,0 +1,129 @@
+"""
+Static-Prefix Prompt Caching
+Ollama keeps the KV cache of the last prompt each loaded model processed, and a new
+prompt that starts with the same tokens only prefills what comes after the shared
+prefix. That cache lives in one runner on one replica and is gone once the model
+unloads, so a template only hits it reliably if:
+
+- all static content (instructions, few-shot examples) comes first and is byte-identical
+  on every call - here it is a constant system message, the variable part follows;
+- its calls go to the same replica - each template has its own load-balancer session;
+- the model stays loaded - each template pins a long keep_alive.
+
+StaticPrefixPrompt bundles the three. prefix_stats measures what the cache saved from
+the prompt_eval_count / prompt_eval_duration that Ollama returns with every answer.
+
+    CLASSIFY = StaticPrefixPrompt("classify", system=INSTRUCTIONS_AND_EXAMPLES, template='Review: "{review}"')
+
+    messages = CLASSIFY.messages(review=text)
+    reply = client.chat("llama3", messages, **CLASSIFY.request_fields())
+    CLASSIFY.record(messages, reply)
+
+    rag_chain = {...} | CLASSIFY.chat_prompt() | CLASSIFY.bind_model(get_model("llama3")) | parser
+    print(prefix_stats.report())
+"""
+import hashlib
+import threading
+
+from lazyimports import lazy_import
+from loadbalancer import balancer
+from tokencount import count_tokens, sizer
+
+lc_prompts = lazy_import("langchain_core.prompts")
+lc_runnables = lazy_import("langchain_core.runnables")
+
+# --- 1. Configuration ---
+PREFIX_KEEP_ALIVE = "30m"  # keeps the model - and with it the cached prefix - loaded between calls
+
+
+# --- 2. Savings Measurement ---
+class PrefixCacheStats:
+    """
+    Per-template prefill accounting. Ollama's prompt_eval_count only counts the tokens it
+    actually evaluated, so estimated prompt tokens minus evaluated tokens were served from
+    the cache; they are priced at the template's measured prefill speed.
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, prompt_text: str, metadata: dict):
+        """`metadata` is an Ollama response or a LangChain message's response_metadata."""
+        evaluated = (metadata or {}).get("prompt_eval_count")
+        if evaluated is None:
+            return
+        with self._lock:
+            t = self._templates.setdefault(name, {"calls": 0, "prompt_tokens": 0, "prefilled_tokens": 0, "prefill_ns": 0})
+            t["calls"] += 1
+            t["prompt_tokens"] += max(count_tokens(prompt_text), evaluated)
+            t["prefilled_tokens"] += evaluated
+            t["prefill_ns"] += metadata.get("prompt_eval_duration") or 0
+
+    def report(self) -> dict:
+        report = {}
+        with self._lock:
+            for name, t in self._templates.items():
+                cached = t["prompt_tokens"] - t["prefilled_tokens"]
+                ns_per_token = t["prefill_ns"] / t["prefilled_tokens"] if t["prefilled_tokens"] else 0.0
+                report[name] = {
+                    "calls": t["calls"],
+                    "prompt_tokens": t["prompt_tokens"],
+                    "prefilled_tokens": t["prefilled_tokens"],
+                    "cached_tokens": cached,
+                    "cache_hit_rate": cached / t["prompt_tokens"] if t["prompt_tokens"] else 0.0,
+                    "prefill_ms": t["prefill_ns"] / 1e6,
+                    "prefill_ms_saved": cached * ns_per_token / 1e6,
+                }
+        return report
+
+
+# Shared instance the templates report to
+prefix_stats = PrefixCacheStats()
+
+
+# --- 3. Templates ---
+class StaticPrefixPrompt:
+    def __init__(self, name: str, system: str, template: str, keep_alive=PREFIX_KEEP_ALIVE):
+        self.name = name
+        self.system = system
+        self.template = template
+        self.keep_alive = keep_alive
+        # A new prefix gets a new session, so it may land on (and warm) another replica.
+        self.session_id = f"prefix-{name}-{hashlib.sha256(system.encode('utf-8')).hexdigest()[:12]}"
+
+    def messages(self, **values) -> list:
+        """The static system message, then the filled-in variable part."""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.template.format(**values)},
+        ]
+
+    def request_fields(self) -> dict:
+        """Extra arguments for client.chat/generate: replica pinning and keep_alive."""
+        return {"session_id": self.session_id, "keep_alive": self.keep_alive}
+
+    def record(self, messages: list, response: dict):
+        prefix_stats.record(self.name, "".join(m["content"] for m in messages), response)
+
+    # LangChain equivalents
+    def chat_prompt(self):
+        """ChatPromptTemplate with the static part as a literal system message."""
+        system = self.system.replace("{", "{{").replace("}", "}}")
+        return lc_prompts.ChatPromptTemplate.from_messages([("system", system), ("human", self.template)])
+
+    def chat_model_options(self) -> dict:
+        """Options for modelregistry.get_model() that pin the template's replica and keep_alive."""
+        return {"base_url": balancer.pick_url(session_id=self.session_id), "keep_alive": self.keep_alive}
+
+    def bind_model(self, llm):
+        """
+        Wraps a chat model so every call through it gets a num_ctx sized for its prompt
+        (tokencount.py) and is recorded in prefix_stats.
+        """
+        def invoke(prompt_value):
+            prompt_text = prompt_value.to_string()
+            message = sizer.sized_chat_model(llm, prompt_text).invoke(prompt_value)
+            prefix_stats.record(self.name, prompt_text, message.response_metadata)
+            return message
+        return lc_runnables.RunnableLambda(invoke)
@@ -1,18 +1,13 @@
 
-import requests
 import json
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+from ollamaclient import client
+
 MODEL = "llama3"
 
 def ollama_chat(prompt):
-    payload = {
-        "model": MODEL,
-        "prompt": prompt,
-        "stream": False
-    }
-    r = requests.post(OLLAMA_URL, json=payload)
-    return r.json()["response"]
+    # Routed over the configured Ollama replicas (see ollamaclient.py / loadbalancer.py)
+    return client.generate(MODEL, prompt)["response"]
 
 
 
@@ -13,8 +13,9 @@ template = ChatPromptTemplate.from_messages([
     ("human", "What is the best dish to prepare with {ingredient}?"),
 ])
 
-# Generate the final prompt (still a standard LangChain message object)
-prompt_value = template.invoke({"cuisine": "Indian", "ingredient": "lentils"})
+if __name__ == "__main__":
+    # Generate the final prompt (still a standard LangChain message object)
+    prompt_value = template.invoke({"cuisine": "Indian", "ingredient": "lentils"})
 
-print("\n--- Generated Prompt ---")
-print(prompt_value.to_string())
\ No newline at end of file
+    print("\n--- Generated Prompt ---")
+    print(prompt_value.to_string())
@@ -1,9 +1,15 @@
 #Often, you don't just want text back from the LLM; you want structured data (like JSON) so your code can easily process it. This uses a Pydantic Schema and a special parser.
+#The schema is passed to Ollama's `format` parameter, which constrains decoding to it: the answer always parses, and the prompt no longer needs the long format instructions.
 
 from langchain_ollama import ChatOllama
+from langchain_core.exceptions import OutputParserException
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from langchain_core.output_parsers import PydanticOutputParser
+from outputrepair import repair_stats, repairing
+from streamingjson import FieldValidationError, iter_partial_models
+from structuredoutput import constrained_model, stats
+import time
 
 # 1. Define the desired output structure using Pydantic
 class Recipe(BaseModel):
@@ -14,18 +20,21 @@ class Recipe(BaseModel):
 
 # 2. Setup the Parser and the Model
 parser = PydanticOutputParser(pydantic_object=Recipe)
-ollama_model = ChatOllama(model="llama3", temperature=0)
+# Recipe's JSON schema goes to Ollama as `format`: the model can only produce matching JSON.
+ollama_model = constrained_model(Recipe, temperature=0)
 
-# 3. Define the Prompt Template
+# 3. Define the Prompt Template (no format instructions: the schema is enforced by the server)
 prompt = ChatPromptTemplate.from_messages(
     [
-        ("system", "You are an expert chef. Your goal is to extract recipe information from the user's text and format it perfectly as JSON according to the following schema:\n{format_instructions}"),
+        ("system", "You are an expert chef. Extract the recipe information from the user's text as JSON."),
         ("human", "{user_input}")
     ]
-).partial(format_instructions=parser.get_format_instructions())
+)
 
 # 4. Create the Chain and Invoke
-structured_chain = prompt | ollama_model | parser
+# Same as prompt | ollama_model | parser, but every call is counted in structuredoutput.stats
+# The parser repairs malformed output locally (outputrepair.py) before giving up.
+structured_chain = stats.measure("schema", prompt, ollama_model, repairing(parser))
 
 user_input = "Tell me about a quick recipe for scrambled eggs. It should take about 5 minutes."
 
@@ -36,4 +45,38 @@ recipe_object = structured_chain.invoke({"user_input": user_input})
 print(f"Dish Name (Type: {type(recipe_object.dish_name)}): {recipe_object.dish_name}")
 print(f"Ingredients List (Type: {type(recipe_object.ingredients)}): {recipe_object.ingredients}")
 print(f"Preparation Time (Type: {type(recipe_object.prep_time_minutes)}): {recipe_object.prep_time_minutes}")
-#
\ No newline at end of file
+
+# 5. Stream it: each field is validated as soon as it is complete (dish_name arrives first),
+# and an invalid field aborts the generation instead of waiting for the end.
+print("\n--- Streaming Partial Recipe ---")
+start = time.perf_counter()
+try:
+    for partial_recipe in iter_partial_models(Recipe, (prompt | ollama_model).stream({"user_input": user_input})):
+        print(f"{time.perf_counter() - start:.2f}s {partial_recipe!r}")
+except FieldValidationError as e:
+    print(f"Aborted after {time.perf_counter() - start:.2f}s: {e}")
+
+# 6. Compare with the old approach: format instructions in the prompt, unconstrained output
+instructions_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", "You are an expert chef. Your goal is to extract recipe information from the user's text and format it perfectly as JSON according to the following schema:\n{format_instructions}"),
+        ("human", "{user_input}")
+    ]
+).partial(format_instructions=parser.get_format_instructions())
+instructions_chain = stats.measure("instructions", instructions_prompt, ChatOllama(model="llama3", temperature=0), repairing(parser))
+
+test_inputs = [
+    "Pancakes: flour, milk, eggs and a pinch of sugar, ready in 20 minutes.",
+    "My grandmother's tomato soup takes an hour; tomatoes, onion, garlic, basil.",
+    "Guacamole - mash avocados with lime, salt and cilantro. Ten minutes tops.",
+]
+for text in test_inputs:
+    for chain in (structured_chain, instructions_chain):
+        try:
+            chain.invoke({"user_input": text})
+        except OutputParserException:
+            pass  # counted as a parse failure
+
+print("\n--- Schema vs. Format Instructions ---")
+print(stats.report())
+print("Local repair:", repair_stats.report())
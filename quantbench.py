@@ -0,0 +1,86 @@
+"""
+Quantized Storage Benchmark
+Builds the same index (vectorindex.py) with float32, float16, int8 and PQ vector storage
+and reports, for each, the index size in memory, recall@k against exact float32 search
+and the mean query latency - with and without exact re-ranking of RERANK_FACTOR * k
+candidates from the memory-mapped float32 vectors.
+
+    python quantbench.py                           # synthetic clustered vectors, 768 dims
+    python quantbench.py --n 1000000 --kind ivf
+    python quantbench.py --vectors embeddings.npy  # real embeddings (float32, one per row)
+
+The float32 vectors used for re-ranking stay on disk; only the candidates' rows are read.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from annsweep import recall_at_k, synthetic_vectors
+from vectorindex import RERANK_FACTOR, create_index, rerank, save_exact_vectors
+
+QUANTIZATIONS = (None, "fp16", "int8", "pq")
+
+
+def index_bytes(index) -> int:
+    """Serialized size: the codes plus codebooks, graph links or inverted lists."""
+    return faiss.serialize_index(index).nbytes
+
+
+def timed_search(index, queries, k, exact_vectors=None, factor=1):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k * factor)
+    if exact_vectors is not None:
+        _, ids = rerank(queries, ids, exact_vectors, k)
+    return ids, 1000 * (time.perf_counter() - start) / len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=100_000, help="number of synthetic vectors")
+    parser.add_argument("--d", type=int, default=768, help="dimensions (nomic-embed-text: 768)")
+    parser.add_argument("--vectors", help=".npy file with real embeddings instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kind", default="flat", choices=["flat", "ivf", "hnsw"])
+    parser.add_argument("--rerank", type=int, default=RERANK_FACTOR, help="candidates fetched per result")
+    args = parser.parse_args(argv)
+
+    faiss.omp_set_num_threads(1)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.n + args.queries, args.d)
+    vectors, queries = vectors[:-args.queries], vectors[-args.queries:]
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}, index={args.kind}")
+
+    flat = create_index(vectors, "flat", None)
+    flat.add(vectors)
+    _, truth = flat.search(queries, args.k)
+
+    with tempfile.TemporaryDirectory(prefix="quantbench-") as tmp:
+        exact_path = os.path.join(tmp, "vectors.npy")
+        exact = save_exact_vectors(vectors, exact_path)
+
+        print(f"\n{'storage':<8} {'rerank':<7} {'bytes/vec':>9} {'index MB':>9} {'saved':>7} {'recall@k':>9} {'ms/query':>9}")
+        baseline = None
+        for quantization in QUANTIZATIONS:
+            index = create_index(vectors, args.kind, quantization)
+            index.add(vectors)
+            size = index_bytes(index)
+            baseline = baseline or size
+            name = quantization or "fp32"
+            runs = [("-", None, 1)] if quantization is None else [("no", None, 1), (f"{args.rerank}x", exact, args.rerank)]
+            for label, exact_vectors, factor in runs:
+                ids, ms = timed_search(index, queries, args.k, exact_vectors, factor)
+                print(f"{name:<8} {label:<7} {size / len(vectors):>9.1f} {size / 2**20:>9.1f} "
+                      f"{1 - size / baseline:>6.0%} {recall_at_k(ids, truth):>9.3f} {ms:>9.3f}")
+        print(f"\nre-rank vectors on disk: {os.path.getsize(exact_path) / 2**20:.1f} MB, memory-mapped (removed on exit)")
+        del exact, exact_vectors  # unmap before the directory is removed
+
+
+if __name__ == "__main__":
+    main()
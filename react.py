@@ -1,17 +1,23 @@
-import requests
 import json
+import uuid
+
+from ollamaclient import client
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL = "llama3"
 
+def ollama_step(prompt, context=None, session_id=None):
+    """
+    One /api/generate call; returns the full response. Passing the previous step's
+    `context` continues from where the model stopped, so only `prompt` is new prefill.
+    Steps of one run share a `session_id` so they land on the replica holding that context.
+    """
+    # Routed over the configured Ollama replicas (see ollamaclient.py / loadbalancer.py)
+    fields = {"context": context} if context else {}
+    return client.generate(MODEL, prompt, session_id=session_id, **fields)
+
+
 def ollama_chat(prompt):
-    payload = {
-        "model": MODEL,
-        "prompt": prompt,
-        "stream": False
-    }
-    r = requests.post(OLLAMA_URL, json=payload)
-    return r.json()["response"]
+    return ollama_step(prompt)["response"]
 
 
 def calculator(expression):
@@ -21,7 +27,14 @@ def calculator(expression):
         return "Error evaluating expression."
 
 
-def react(prompt):
+def react(prompt, continue_context=True, prefill=None, session_id=None):
+    """
+    continue_context=False pastes the first answer back into a fresh prompt instead
+    (the old behaviour, kept for agentbench.py). If `prefill` is a list, each step's
+    prompt_eval_count is appended to it. Every step of the run is pinned to one replica
+    through `session_id` (a fresh one per run by default).
+    """
+    session_id = session_id or f"react-{uuid.uuid4().hex}"
     # 1. Ask LLM to produce reasoning + an action
     reasoning_prompt = f"""
 You are using ReAct.
@@ -34,7 +47,10 @@ Your response format:
 Thought: ...
 Action: <tool>[<input>]
 """
-    thoughts = ollama_chat(reasoning_prompt + "\nUser query: " + prompt)
+    step = ollama_step(reasoning_prompt + "\nUser query: " + prompt, session_id=session_id)
+    thoughts = step["response"]
+    if prefill is not None:
+        prefill.append(step.get("prompt_eval_count"))
     print("LLM Thoughts + Action:\n", thoughts)
 
     # 2. Extract the action
@@ -54,7 +70,17 @@ Action: <tool>[<input>]
     print("\nTool Output:", tool_output)
 
     # 3. Give observation back to LLM
-    final_prompt = f"""
+    if continue_context and step.get("context"):
+        # The model already holds the query and its own thoughts in `context`:
+        # only the observation is new.
+        step = ollama_step(f"""
+        Observation from tool:
+        {tool_output}
+
+        Give final answer now.
+        """, context=step["context"], session_id=session_id)
+    else:
+        step = ollama_step(f"""
         You previously said:
         {thoughts}
 
@@ -62,13 +88,16 @@ Action: <tool>[<input>]
         {tool_output}
 
         Give final answer now.
-        """
+        """, session_id=session_id)
+    if prefill is not None:
+        prefill.append(step.get("prompt_eval_count"))
 
-    final_answer = ollama_chat(final_prompt)
+    final_answer = step["response"]
     print("\nFinal Answer:")
     print(final_answer)
     return final_answer
 
 
 # Test
-react("What is 234 * 89?")
+if __name__ == "__main__":
+    react("What is 234 * 89?")
@@ -0,0 +1,214 @@
+"""
+Model Residency Manager
+The examples alternate between llama3, mistral and nomic-embed-text. Ollama unloads a
+model after 5 idle minutes (or sooner when it needs the memory), and the next call then
+pays `load_duration` - our worst tail-latency source.
+
+The manager records which models are used, keeps the most used ones that fit in the
+memory budget resident (preload + long `keep_alive`), unloads the ones that fell out of
+the hot set, and counts how many cold loads it avoided.
+
+    from residency import manager
+
+    response = ollama.chat(model="llama3", messages=..., keep_alive=manager.keep_alive_for("llama3"))
+    manager.record_response("llama3", response)
+    manager.start()            # rebalance in the background every REBALANCE_INTERVAL_S
+    print(manager.stats)
+
+ollamaclient.client records every response here, but nothing is preloaded or unloaded
+until start() is called: `manager` keeps the hot set resident on every replica in
+loadbalancer.OLLAMA_ENDPOINTS; for a client built on its own LoadBalancer use
+ResidencyManager.for_balancer(balancer) and pass it as OllamaClient(residency=...).
+Models whose decayed usage score drops below MIN_HOT_SCORE leave the hot set, budget or not.
+"""
+import os
+import threading
+import time
+
+from loadbalancer import OLLAMA_ENDPOINTS
+from modelregistry import preload
+
+# --- 1. Configuration ---
+# Ollama's own idle timeout; a model idle for longer would normally be cold again.
+SERVER_DEFAULT_KEEP_ALIVE_S = 300
+HOT_KEEP_ALIVE = "30m"
+COLD_LOAD_THRESHOLD_S = 0.5      # load_duration above this counts as a cold load
+USAGE_HALF_LIFE_S = 600          # usage scores halve every 10 idle minutes
+MIN_HOT_SCORE = 0.5              # one use keeps a model hot for one half-life
+REBALANCE_INTERVAL_S = 60
+# 0 / unset means "no budget": every recently used model may stay resident.
+MEMORY_BUDGET_BYTES = int(float(os.environ.get("OLLAMA_MEMORY_BUDGET_GB", "0")) * 1024 ** 3)
+
+
+def _base_name(name: str) -> str:
+    """'llama3:latest' and 'llama3' are the same model."""
+    return name[:-len(":latest")] if name.endswith(":latest") else name
+
+
+class ResidencyManager:
+    def __init__(self, hosts=None, memory_budget_bytes=MEMORY_BUDGET_BYTES,
+                 hot_keep_alive=HOT_KEEP_ALIVE, half_life_s=USAGE_HALF_LIFE_S, min_score=MIN_HOT_SCORE):
+        self.hosts = list(hosts or OLLAMA_ENDPOINTS)
+        self.memory_budget_bytes = memory_budget_bytes
+        self.hot_keep_alive = hot_keep_alive
+        self.half_life_s = half_life_s
+        self.min_score = min_score
+        self.stats = {"requests": 0, "cold_loads": 0, "cold_loads_avoided": 0, "preloads": 0, "unloads": 0}
+        self._usage = {}      # model -> {"score": float, "last_used": float, "uses": int}
+        self._sizes = {}      # model -> bytes in memory
+        self._resident = set()  # models we are currently keeping hot
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def for_balancer(cls, balancer, **kwargs):
+        """A manager for the replicas behind `balancer` (a loadbalancer.LoadBalancer)."""
+        return cls(hosts=[endpoint.url for endpoint in balancer.endpoints], **kwargs)
+
+    # --- 2. Usage Tracking ---
+    def _score(self, usage: dict, now: float) -> float:
+        return usage["score"] * 0.5 ** ((now - usage["last_used"]) / self.half_life_s)
+
+    def record_use(self, model: str, load_duration_s=None, now=None):
+        """Records one request for `model`; `load_duration_s` comes from the Ollama response."""
+        model = _base_name(model)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            usage = self._usage.get(model)
+            idle_s = None
+            if usage is None:
+                usage = self._usage[model] = {"score": 0.0, "last_used": now, "uses": 0}
+            else:
+                idle_s = now - usage["last_used"]
+            usage["score"] = self._score(usage, now) + 1.0
+            usage["last_used"] = now
+            usage["uses"] += 1
+            self.stats["requests"] += 1
+
+            if load_duration_s is None:
+                return
+            if load_duration_s >= COLD_LOAD_THRESHOLD_S:
+                self.stats["cold_loads"] += 1
+            elif model in self._resident and idle_s is not None and idle_s > SERVER_DEFAULT_KEEP_ALIVE_S:
+                # Warm even though the server would have unloaded it by now.
+                self.stats["cold_loads_avoided"] += 1
+
+    def record_response(self, model: str, response):
+        """
+        Records a request from its response: an Ollama JSON dict, an `ollama` client
+        response, or a LangChain message (which carries it in `response_metadata`).
+        """
+        metadata = getattr(response, "response_metadata", response)
+        load_ns = metadata.get("load_duration") if metadata is not None else None
+        self.record_use(model, load_ns / 1e9 if load_ns is not None else None)
+
+    def keep_alive_for(self, model: str):
+        """The `keep_alive` a caller should send for `model` (None = server default)."""
+        return self.hot_keep_alive if _base_name(model) in self._resident else None
+
+    # --- 3. Server State ---
+    def _get(self, host: str, path: str) -> dict:
+        import requests
+
+        r = requests.get(f"{host}{path}", timeout=5)
+        r.raise_for_status()
+        return r.json()
+
+    def loaded_models(self) -> dict:
+        """{host: {model: bytes in memory}} for the models each replica currently has loaded."""
+        loaded = {}
+        for host in self.hosts:
+            try:
+                models = self._get(host, "/api/ps").get("models", [])
+            except Exception as e:
+                print(f"⚠️ Residency: {host} unreachable: {e}")
+                continue
+            loaded[host] = {_base_name(m["name"]): m.get("size", 0) for m in models}
+            self._sizes.update(loaded[host])
+        return loaded
+
+    def model_size(self, model: str) -> int:
+        """Memory footprint of `model`; falls back to its on-disk size until it has been loaded once."""
+        for host in self.hosts:
+            if model in self._sizes:
+                break
+            try:
+                tags = self._get(host, "/api/tags").get("models", [])
+            except Exception:
+                continue
+            for m in tags:
+                self._sizes.setdefault(_base_name(m["name"]), m.get("size", 0))
+        return self._sizes.get(model, 0)
+
+    # --- 4. Hot Set Selection ---
+    def hot_models(self, now=None) -> list:
+        """The most used models still scoring min_score, in score order, that fit together in the memory budget."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            scores = {m: self._score(usage, now) for m, usage in self._usage.items()}
+        ranked = sorted((m for m, score in scores.items() if score >= self.min_score), key=scores.get, reverse=True)
+        if not self.memory_budget_bytes:
+            return ranked
+        hot, used = [], 0
+        for model in ranked:
+            size = self.model_size(model)
+            if used + size <= self.memory_budget_bytes:
+                hot.append(model)
+                used += size
+        return hot
+
+    def rebalance(self):
+        """On every replica: preloads / refreshes `keep_alive` for the hot set and unloads models that left it."""
+        hot = self.hot_models()
+        for host, loaded in self.loaded_models().items():
+            for model in hot:
+                # Preloading an already resident model just restarts its keep_alive timer.
+                preload(model, keep_alive=self.hot_keep_alive, host=host)
+                if model not in loaded:
+                    self.stats["preloads"] += 1
+            for model in self._resident - set(hot):
+                if model in loaded:
+                    preload(model, keep_alive=0, host=host)
+                    self.stats["unloads"] += 1
+        with self._lock:
+            self._resident = set(hot)
+        return hot
+
+    def start(self, interval_s: float = REBALANCE_INTERVAL_S):
+        """Rebalances now and then in a daemon thread until stop() is called; no-op if already running."""
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            def _loop():
+                while True:
+                    try:
+                        self.rebalance()
+                    except Exception as e:
+                        print(f"⚠️ Residency rebalance failed: {e}")
+                    if self._stop.wait(interval_s):
+                        return
+
+            self._stop.clear()
+            self._thread = threading.Thread(target=_loop, name="ollama-residency", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+
+# Shared instance used by the examples
+manager = ResidencyManager()
+
+
+if __name__ == "__main__":
+    for name in ["llama3", "llama3", "nomic-embed-text", "mistral", "llama3"]:
+        manager.record_use(name)
+    print("Hot models:", manager.rebalance())
+    print("Hot models after an idle hour:", manager.hot_models(now=time.monotonic() + 3600))
+    print("Stats:", manager.stats)
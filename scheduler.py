@@ -0,0 +1,155 @@
+"""
+Priority-Aware Request Scheduler
+Interactive traffic (chat loops, agents) and batch jobs (prompt A/B runs, embedding
+ingestion) share the same Ollama servers. Without ordering a batch job fills every slot
+and users wait behind it. The scheduler sits in front of the shared client:
+
+- Priority classes: queued INTERACTIVE requests are always dispatched before BATCH ones.
+- Headroom: BATCH may only use MAX_OUTSTANDING_PER_MODEL - INTERACTIVE_RESERVED slots of a
+  model, so a user request never waits for a long batch generation to finish.
+- Weighted-fair queueing per tenant inside a class: each tenant's requests get virtual
+  finish tags (cost / weight), so one tenant's 10,000 prompts can't starve another's 10.
+- Queue-wait metrics per class (count, mean, p95).
+
+    from scheduler import scheduler, BATCH
+
+    with scheduler.slot("llama3", priority=BATCH, tenant="nightly-eval"):
+        ...send the request...
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from deadlines import DeadlineExceeded, LatencyTracker, RequestCancelled, current_deadline
+from loadbalancer import MAX_CONCURRENCY, OLLAMA_ENDPOINTS
+
+# --- 1. Configuration ---
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Defaults to what the replicas can run at once in total.
+MAX_OUTSTANDING_PER_MODEL = int(os.environ.get("OLLAMA_MAX_OUTSTANDING_PER_MODEL", MAX_CONCURRENCY * len(OLLAMA_ENDPOINTS)))
+INTERACTIVE_RESERVED = 1  # slots per model that batch work may never take
+
+
+class _Waiter:
+    __slots__ = ("model", "priority", "tenant", "finish_tag", "enqueued_at", "granted")
+
+    def __init__(self, model, priority, tenant, finish_tag):
+        self.model = model
+        self.priority = priority
+        self.tenant = tenant
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class Scheduler:
+    def __init__(self, max_outstanding_per_model: int = MAX_OUTSTANDING_PER_MODEL,
+                 interactive_reserved: int = INTERACTIVE_RESERVED, tenant_weights=None):
+        self.max_outstanding_per_model = max_outstanding_per_model
+        self.interactive_reserved = min(interactive_reserved, max_outstanding_per_model - 1)
+        self.tenant_weights = dict(tenant_weights or {})
+        self._outstanding = {}        # model -> in-flight requests
+        self._queue = []              # heap of (priority, finish_tag, seq, waiter)
+        self._seq = itertools.count()
+        self._virtual_time = {}       # priority -> finish tag of the last dispatched request
+        self._last_finish = {}        # (priority, tenant) -> finish tag of its last request
+        self._waits = LatencyTracker(window=1000, min_samples=1)
+        self._counts = {p: 0 for p in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+
+    # --- 2. Weighted-Fair Queueing ---
+    def _finish_tag(self, priority: int, tenant: str, cost: float) -> float:
+        start = max(self._virtual_time.get(priority, 0.0), self._last_finish.get((priority, tenant), 0.0))
+        finish = start + cost / self.tenant_weights.get(tenant, 1.0)
+        self._last_finish[(priority, tenant)] = finish
+        return finish
+
+    def _capacity(self, model: str, priority: int) -> int:
+        cap = self.max_outstanding_per_model
+        return cap if priority == INTERACTIVE else cap - self.interactive_reserved
+
+    def _dispatch(self):
+        """Grants queued requests in (priority, finish tag) order wherever their model has room."""
+        blocked = []
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            waiter = entry[3]
+            if self._outstanding.get(waiter.model, 0) < self._capacity(waiter.model, waiter.priority):
+                self._outstanding[waiter.model] = self._outstanding.get(waiter.model, 0) + 1
+                self._virtual_time[waiter.priority] = waiter.finish_tag
+                waiter.granted = True
+            else:
+                blocked.append(entry)
+        for entry in blocked:
+            heapq.heappush(self._queue, entry)
+        self._cond.notify_all()
+
+    # --- 3. Slots ---
+    @contextmanager
+    def slot(self, model: str, priority: int = INTERACTIVE, tenant: str = "default", cost: float = 1.0,
+             cancel=None):
+        """Waits for a turn to send one request to `model`, honouring the current deadline and `cancel`."""
+        deadline = current_deadline()
+
+        def wake():
+            with self._cond:
+                self._cond.notify_all()
+
+        if cancel is not None:
+            cancel.add_callback(wake)
+        try:
+            with self._cond:
+                waiter = _Waiter(model, priority, tenant, self._finish_tag(priority, tenant, cost))
+                heapq.heappush(self._queue, (priority, waiter.finish_tag, next(self._seq), waiter))
+                self._dispatch()
+                while not waiter.granted:
+                    expired = deadline is not None and deadline.expired()
+                    if expired or (cancel is not None and cancel.cancelled):
+                        self._queue = [e for e in self._queue if e[3] is not waiter]
+                        heapq.heapify(self._queue)
+                        if expired:
+                            raise DeadlineExceeded(f"Deadline exceeded while queued for {model}")
+                        raise RequestCancelled(f"Cancelled while queued for {model}")
+                    self._cond.wait(None if deadline is None else deadline.remaining())
+                self._counts[priority] += 1
+        finally:
+            if cancel is not None:
+                cancel.remove_callback(wake)
+        self._waits.record(PRIORITY_NAMES[priority], time.monotonic() - waiter.enqueued_at)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._outstanding[model] -= 1
+                self._dispatch()
+
+    # --- 4. Metrics ---
+    def queued(self, model: str, priority: int) -> int:
+        """Requests of one priority class currently waiting for `model`."""
+        with self._cond:
+            return sum(1 for e in self._queue if e[0] == priority and e[3].model == model)
+
+    def stats(self) -> dict:
+        """Queue-wait metrics per priority class (milliseconds over the last 1000 requests)."""
+        with self._cond:
+            queued = {p: sum(1 for e in self._queue if e[0] == p) for p in PRIORITY_NAMES}
+            outstanding = dict(self._outstanding)
+        report = {"outstanding": outstanding}
+        for priority, name in PRIORITY_NAMES.items():
+            report[name] = {
+                "requests": self._counts[priority],
+                "queued": queued[priority],
+                "mean_wait_ms": 1000 * (self._waits.mean(name) or 0.0),
+                "p95_wait_ms": 1000 * (self._waits.percentile(name, 95) or 0.0),
+            }
+        return report
+
+
+# Shared instance used by ollamaclient
+scheduler = Scheduler()
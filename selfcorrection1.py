@@ -1,13 +1,22 @@
 # pip install langgraph langchain_core langchain_community
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_ollama import ChatOllama
-from langgraph.graph import StateGraph, END
+import functools
 from typing import TypedDict, Annotated
 import operator
 import re
 
+from lazyimports import lazy_import, lazy_attributes
+from loadbalancer import balancer
+from modelregistry import get_model
+
+# langchain_core and langgraph are imported on first use (see lazyimports.py)
+lc_messages = lazy_import("langchain_core.messages")
+lg_graph = lazy_import("langgraph.graph")
+
 # --- 1. Ollama Configuration ---
-ollama_llm = ChatOllama(model="llama3", base_url="http://localhost:11434")
+def get_llm():
+    # ChatOllama talks to a single base_url, so the whole refinement loop is pinned to
+    # one replica (keeping its KV cache warm) chosen by the load balancer.
+    return get_model("llama3", base_url=balancer.pick_url(session_id="selfcorrection1"))
 
 # --- 2. Define State ---
 class RefineState(TypedDict):
@@ -26,11 +35,11 @@ def writer_node(state: RefineState) -> RefineState:
         prompt = f"REFINEMENT TASK: Refine the previous draft based on this feedback:\n'{state['feedback']}'\n\nPrevious Draft:\n'{state['draft']}'\n\nGenerate the new, improved draft. Output ONLY the new draft."
 
     messages = [
-        SystemMessage(content="You are a clear and concise technical writer. Output ONLY the draft text."),
-        HumanMessage(content=prompt)
+        lc_messages.SystemMessage(content="You are a clear and concise technical writer. Output ONLY the draft text."),
+        lc_messages.HumanMessage(content=prompt)
     ]
     
-    response = ollama_llm.invoke(messages)
+    response = get_llm().invoke(messages)
     return {"draft": response.content, "feedback": "", "iteration": 1}
 
 def critic_node(state: RefineState) -> RefineState:
@@ -47,11 +56,11 @@ def critic_node(state: RefineState) -> RefineState:
     Draft:\n{state['draft']}
     """
     messages = [
-        SystemMessage(content="You are a meticulous content reviewer."),
-        HumanMessage(content=prompt)
+        lc_messages.SystemMessage(content="You are a meticulous content reviewer."),
+        lc_messages.HumanMessage(content=prompt)
     ]
     
-    response = ollama_llm.invoke(messages)
+    response = get_llm().invoke(messages)
     
     # Use simple string check for this example
     if response.content.strip().upper() == "APPROVED":
@@ -76,26 +85,37 @@ def route_refinement(state: RefineState) -> str:
     return "writer"
 
 # --- 5. Build the LangGraph ---
-workflow = StateGraph(RefineState)
-workflow.add_node("writer", writer_node)
-workflow.add_node("critic", critic_node)
+@functools.cache
+def get_app():
+    workflow = lg_graph.StateGraph(RefineState)
+    workflow.add_node("writer", writer_node)
+    workflow.add_node("critic", critic_node)
+
+    workflow.set_entry_point("writer")
+
+    # Writer -> Critic
+    workflow.add_edge("writer", "critic")
 
-workflow.set_entry_point("writer")
+    # Critic -> Decision Point
+    workflow.add_conditional_edges(
+        "critic",
+        route_refinement,
+        {"writer": "writer", "end": lg_graph.END}
+    )
 
-# Writer -> Critic
-workflow.add_edge("writer", "critic")
+    return workflow.compile()
 
-# Critic -> Decision Point
-workflow.add_conditional_edges(
-    "critic",
-    route_refinement,
-    {"writer": "writer", "end": END}
-)
 
-app = workflow.compile()
+__getattr__ = lazy_attributes(app=get_app)
+
 
 # Example: Run the graph
-# initial_state = {"draft": "", "feedback": "", "iteration": 0}
-# final_state = app.invoke(initial_state)
-# print("\n--- Iterative Refinement Final Draft ---")
-# print(final_state["draft"])
\ No newline at end of file
+def main():
+    initial_state = {"draft": "", "feedback": "", "iteration": 0}
+    final_state = get_app().invoke(initial_state)
+    print("\n--- Iterative Refinement Final Draft ---")
+    print(final_state["draft"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Partitioned Vector Store
+One FAISS index over every document means a query filtered to "Phase 1" still searches
+(and post-filters) all phases, and adding a trial re-embeds and rebuilds everything.
+ShardedVectorStore keeps one index per value of a metadata key:
+
+- A filter on the shard key sends the query only to the shards it names
+  ({"phase": "Phase 1"} or {"phase": {"$in": ["Phase 1", "Phase 2"]}}).
+- Queries that need several shards search them in parallel on a thread pool (FAISS
+  releases the GIL) and merge the per-shard results with a top-k heap.
+- rebuild_shard() re-embeds and swaps in one shard; the others are not touched.
+
+    from shardedindex import ShardedVectorStore
+
+    vectorstore = ShardedVectorStore.from_documents(docs, embeddings, shard_key="phase")
+    retriever = vectorstore.as_retriever(search_kwargs={"k": 3, "filter": {"phase": "Phase 1"}})
+
+    # Ranges instead of exact values: shard by patient ID in blocks of 1000
+    by_patient = ShardedVectorStore.from_documents(
+        docs, embeddings, shard_key="patient", shard_fn=lambda metadata: int(metadata["patient"][1:]) // 1000)
+
+`python shardedindex.py` compares one filtered index with single-shard, parallel and
+sequential multi-shard search, and a one-shard rebuild with a full one.
+"""
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import os
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from vectorindex import INDEX_KIND, QUANTIZATION, REDUCED_DIMS, REDUCTION, build_from_vectors
+
+# --- 1. Configuration ---
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class ShardedVectorStore(VectorStore):
+    def __init__(self, embeddings, shard_key: str, shard_fn=None, kind: str = INDEX_KIND,
+                 quantization=QUANTIZATION, max_workers: int = DEFAULT_WORKERS, reduction=REDUCTION,
+                 reduced_dims: int = REDUCED_DIMS):
+        self.embedding_function = embeddings
+        self.shard_key = shard_key
+        # With a custom shard_fn a shard holds several key values, so the filter still applies inside it.
+        self.exact_shards = shard_fn is None
+        self.shard_fn = shard_fn or (lambda metadata: metadata[shard_key])
+        self.kind = kind
+        self.quantization = quantization
+        self.reduction = reduction
+        self.reduced_dims = reduced_dims
+        self.shards = {}
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="shard-search")
+        self.stats = {"queries": 0, "shards_searched": 0}
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    # --- 2. Building ---
+    def _group(self, docs, vectors):
+        groups = collections.defaultdict(lambda: ([], []))
+        for doc, vector in zip(docs, vectors):
+            shard_docs, shard_vectors = groups[self.shard_fn(doc.metadata)]
+            shard_docs.append(doc)
+            shard_vectors.append(vector)
+        return groups
+
+    def _build(self, docs, vectors):
+        return build_from_vectors(docs, vectors, self.embeddings, self.kind, self.quantization,
+                                  reduction=self.reduction, reduced_dims=self.reduced_dims)
+
+    def add_vectors(self, docs, vectors):
+        """Adds already-embedded docs: new shards are built, existing ones appended to."""
+        for label, (shard_docs, shard_vectors) in self._group(docs, vectors).items():
+            with self._lock:
+                shard = self.shards.get(label)
+            if shard is None:
+                shard = self._build(shard_docs, shard_vectors)
+                with self._lock:
+                    self.shards[label] = shard
+            else:
+                shard.add_embeddings(zip([doc.page_content for doc in shard_docs], shard_vectors),
+                                     metadatas=[doc.metadata for doc in shard_docs])
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        docs = [Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(texts, metadatas or itertools.repeat(None))]
+        self.add_vectors(docs, self.embeddings.embed_documents([doc.page_content for doc in docs]))
+        return []
+
+    def rebuild_shard(self, label, docs, vectors=None):
+        """Re-embeds (unless `vectors` are given) and replaces one shard; searches keep using the old one until then."""
+        docs = list(docs)
+        if vectors is None:
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in docs])
+        shard = self._build(docs, vectors)
+        with self._lock:
+            self.shards[label] = shard
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, shard_key: str = None, **kwargs):
+        store = cls(embedding, shard_key, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store
+
+    @classmethod
+    def from_documents(cls, documents, embedding, **kwargs):
+        return cls.from_texts([doc.page_content for doc in documents], embedding,
+                              [doc.metadata for doc in documents], **kwargs)
+
+    # --- 3. Routing ---
+    def _routed_values(self, filter):
+        """The shard key values `filter` pins the query to, or None if it doesn't route on the key."""
+        if not filter or self.shard_key not in filter:
+            return None
+        wanted = filter[self.shard_key]
+        if isinstance(wanted, dict):
+            if set(wanted) == {"$eq"}:
+                return [wanted["$eq"]]
+            if set(wanted) == {"$in"}:
+                return list(wanted["$in"])
+            return None  # $neq, $nin, ranges: let every shard apply them
+        if isinstance(wanted, (list, tuple, set)):
+            return list(wanted)
+        return [wanted]
+
+    def shards_for(self, filter=None) -> list:
+        """Labels of the shards a query with `filter` has to search."""
+        with self._lock:
+            labels = list(self.shards)
+        wanted = self._routed_values(filter)
+        if wanted is None:
+            return labels
+        routed = {self.shard_fn({**filter, self.shard_key: value}) for value in wanted}
+        return [label for label in labels if label in routed]
+
+    def _shard_filter(self, filter):
+        if not self.exact_shards or self._routed_values(filter) is None:
+            return filter
+        rest = {key: value for key, value in filter.items() if key != self.shard_key}
+        return rest or None  # everything in a routed shard already matches the shard key
+
+    # --- 4. Search ---
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, filter=None, **kwargs):
+        labels = self.shards_for(filter)
+        with self._lock:
+            shards = [self.shards[label] for label in labels]
+        shard_filter = self._shard_filter(filter)
+
+        def search(shard):
+            return shard.similarity_search_with_score_by_vector(embedding, k, filter=shard_filter, **kwargs)
+
+        if len(shards) <= 1:
+            results = [search(shard) for shard in shards]
+        else:
+            results = list(self._pool.map(search, shards))
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats["shards_searched"] += len(shards)
+        # Each shard's list is sorted by distance; keep the k nearest overall.
+        return list(itertools.islice(heapq.merge(*results, key=lambda pair: pair[1]), k))
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter=None, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k, filter, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from annsweep import synthetic_vectors
+    from vectorindex import build_from_vectors as build_single
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--d", type=int, default=256)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.n + args.queries, args.d)
+    vectors, queries = vectors[:args.n], vectors[args.n:]
+    docs = [Document(page_content=f"doc {i}", metadata={"phase": f"Phase {i % args.shards}"}) for i in range(args.n)]
+
+    def timed(label, fn, repeat=args.queries):
+        start = time.perf_counter()
+        for i in range(repeat):
+            fn(queries[i % len(queries)].tolist())
+        print(f"{label:<42} {1000 * (time.perf_counter() - start) / repeat:>9.2f} ms")
+
+    start = time.perf_counter()
+    single = build_single(docs, vectors, None, "flat", None)
+    print(f"one index over {args.n} docs built in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    sharded = ShardedVectorStore(None, "phase", kind="flat", quantization=None)
+    sharded.add_vectors(docs, vectors)
+    print(f"{args.shards} shards built in {time.perf_counter() - start:.2f}s; searching with {DEFAULT_WORKERS} threads "
+          f"on {os.cpu_count()} CPUs")
+    sequential = ShardedVectorStore(None, "phase", kind="flat", quantization=None, max_workers=1)
+    sequential.shards = sharded.shards
+
+    one = {"phase": "Phase 1"}
+    two = {"phase": {"$in": ["Phase 1", "Phase 2"]}}
+    print(f"\n{'query':<42} {'latency':>12}")
+    timed("one index, filter phase=1 (post-filter)", lambda v: single.similarity_search_by_vector(
+        v, args.k, filter=one, fetch_k=args.k * args.shards * 4))
+    timed("sharded, phase=1 (one shard)", lambda v: sharded.similarity_search_by_vector(v, args.k, filter=one))
+    timed("sharded, phase in {1, 2}", lambda v: sharded.similarity_search_by_vector(v, args.k, filter=two))
+    timed("one index, no filter", lambda v: single.similarity_search_by_vector(v, args.k))
+    timed(f"sharded, no filter ({args.shards} shards, parallel)", lambda v: sharded.similarity_search_by_vector(v, args.k))
+    timed(f"sharded, no filter ({args.shards} shards, sequential)",
+          lambda v: sequential.similarity_search_by_vector(v, args.k))
+
+    found = [doc.page_content for doc in sharded.similarity_search_by_vector(queries[0].tolist(), args.k)]
+    expected = [doc.page_content for doc in single.similarity_search_by_vector(queries[0].tolist(), args.k)]
+    print(f"\nmerged top-{args.k} matches the single index: {found == expected}")
+
+    phase_docs = [(doc, vector) for doc, vector in zip(docs, vectors) if doc.metadata["phase"] == "Phase 1"]
+    start = time.perf_counter()
+    sharded.rebuild_shard("Phase 1", [doc for doc, _ in phase_docs], [vector for _, vector in phase_docs])
+    print(f"rebuilding shard 'Phase 1' ({len(phase_docs)} docs) took {time.perf_counter() - start:.2f}s")
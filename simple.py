@@ -1,7 +1,9 @@
-import ollama
 from duckduckgo_search import DDGS
 import json
 
+from ollamaclient import client
+from scheduler import INTERACTIVE
+
 # --- 1. Define the External Tool (Web Search) ---
 def search_web(query: str) -> str:
     """A tool to perform a web search for up-to-date information."""
@@ -32,7 +34,7 @@ TOOL_SEARCH_WEB = {
     }
 }
 # --- 2. Define the Agentic Loop ---
-def run_agent(model_name="mistral"):
+def run_agent(model_name="mistral", session_id="agent-session"):
     print(f"Agent running with Ollama model: {model_name}")
     
     # 1. Initial Prompt for Agent Role (System Message)
@@ -52,9 +54,12 @@ def run_agent(model_name="mistral"):
         messages.append({"role": "user", "content": user_input})
 
         # 2. Call the LLM with Tools
-        agent_response = ollama.chat(
-            model=model_name,
-            messages=messages,
+        # A user is waiting on this loop, so it is scheduled ahead of batch jobs.
+        agent_response = client.chat(
+            model_name,
+            messages,
+            session_id=session_id,
+            priority=INTERACTIVE,
             tools=[TOOL_SEARCH_WEB] # Pass the tool definition
         )
 
@@ -78,9 +83,11 @@ def run_agent(model_name="mistral"):
             })
             
             # Second LLM call to synthesize the final answer
-            final_response = ollama.chat(
-                model=model_name,
-                messages=messages,
+            final_response = client.chat(
+                model_name,
+                messages,
+                session_id=session_id,
+                priority=INTERACTIVE,
             )
             
             print(f"\n[AGENT RESPONSE]: {final_response['message']['content']}")
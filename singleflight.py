@@ -0,0 +1,127 @@
+"""
+Single-Flight Request Coalescing
+When many users send the same thing at the same moment (the same question to the RAG
+chain, the same text to get_embedding), only the first request goes upstream; identical
+requests that arrive while it is in flight subscribe to it instead.
+
+The upstream stream runs in its own thread and every chunk is buffered, so each
+subscriber - including ones that join mid-generation - receives the full stream from the
+start at its own pace. The upstream call runs with no deadline of its own: each
+subscriber applies its own deadline while it waits, and may leave early (deadline,
+cancel, stopped reading); the upstream call is cancelled only when nobody is listening
+any more.
+
+    flights = SingleFlight()
+    for chunk in flights.stream(key, lambda cancel: upstream_chunks(cancel)):
+        ...
+"""
+import contextvars
+import hashlib
+import json
+import threading
+
+from deadlines import CancelToken, current_deadline, no_deadline
+
+# Fields that don't change what the model generates
+NON_SEMANTIC_FIELDS = ("keep_alive", "stream")
+
+
+def request_key(path: str, payload: dict) -> str:
+    """Identical (path, model, options, messages/prompt, format, ...) -> identical key."""
+    semantic = {k: v for k, v in payload.items() if k not in NON_SEMANTIC_FIELDS}
+    blob = json.dumps([path, semantic], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cancel = CancelToken()
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {"upstream_calls": 0, "coalesced": 0}
+
+    def _run(self, key: str, flight: _Flight, producer):
+        error = None
+        try:
+            # Shared by every subscriber, so not bound by the leader's deadline.
+            with no_deadline():
+                for chunk in producer(flight.cancel):
+                    with flight.cond:
+                        flight.chunks.append(chunk)
+                        flight.cond.notify_all()
+        except BaseException as e:
+            error = e
+        finally:
+            with self._lock:
+                # Requests arriving from now on start a fresh upstream call.
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.cond:
+                flight.error = error
+                flight.done = True
+                flight.cond.notify_all()
+
+    def stream(self, key: str, producer, cancel=None):
+        """
+        Yields the chunks of the in-flight call for `key`, starting `producer(cancel_token)`
+        in a background thread if there is none. Honours the caller's deadline and `cancel`.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.stats["upstream_calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+            with flight.cond:
+                flight.subscribers += 1
+        if leader:
+            # The producer runs in a copy of the leader's context (minus its deadline, see _run).
+            threading.Thread(target=contextvars.copy_context().run, args=(self._run, key, flight, producer),
+                             name="ollama-flight", daemon=True).start()
+
+        def wake():
+            with flight.cond:
+                flight.cond.notify_all()
+
+        deadline = current_deadline()
+        if cancel is not None:
+            cancel.add_callback(wake)
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    while index >= len(flight.chunks) and not flight.done:
+                        if cancel is not None:
+                            cancel.check()
+                        if deadline is not None:
+                            deadline.check()
+                        flight.cond.wait(None if deadline is None else deadline.remaining())
+                    new_chunks = flight.chunks[index:]
+                    index += len(new_chunks)
+                    finished = flight.done and index >= len(flight.chunks)
+                    error = flight.error
+                for chunk in new_chunks:
+                    yield chunk
+                if finished:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            if cancel is not None:
+                cancel.remove_callback(wake)
+            with flight.cond:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.done
+            if abandoned:
+                flight.cancel.cancel()  # nobody is listening: stop the generation
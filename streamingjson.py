@@ -0,0 +1,183 @@
+"""
+Incremental JSON Parsing into Partial Pydantic Models
+A structured chain normally parses once the whole answer has arrived. This parser
+consumes the streamed text as it comes and reports each top-level field of the JSON
+object the moment its value is complete, validated against the field's type:
+
+- consumers can start on `dish_name` while `ingredients` is still being generated;
+- a field that fails validation raises FieldValidationError at once, and the stream is
+  closed, which stops the generation instead of paying for the rest of it;
+- reading stops at the object's closing brace, so trailing prose is never waited for.
+
+    from streamingjson import iter_partial_models
+
+    for recipe in iter_partial_models(Recipe, (prompt | llm).stream({"user_input": text})):
+        print(recipe)          # partial Recipe (model_construct) as fields complete;
+                               # the last one is the fully validated Recipe
+"""
+import json
+
+from pydantic import TypeAdapter, ValidationError
+
+
+class FieldValidationError(ValueError):
+    """
+    A completed field of the streamed object doesn't match the schema, or isn't valid JSON
+    (then `value` is the raw text and `error` the json.JSONDecodeError).
+    """
+
+    def __init__(self, field: str, value, error):
+        reason = error.errors()[0]["msg"] if isinstance(error, ValidationError) else f"not valid JSON ({error.msg})"
+        super().__init__(f"{field}={value!r} is invalid: {reason}")
+        self.field = field
+        self.value = value
+        self.error = error
+
+
+# --- 1. Incremental Parser ---
+class IncrementalJsonParser:
+    """
+    Scans fed text once, character by character, tracking string/escape state and nesting
+    depth. Text before the first "{" (prose, code fences) is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+
+    def _complete(self, end: int) -> tuple:
+        key, raw = self._key, self.buffer[self._value_start:end].strip()
+        self._key = self._value_start = None
+        try:
+            return key, json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise FieldValidationError(key, raw, e) from None
+
+    def feed(self, text: str) -> list:
+        """Returns the (key, value) pairs completed by `text`."""
+        self.buffer += text
+        completed = []
+        buf = self.buffer
+        while self._pos < len(buf) and not self.done:
+            i, c = self._pos, buf[self._pos]
+            self._pos += 1
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(buf[self._key_start:i + 1])
+                        self._key_start = None
+            elif c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif c == ":" and self._depth == 1 and self._key is not None and self._value_start is None:
+                self._value_start = i + 1
+            elif c == "," and self._depth == 1 and self._value_start is not None:
+                completed.append(self._complete(i))
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1:
+                    if self._value_start is not None:
+                        completed.append(self._complete(i))
+                    self.done = True
+                self._depth -= 1
+        return completed
+
+
+# --- 2. Partial Models ---
+class PartialModel:
+    def __init__(self, model_cls):
+        self.model_cls = model_cls
+        self.parser = IncrementalJsonParser()
+        self.fields = {}
+        self._adapters = {name: TypeAdapter(field.annotation) for name, field in model_cls.model_fields.items()}
+
+    def feed(self, text: str) -> list:
+        """Validates the fields completed by `text` and returns their names."""
+        names = []
+        for key, value in self.parser.feed(text):
+            adapter = self._adapters.get(key)
+            if adapter is None:
+                continue  # unknown keys are ignored, as model_validate would
+            try:
+                self.fields[key] = adapter.validate_python(value)
+            except ValidationError as e:
+                raise FieldValidationError(key, value, e) from e
+            names.append(key)
+        return names
+
+    @property
+    def partial(self):
+        """The fields validated so far, as an (incomplete) model instance."""
+        return self.model_cls.model_construct(**self.fields)
+
+    def result(self):
+        return self.model_cls.model_validate(self.fields)
+
+
+def iter_partial_models(model_cls, chunks):
+    """
+    Yields a partial `model_cls` each time a field completes, then the fully validated
+    model. `chunks` may be strings or LangChain message chunks; it is closed when parsing
+    stops early (object complete, validation failure), which aborts the generation.
+    """
+    state = PartialModel(model_cls)
+    try:
+        for chunk in chunks:
+            if state.feed(getattr(chunk, "content", chunk)):
+                yield state.partial
+            if state.parser.done:
+                break
+        yield state.result()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+if __name__ == "__main__":
+    # Self-check on hand-made streams.
+    from pydantic import BaseModel
+
+    class Recipe(BaseModel):
+        dish_name: str
+        ingredients: list[str]
+        prep_time_minutes: int
+
+    stream = ['Sure! ```json\n{"dish_', 'name": "Scrambled {eggs}", "ingre', 'dients": ["eggs", "bu', 'tter, salted"],',
+              ' "prep_time_minutes": 5', '}\n``` Enjoy your meal, and let me know if...']
+    for recipe in iter_partial_models(Recipe, iter(stream)):
+        print(repr(recipe))
+
+    def bad_stream():
+        try:
+            yield '{"dish_name": "Toast", "prep_time_minutes": "soon", '
+            yield '"ingredients": ["bread"]}'
+        finally:
+            print("stream closed")
+
+    try:
+        list(iter_partial_models(Recipe, bad_stream()))
+    except FieldValidationError as e:
+        print("aborted:", e)
+
+    try:
+        list(iter_partial_models(Recipe, iter(['{"dish_name": "Toast", "prep_time_minutes": 5 min, ', '"ingredients": []}'])))
+    except FieldValidationError as e:
+        print("aborted:", e)
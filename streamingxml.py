@@ -0,0 +1,151 @@
+"""
+Incremental XML Output Parsing
+XMLOutputParser buffers the whole answer before parsing it, and models often keep
+talking after the last closing tag - tokens we wait and pay for. This parser feeds the
+streamed text to an expat push parser and yields each requested tag's value as soon as
+that tag closes; once every requested tag has closed it closes the stream, which stops
+the generation.
+
+    from streamingxml import iter_xml_tags
+
+    chunks = (prompt | llm).stream({"user_input": text})
+    for tag, value in iter_xml_tags(chunks, ["dish_name", "ingredients", "prep_time_minutes"]):
+        print(tag, value)
+
+Values have XMLOutputParser's shape: the text of a leaf tag, or a list of
+{child: value} dicts for a tag with children. Prose and code fences around the XML are
+ignored; several top-level elements are fine. Like outputrepair.repair_xml, stray closing
+tags are dropped, forgotten ones are closed, and a "<" that starts no tag ("Cook at
+<200C") is escaped, so the push parser never sees malformed XML.
+"""
+import re
+from xml.parsers import expat
+
+_WRAPPER = "stream"
+_BARE_AMPERSAND = re.compile(r"&(?!(?:amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)")
+_MAX_ENTITY = 10  # longest entity reference we may have to wait for, e.g. "&#x1F600;"
+_MAX_TAG = 200    # a "<" with no ">" within this many characters is prose, not a tag being streamed
+_MARKUP = re.compile(r"<[^<>]*>")
+_TAG = re.compile(r"<(/?)([A-Za-z_][\w.-]*)(?:\s[^<>]*?)?(/?)>")
+_INVALID_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class IncrementalXmlParser:
+    def __init__(self, tags):
+        self.tags = set(tags)
+        self.completed = {}
+        self._new = []
+        self._stack = []   # [tag, text parts, children] per open element
+        self._pending = ""
+        self._open = []    # names of the elements the sanitised text has opened
+        self._parser = expat.ParserCreate()
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._text
+        # Everything is parsed inside a synthetic root, so prose and sibling elements are legal.
+        self._parser.Parse(f"<{_WRAPPER}>", False)
+
+    @property
+    def done(self) -> bool:
+        return self.tags <= self.completed.keys()
+
+    def _start(self, name, attrs):
+        self._stack.append([name, [], []])
+
+    def _text(self, data):
+        if self._stack:
+            self._stack[-1][1].append(data)
+
+    def _end(self, name):
+        if name == _WRAPPER or not self._stack:
+            return
+        tag, parts, children = self._stack.pop()
+        value = [{child: child_value} for child, child_value in children] if children else "".join(parts).strip()
+        if self._stack:
+            self._stack[-1][2].append((tag, value))
+        if tag in self.tags and tag not in self.completed:
+            self.completed[tag] = value
+            self._new.append((tag, value))
+
+    def _sanitize(self, text: str) -> str:
+        """Well-formed markup for `text`: tags re-emitted without attributes, stray "<" escaped."""
+        out, last = [], 0
+        for match in _MARKUP.finditer(text):
+            out.append(text[last:match.start()].replace("<", "&lt;"))
+            last = match.end()
+            tag = _TAG.fullmatch(match.group(0))
+            if tag is None:
+                out.append(match.group(0).replace("<", "&lt;"))  # "<200C>", "<!-- -->", "<?xml ?>"
+                continue
+            closing, name, self_closing = tag.groups()
+            if closing:
+                if name in self._open:
+                    while self._open[-1] != name:
+                        out.append(f"</{self._open.pop()}>")  # close what the model forgot to close
+                    self._open.pop()
+                    out.append(f"</{name}>")
+                # else: a stray closing tag - dropped
+            elif self_closing:
+                out.append(f"<{name}/>")
+            else:
+                self._open.append(name)
+                out.append(f"<{name}>")
+        out.append(text[last:].replace("<", "&lt;"))
+        return _BARE_AMPERSAND.sub("&amp;", _INVALID_CHARS.sub("", "".join(out)))
+
+    def feed(self, text: str) -> list:
+        """Returns the (tag, value) pairs of requested tags closed by `text`."""
+        text = self._pending + text.replace("```", "")
+        self._pending = ""
+        # A tag or an entity cut off at the end of the chunk is completed by the next one.
+        tag_start = text.rfind("<")
+        entity_start = text.rfind("&", max(0, len(text) - _MAX_ENTITY))
+        if tag_start != -1 and ">" not in text[tag_start:] and len(text) - tag_start <= _MAX_TAG:
+            text, self._pending = text[:tag_start], text[tag_start:]
+        elif entity_start != -1 and ";" not in text[entity_start:]:
+            text, self._pending = text[:entity_start], text[entity_start:]
+        self._parser.Parse(self._sanitize(text), False)
+        new, self._new = self._new, []
+        return new
+
+
+def iter_xml_tags(chunks, tags):
+    """
+    Yields (tag, value) for each requested tag as it closes. `chunks` may be strings or
+    LangChain message chunks; it is closed as soon as every tag has been seen.
+    """
+    parser = IncrementalXmlParser(tags)
+    try:
+        for chunk in chunks:
+            yield from parser.feed(getattr(chunk, "content", chunk))
+            if parser.done:
+                return
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+if __name__ == "__main__":
+    # Self-check: values arrive as tags close, the rambling tail is never read.
+    def stream():
+        pieces = ["Sure! Here it is:\n```xml\n<recipe><dish_", "name>Mac &", "amp; Cheese & Peas</dish_name>",
+                  "<ingredients><item>pasta</item><item>chee", "se</item></ingredients>",
+                  "<prep_time_minutes>15</prep_time_minutes></recipe>\n```\n",
+                  "I hope you enjoy this recipe! Here are some tips...", "<tip>Use sharp cheddar</tip>"]
+        read = 0
+        try:
+            for piece in pieces:
+                read += 1
+                yield piece
+        finally:
+            print(f"stream closed after {read}/{len(pieces)} chunks")
+
+    for tag, value in iter_xml_tags(stream(), ["dish_name", "ingredients", "prep_time_minutes"]):
+        print(f"{tag}: {value!r}")
+
+    # Malformed output llama3 produces: a stray closing tag, a bare "<" in prose, an unclosed item.
+    messy = ["Cook at <200C for a while.\n<recipe></ingredients><dish_name>Soup</dish_", "name>",
+             '<ingredients><item kind="base">water<item>salt</ingredients>',
+             "<prep_time_minutes>10 (or <15)</prep_time_minutes></recipe>"]
+    print(dict(iter_xml_tags(iter(messy), ["dish_name", "ingredients", "prep_time_minutes"])))
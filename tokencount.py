@@ -0,0 +1,208 @@
+"""
+Local Token Counting and Context Sizing
+Every call used to run with the server's default context window: a 20-token review
+classification reserved the same KV cache as a long RAG prompt, and RAG prompts that
+did not fit were silently truncated by the server. With a local token count the client
+can pick num_ctx per request:
+
+- the smallest bucket in CONTEXT_BUCKETS that holds prompt + num_predict;
+- sticky upward: Ollama reloads a model whenever num_ctx changes, so a model keeps its
+  current (larger) bucket while that is recent, and only shrinks after SHRINK_AFTER_S;
+- prompts that don't fit the model at all raise ContextOverflowError, or with
+  overflow="trim" lose their oldest chat turns / the middle of the prompt.
+
+Counting uses tiktoken's cl100k_base (close to Llama 3's BPE) when it is installed and
+available offline, and a regex pre-tokenizer approximation otherwise.
+
+    from tokencount import count_tokens, fit_payload
+
+    count_tokens("How long until the trains meet?")       # -> 8
+    payload = fit_payload("/api/chat", {"model": "llama3", "messages": [...]})
+    payload["options"]["num_ctx"]                         # -> 2048
+"""
+import functools
+import math
+import re
+import threading
+import time
+
+# --- 1. Configuration ---
+CONTEXT_BUCKETS = (2048, 4096, 8192, 16384, 32768)
+MODEL_MAX_CONTEXT = {"llama3": 8192, "mistral": 32768}
+DEFAULT_MAX_CONTEXT = 8192
+DEFAULT_NUM_PREDICT = 512    # output room reserved when the caller sets no num_predict
+MESSAGE_OVERHEAD = 4         # role header / separator tokens of the chat template, per message
+SAFETY_MARGIN = 1.1          # the estimate is not the model's own tokenizer
+SHRINK_AFTER_S = 300         # Ollama's default keep_alive: by then the model has likely unloaded anyway
+TRIM_MARKER = "\n...\n"
+
+
+class ContextOverflowError(ValueError):
+    """The prompt plus its output budget doesn't fit the model's context window."""
+
+
+# --- 2. Counting ---
+# Roughly the GPT/Llama 3 pre-tokenizer: contractions, words, up to 3 digits, punctuation runs, whitespace.
+_PIECES = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+", re.UNICODE)
+
+
+@functools.cache
+def _tiktoken_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None  # not installed, or the encoding can't be downloaded here
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Common words are a single BPE token; long and rare ones split about every 4 characters.
+    return sum(max(1, math.ceil(len(piece.strip() or piece) / 4)) if len(piece) > 6 else 1
+               for piece in _PIECES.findall(text))
+
+
+def count_message_tokens(messages: list) -> int:
+    return sum(count_tokens(m.get("content") or "") + MESSAGE_OVERHEAD for m in messages)
+
+
+def count_context_tokens(payload: dict) -> int:
+    """The `context` a /api/generate continuation carries is already token ids: counted exactly."""
+    return len(payload.get("context") or [])
+
+
+def count_prompt_tokens(path: str, payload: dict) -> int:
+    """Prompt tokens of a /api/generate, /api/chat or /api/embed payload."""
+    if path == "/api/chat":
+        return count_message_tokens(payload.get("messages") or [])
+    if path == "/api/embed":
+        inputs = payload.get("input")
+        return sum(count_tokens(t) for t in ([inputs] if isinstance(inputs, str) else inputs or []))
+    return (count_tokens(payload.get("system") or "") + count_tokens(payload.get("prompt") or "")
+            + count_context_tokens(payload))
+
+
+def _needed_tokens(path: str, payload: dict) -> int:
+    """Prompt tokens with SAFETY_MARGIN on the estimated part only."""
+    context = count_context_tokens(payload)
+    return math.ceil((count_prompt_tokens(path, payload) - context) * SAFETY_MARGIN) + context
+
+
+# --- 3. Trimming ---
+def _trim_middle(text: str, excess_tokens: int) -> str:
+    """Cuts excess_tokens (plus a little) out of the middle, keeping the instructions and the question."""
+    total = count_tokens(text)
+    keep = max(0, total - excess_tokens - count_tokens(TRIM_MARKER))
+    if keep <= 0:
+        return ""
+    head_chars = int(len(text) * keep / total / 2)
+    return text[:head_chars] + TRIM_MARKER + text[len(text) - head_chars:]
+
+
+def _trim(path: str, payload: dict, budget: int) -> dict:
+    excess = _needed_tokens(path, payload) - budget
+    if path == "/api/chat":
+        messages = list(payload.get("messages") or [])
+        # Drop the oldest turns first; the system message and the latest message stay.
+        while excess > 0 and len(messages) > 2:
+            index = 1 if messages[0].get("role") == "system" else 0
+            excess -= math.ceil((count_tokens(messages[index].get("content") or "") + MESSAGE_OVERHEAD) * SAFETY_MARGIN)
+            del messages[index]
+        if excess > 0:
+            last = dict(messages[-1])
+            last["content"] = _trim_middle(last.get("content") or "", math.ceil(excess / SAFETY_MARGIN) + 1)
+            messages[-1] = last
+        return {**payload, "messages": messages}
+    return {**payload, "prompt": _trim_middle(payload.get("prompt") or "", math.ceil(excess / SAFETY_MARGIN) + 1)}
+
+
+# --- 4. Sizing ---
+class ContextSizer:
+    def __init__(self, buckets=CONTEXT_BUCKETS, max_context=None, shrink_after_s: float = SHRINK_AFTER_S):
+        self.buckets = tuple(sorted(buckets))
+        self.max_context = {**MODEL_MAX_CONTEXT, **(max_context or {})}
+        self.shrink_after_s = shrink_after_s
+        self.stats = {"sized": 0, "trimmed": 0, "refused": 0}
+        self._current = {}  # model -> (num_ctx, last time a prompt needed it)
+        self._lock = threading.Lock()
+
+    def model_max(self, model: str) -> int:
+        return self.max_context.get(model.split(":")[0], DEFAULT_MAX_CONTEXT)
+
+    def num_ctx_for(self, model: str, needed_tokens: int) -> int:
+        """Smallest bucket >= needed_tokens, kept at the model's current bucket while that is recent."""
+        limit = self.model_max(model)
+        bucket = next((b for b in self.buckets if b >= needed_tokens and b <= limit), limit)
+        now = time.monotonic()
+        with self._lock:
+            current, used_at = self._current.get(model, (0, 0.0))
+            if bucket < current and now - used_at < self.shrink_after_s:
+                return current  # a smaller num_ctx would make Ollama reload the model
+            self._current[model] = (bucket, now)
+        return bucket
+
+    def fit(self, path: str, payload: dict, overflow: str = "error") -> dict:
+        """
+        Returns `payload` with options.num_ctx set to fit prompt + num_predict. A prompt that
+        can't fit the model raises ContextOverflowError, or is trimmed with overflow="trim".
+        """
+        options = dict(payload.get("options") or {})
+        if "num_ctx" in options:
+            return payload  # the caller chose explicitly
+        model = payload["model"]
+        num_predict = options.get("num_predict")
+        output = num_predict if num_predict is not None and num_predict >= 0 else DEFAULT_NUM_PREDICT
+        limit = self.model_max(model)
+        needed = _needed_tokens(path, payload) + output
+        if needed > limit:
+            # A continuation's `context` can't be trimmed, only the new prompt text.
+            if overflow != "trim" or count_context_tokens(payload) + output > limit:
+                self.stats["refused"] += 1
+                raise ContextOverflowError(f"Prompt needs ~{needed} tokens (with {output} for the answer), {model} has {limit}")
+            self.stats["trimmed"] += 1
+            payload = _trim(path, payload, limit - output)
+            needed = limit
+        self.stats["sized"] += 1
+        options["num_ctx"] = self.num_ctx_for(model, needed)
+        return {**payload, "options": options}
+
+    def sized_chat_model(self, llm, prompt_text: str):
+        """A copy of a LangChain ChatOllama with num_ctx sized for `prompt_text` (refuses, never trims)."""
+        if getattr(llm, "num_ctx", None) is not None:
+            return llm
+        options = {} if llm.num_predict is None else {"num_predict": llm.num_predict}
+        payload = self.fit("/api/generate", {"model": llm.model, "prompt": prompt_text, "options": options})
+        return llm.model_copy(update={"num_ctx": payload["options"]["num_ctx"]})
+
+
+# Shared instance used by ollamaclient
+sizer = ContextSizer()
+
+
+def fit_payload(path: str, payload: dict, overflow: str = "error") -> dict:
+    return sizer.fit(path, payload, overflow)
+
+
+if __name__ == "__main__":
+    # Self-check: bucket choice, refusal and trimming.
+    sizer = ContextSizer(shrink_after_s=0)
+    short = {"model": "llama3", "prompt": 'Review: "Boring, too long."\nLabel:', "options": {"num_predict": 20}}
+    print("short prompt ->", sizer.fit("/api/generate", short)["options"]["num_ctx"])
+    long_prompt = "Patient record. " * 3000
+    try:
+        sizer.fit("/api/generate", {"model": "llama3", "prompt": long_prompt})
+    except ContextOverflowError as e:
+        print("refused:", e)
+    trimmed = sizer.fit("/api/generate", {"model": "llama3", "prompt": long_prompt}, overflow="trim")
+    print(f"trimmed: {count_tokens(long_prompt)} -> {count_tokens(trimmed['prompt'])} tokens, num_ctx {trimmed['options']['num_ctx']}")
+    # A continued conversation (react.py / tooluse.py) sends the earlier turns as `context` token ids.
+    continuation = {"model": "llama3", "prompt": "Observation: 42", "context": list(range(7000)),
+                    "options": {"num_predict": 100}}
+    num_ctx = sizer.fit("/api/generate", continuation)["options"]["num_ctx"]
+    assert num_ctx == 8192, num_ctx
+    print("7000-token context continuation ->", num_ctx)
+    print(sizer.stats)
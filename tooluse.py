@@ -1,21 +1,26 @@
-import requests
 import json
+import uuid
+
+from ollamaclient import client
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL = "llama3"   # or any model you installed via `ollama pull`
 
-import requests
 import json
 
 
+def ollama_step(prompt, context=None, session_id=None):
+    """
+    One /api/generate call; returns the full response. Passing the previous step's
+    `context` continues from where the model stopped, so only `prompt` is new prefill.
+    Steps of one run share a `session_id` so they land on the replica holding that context.
+    """
+    # Routed over the configured Ollama replicas (see ollamaclient.py / loadbalancer.py)
+    fields = {"context": context} if context else {}
+    return client.generate(MODEL, prompt, session_id=session_id, **fields)
+
+
 def ollama_chat(prompt):
-    payload = {
-        "model": MODEL,
-        "prompt": prompt,
-        "stream": False
-    }
-    r = requests.post(OLLAMA_URL, json=payload)
-    return r.json()["response"]
+    return ollama_step(prompt)["response"]
 
 
 
@@ -27,7 +32,14 @@ def get_weather(city):
     }
     return fake_data.get(city.lower(), "No data")
 
-def agent_weather(query):
+def agent_weather(query, continue_context=True, prefill=None, session_id=None):
+    """
+    continue_context=False pastes the plan back into a fresh prompt instead (the old
+    behaviour, kept for agentbench.py). If `prefill` is a list, each step's
+    prompt_eval_count is appended to it. Every step of the run is pinned to one replica
+    through `session_id` (a fresh one per run by default).
+    """
+    session_id = session_id or f"weather-{uuid.uuid4().hex}"
     # Step 1: Ask LLM what tool to call
     react_prompt = f"""
 You are an agent with access to:
@@ -43,7 +55,10 @@ Action: none
 User query: {query}
 """
 
-    plan = ollama_chat(react_prompt)
+    step = ollama_step(react_prompt, session_id=session_id)
+    plan = step["response"]
+    if prefill is not None:
+        prefill.append(step.get("prompt_eval_count"))
     print("LLM Decision:\n", plan)
 
     import re
@@ -60,7 +75,16 @@ User query: {query}
         obs = "No tool used"
 
     # Step 2: Ask LLM to produce final answer
-    final_prompt = f"""
+    if continue_context and step.get("context"):
+        # Continue from the model's own state: only the observation is new prefill.
+        step = ollama_step(f"""
+Tool observation:
+{obs}
+
+Give final answer to user.
+""", context=step["context"], session_id=session_id)
+    else:
+        step = ollama_step(f"""
 You said:
 {plan}
 
@@ -68,12 +92,15 @@ Tool observation:
 {obs}
 
 Give final answer to user.
-"""
+""", session_id=session_id)
+    if prefill is not None:
+        prefill.append(step.get("prompt_eval_count"))
 
-    answer = ollama_chat(final_prompt)
+    answer = step["response"]
     print("\nFinal Answer:\n", answer)
     return answer
 
 
 # Test
-agent_weather("What is the weather in Bangalore today?")
+if __name__ == "__main__":
+    agent_weather("What is the weather in Bangalore today?")
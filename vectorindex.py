@@ -0,0 +1,370 @@
+"""
+ANN Index Factory for the RAG Retrievers
+FAISS.from_documents always builds an exact flat index, whose query cost grows
+linearly with the corpus. build_vectorstore() picks the index instead:
+
+- "flat": exact search (the default, and the reference for recall);
+- "ivf":  inverted lists over k-means centroids, trained on a sample of the vectors;
+          `nprobe` lists are scanned per query (falls back to flat below ~80 vectors);
+- "hnsw": a navigable small-world graph; `ef_search` candidates are explored per query.
+
+and, independently, how the vectors are stored in RAM:
+
+- None:   float32, 4 bytes per dimension;
+- "fp16": 2 bytes per dimension; "int8": 1 byte per dimension (per-dimension ranges);
+- "pq":   product quantization, 1 byte per 8 dimensions (96 bytes for nomic-embed-text).
+
+and, optionally, how many dimensions are searched (every distance costs O(dims)):
+
+- "pca":        a PCA projection fitted on the corpus, to `reduced_dims` components;
+- "matryoshka": the first `reduced_dims` dimensions, re-normalised. Only for models
+                trained for it (nomic-embed-text v1.5: 768 -> 512/256/128/64).
+
+The projection is part of the FAISS index (IndexPreTransform), so documents and queries
+always go through the same one.
+
+Quantized and reduced indexes fetch `rerank` times more candidates than asked for and
+re-rank them with exact full-dimension float32 distances. The exact vectors live in a memory-mapped .npy file on
+disk, so only the candidates' rows are ever read into memory.
+
+The tunables can be set per query through the retriever:
+
+    from vectorindex import build_vectorstore
+
+    vectorstore = build_vectorstore(docs, get_model("nomic-embed-text"), kind="ivf", quantization="int8")
+    small = build_vectorstore(docs, get_model("nomic-embed-text"), reduction="matryoshka", reduced_dims=256)
+    retriever = vectorstore.as_retriever(search_kwargs={"k": 2, "nprobe": 16, "rerank": 8})
+    hnsw_retriever = hnsw_store.as_retriever(search_kwargs={"k": 2, "ef_search": 128})
+
+    # many questions at once: one FAISS search over the whole query matrix
+    hits = vectorstore.similarity_search_with_score_by_vectors(embeddings.embed_documents(questions), k=2)
+
+The defaults for kind, quantization, reduction and reduced_dims come from the RAG_INDEX,
+RAG_QUANTIZATION, RAG_REDUCTION and RAG_REDUCED_DIMS environment variables.
+annsweep.py measures recall@k against flat search for a range of nprobe / ef_search
+values; quantbench.py measures memory saved against recall lost per quantization, and
+dimbench.py speed against recall per reduced dimension.
+"""
+import math
+import operator
+import os
+import tempfile
+import threading
+import weakref
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+# --- 1. Configuration ---
+INDEX_KIND = os.environ.get("RAG_INDEX", "flat")
+QUANTIZATION = os.environ.get("RAG_QUANTIZATION") or None
+REDUCTION = os.environ.get("RAG_REDUCTION") or None
+REDUCED_DIMS = int(os.environ.get("RAG_REDUCED_DIMS", 256))
+DEFAULT_NPROBE = 8
+DEFAULT_EF_SEARCH = 64
+HNSW_M = 32                  # graph neighbours per node
+HNSW_EF_CONSTRUCTION = 200
+MIN_POINTS_PER_LIST = 39     # FAISS warns when k-means has fewer training points per centroid
+TRAIN_POINTS_PER_LIST = 256  # training sample size per inverted list
+PQ_DIMS_PER_CODE = 8         # dimensions per 1-byte PQ code
+PQ_MIN_TRAIN = 39 * 256      # each PQ sub-quantizer has 256 centroids to train
+RERANK_FACTOR = 4            # candidates fetched per result for exact re-ranking
+PCA_TRAIN_POINTS = 65536     # sample the PCA is fitted on
+
+
+# --- 2. Index Factory ---
+def ivf_nlist(n: int) -> int:
+    """~4*sqrt(n) inverted lists, but never fewer than MIN_POINTS_PER_LIST vectors per list."""
+    return min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_LIST)
+
+
+def pq_subquantizers(d: int) -> int:
+    """Number of 1-byte PQ codes: about d / PQ_DIMS_PER_CODE, and a divisor of d."""
+    m = max(1, d // PQ_DIMS_PER_CODE)
+    while d % m:
+        m -= 1
+    return m
+
+
+def _encoding(d: int, n: int, quantization) -> str:
+    """FAISS factory code for how each vector is stored."""
+    if quantization == "pq" and n < PQ_MIN_TRAIN:
+        quantization = "int8"  # too few vectors to train the PQ codebooks
+    if quantization is None:
+        return "Flat"
+    if quantization == "pq":
+        return f"PQ{pq_subquantizers(d)}"
+    codes = {"fp16": "SQfp16", "int8": "SQ8"}
+    if quantization not in codes:
+        raise ValueError(f"Unknown quantization {quantization!r}; use None, 'fp16', 'int8' or 'pq'")
+    return codes[quantization]
+
+
+def create_index(vectors: np.ndarray, kind: str = INDEX_KIND, quantization=QUANTIZATION, seed: int = 0,
+                 reduction=REDUCTION, reduced_dims: int = REDUCED_DIMS):
+    """An empty (but trained, if needed) FAISS index for `vectors`."""
+    n, d = vectors.shape
+    if reduction is not None and reduced_dims < d and n > reduced_dims:
+        return _reduced_index(vectors, kind, quantization, seed, reduction, reduced_dims)
+    encoding = _encoding(d, n, quantization)
+    nlist = ivf_nlist(n)
+    if kind == "ivf" and nlist < 2:
+        kind = "flat"  # too few vectors to cluster; exact search is cheap at this size anyway
+    if kind == "ivf":
+        key = f"IVF{nlist},{encoding}"
+    elif kind == "hnsw":
+        key = f"HNSW{HNSW_M}" if encoding == "Flat" else f"HNSW{HNSW_M}_{encoding}"
+    elif kind == "flat":
+        key = encoding
+    else:
+        raise ValueError(f"Unknown index kind {kind!r}; use 'flat', 'ivf' or 'hnsw'")
+
+    index = faiss.index_factory(d, key)
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, max(nlist * TRAIN_POINTS_PER_LIST, PQ_MIN_TRAIN * 4))
+        index.train(np.ascontiguousarray(vectors[rng.choice(n, sample_size, replace=False)]))
+    if kind == "ivf":
+        faiss.extract_index_ivf(index).nprobe = DEFAULT_NPROBE
+    if kind == "hnsw":
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = DEFAULT_EF_SEARCH
+    return index
+
+
+def _reduced_index(vectors: np.ndarray, kind: str, quantization, seed: int, reduction: str, dims: int):
+    """`kind` index over `dims`-dimensional projections, behind the projection itself."""
+    n, d = vectors.shape
+    if reduction == "pca":
+        rng = np.random.default_rng(seed)
+        pca = faiss.PCAMatrix(d, dims)
+        pca.train(np.ascontiguousarray(vectors[rng.choice(n, min(n, PCA_TRAIN_POINTS), replace=False)]))
+        transforms = [pca]
+    elif reduction == "matryoshka":
+        transforms = [faiss.RemapDimensionsTransform(d, dims, False), faiss.NormalizationTransform(dims)]
+    else:
+        raise ValueError(f"Unknown reduction {reduction!r}; use None, 'pca' or 'matryoshka'")
+    reduced = np.ascontiguousarray(vectors, dtype=np.float32)
+    for transform in transforms:
+        reduced = transform.apply(reduced)
+    index = faiss.IndexPreTransform(transforms[-1], create_index(reduced, kind, quantization, seed, reduction=None))
+    for transform in reversed(transforms[:-1]):
+        index.prepend_transform(transform)
+    return index
+
+
+def base_index(index):
+    """The index behind a dimension reduction (or `index` itself)."""
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexPreTransform) else index
+
+
+def is_quantized(index) -> bool:
+    """False for indexes that store the float32 vectors themselves."""
+    return not isinstance(base_index(index), (faiss.IndexFlat, faiss.IndexIVFFlat, faiss.IndexHNSWFlat))
+
+
+def needs_rerank(index) -> bool:
+    """Whether the index's distances are approximate (quantized or dimension-reduced)."""
+    return is_quantized(index) or isinstance(index, faiss.IndexPreTransform)
+
+
+def rerank(queries: np.ndarray, candidates: np.ndarray, exact_vectors, k: int):
+    """Exact L2 distances for each query's candidate ids; returns the top-k (D, I) like index.search."""
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for row, (query, found) in enumerate(zip(queries, candidates)):
+        found = np.unique(found[found >= 0])  # sorted: memmap reads in file order
+        if not len(found):
+            continue
+        d = ((np.asarray(exact_vectors[found], dtype=np.float32) - query) ** 2).sum(axis=1)
+        best = np.argsort(d)[:k]
+        distances[row, :len(best)] = d[best]
+        ids[row, :len(best)] = found[best]
+    return distances, ids
+
+
+def search_params(index, nprobe=None, ef_search=None):
+    """FAISS SearchParameters for one query, or None to use the index defaults."""
+    base = base_index(index)
+    params = None
+    if nprobe is not None and faiss.try_extract_index_ivf(base) is not None:
+        params = faiss.SearchParametersIVF(nprobe=nprobe)
+    elif ef_search is not None and isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(efSearch=ef_search)
+    if params is not None and base is not index:
+        wrapped = faiss.SearchParametersPreTransform()
+        wrapped.index_params = params
+        wrapped.referenced_objects = [params]  # keep the inner params alive
+        params = wrapped
+    return params
+
+
+# --- 3. Vector Store ---
+_local = threading.local()
+
+
+def _enable_search_params(index, get_exact_vectors=lambda: None, rerank_factor: int = RERANK_FACTOR):
+    """
+    Lets index.search pick up the calling thread's per-query parameters and, given the
+    exact vectors (`get_exact_vectors()`, current at each search), re-rank a larger
+    candidate set with exact distances.
+    """
+    search = index.search
+
+    def search_with_params(x, k, **kwargs):
+        params = getattr(_local, "params", None)
+        if params is not None:
+            kwargs["params"] = params
+        factor = getattr(_local, "rerank", None) or rerank_factor
+        exact_vectors = get_exact_vectors()
+        if exact_vectors is None or factor <= 1:
+            return search(x, k, **kwargs)
+        _, candidates = search(x, k * factor, **kwargs)
+        return rerank(x, candidates, exact_vectors, k)
+
+    index.search = search_with_params
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # already gone, or still mapped elsewhere (Windows)
+
+
+class TunableFAISS(FAISS):
+    """
+    LangChain FAISS store that accepts nprobe / ef_search / rerank in search_kwargs.
+    add_texts / add_embeddings / delete keep `exact_vectors` row-aligned with the index,
+    rewriting them to `exact_path` - or to a temporary file the store owns and removes
+    when it is garbage collected.
+    """
+
+    def __init__(self, *args, exact_vectors=None, rerank_factor: int = RERANK_FACTOR, exact_path=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact_vectors = exact_vectors
+        self.exact_path = exact_path
+        self._remove_exact = None  # finalizer of the temporary file, if the store wrote one
+        store = weakref.ref(self)  # the patched index.search must not keep the store alive
+        _enable_search_params(self.index, lambda: getattr(store(), "exact_vectors", None), rerank_factor)
+
+    # --- Keeping the exact vectors in sync ---
+    def _replace_exact_vectors(self, vectors: np.ndarray):
+        path = self.exact_path
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="rag-vectors-", suffix=".npy")
+            os.close(fd)
+        self.exact_vectors = save_exact_vectors(vectors, path)
+        previous = self._remove_exact
+        self._remove_exact = weakref.finalize(self, _remove_file, path) if self.exact_path is None else None
+        if previous is not None:
+            previous()
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        text_embeddings = list(text_embeddings)
+        added = super().add_embeddings(text_embeddings, metadatas=metadatas, ids=ids, **kwargs)
+        if self.exact_vectors is not None:
+            vectors = np.asarray([vector for _, vector in text_embeddings], dtype=np.float32)
+            if self._normalize_L2:
+                faiss.normalize_L2(vectors)
+            self._replace_exact_vectors(np.concatenate([np.asarray(self.exact_vectors), vectors]))
+        return added
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(zip(texts, self._embed_documents(texts)), metadatas=metadatas, ids=ids, **kwargs)
+
+    def delete(self, ids=None, **kwargs):
+        rows = {docstore_id: row for row, docstore_id in self.index_to_docstore_id.items()}
+        deleted = super().delete(ids, **kwargs)
+        if self.exact_vectors is not None:
+            self._replace_exact_vectors(np.delete(np.asarray(self.exact_vectors), [rows[i] for i in ids], axis=0))
+        return deleted
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20,
+                                               nprobe=None, ef_search=None, rerank=None, **kwargs):
+        _local.params = search_params(self.index, nprobe, ef_search)
+        _local.rerank = rerank
+        try:
+            return super().similarity_search_with_score_by_vector(embedding, k, filter, fetch_k, **kwargs)
+        finally:
+            _local.params = _local.rerank = None
+
+    def similarity_search_with_score_by_vectors(self, embeddings, k=4, filter=None, fetch_k=20,
+                                                nprobe=None, ef_search=None, rerank=None, score_threshold=None,
+                                                **kwargs) -> list:
+        """
+        similarity_search_with_score_by_vector for many queries in one index.search call,
+        with the same filter / score_threshold handling.
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.index.d)
+        if self._normalize_L2:
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        _local.params = search_params(self.index, nprobe, ef_search)
+        _local.rerank = rerank
+        try:
+            scores, indices = self.index.search(vectors, k if filter is None else fetch_k)
+        finally:
+            _local.params = _local.rerank = None
+        keep = self._create_filter_func(filter) if filter is not None else None
+        # Similarities must reach the threshold, distances stay below it (as in FAISS.similarity_search_*).
+        higher_is_closer = self.distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+        within = operator.ge if higher_is_closer else operator.le
+        results = []
+        for row_scores, row_ids in zip(scores, indices):
+            docs = []
+            for score, i in zip(row_scores, row_ids):
+                if i == -1:
+                    continue
+                doc = self.docstore.search(self.index_to_docstore_id[i])
+                if keep is None or keep(doc.metadata):
+                    docs.append((doc, float(score)))
+            if score_threshold is not None:
+                docs = [(doc, score) for doc, score in docs if within(score, score_threshold)]
+            results.append(docs[:k])
+        return results
+
+
+def save_exact_vectors(vectors: np.ndarray, path: str):
+    """
+    Writes float32 vectors to the .npy file `path` and memory-maps it read-only. The file
+    is replaced, not rewritten, so existing maps of an older version stay valid.
+    """
+    staging = f"{path}.writing"
+    with open(staging, "wb") as f:
+        np.save(f, np.asarray(vectors, dtype=np.float32))
+    os.replace(staging, path)
+    return np.load(path, mmap_mode="r")
+
+
+def build_vectorstore(docs, embeddings, kind: str = INDEX_KIND, quantization=QUANTIZATION,
+                      exact_path=None, docstore=None, reduction=REDUCTION, reduced_dims: int = REDUCED_DIMS) -> TunableFAISS:
+    """
+    FAISS.from_documents, but with the index chosen by `kind` ("flat", "ivf" or "hnsw"),
+    vectors stored as `quantization` (None, "fp16", "int8" or "pq") and searched in
+    `reduced_dims` dimensions with `reduction` (None, "pca" or "matryoshka"). Quantized and
+    reduced stores keep the exact vectors for re-ranking memory-mapped at `exact_path`
+    (a temporary file by default). `docstore` (e.g. a diskdocstore.SQLiteDocstore)
+    replaces the InMemoryDocstore.
+    """
+    docs = list(docs)
+    vectors = embeddings.embed_documents([doc.page_content for doc in docs])
+    return build_from_vectors(docs, vectors, embeddings, kind, quantization, exact_path, docstore,
+                              reduction, reduced_dims)
+
+
+def build_from_vectors(docs, vectors, embeddings, kind: str = INDEX_KIND, quantization=QUANTIZATION,
+                       exact_path=None, docstore=None, reduction=REDUCTION, reduced_dims: int = REDUCED_DIMS) -> TunableFAISS:
+    """build_vectorstore() for documents that are already embedded."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    index = create_index(vectors, kind, quantization, reduction=reduction, reduced_dims=reduced_dims)
+    # Starts empty; add_embeddings() writes the exact vectors along with the index rows.
+    exact = np.empty((0, vectors.shape[1]), dtype=np.float32) if needs_rerank(index) else None
+    store = TunableFAISS(embeddings, index, docstore if docstore is not None else InMemoryDocstore(), {},
+                         exact_vectors=exact, exact_path=exact_path)
+    store.add_embeddings(zip([doc.page_content for doc in docs], vectors), metadatas=[doc.metadata for doc in docs])
+    return store
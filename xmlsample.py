@@ -4,6 +4,8 @@ from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from langchain_core.output_parsers import XMLOutputParser
+from outputrepair import repair_stats, repairing
+from streamingxml import iter_xml_tags
 
 # 1. Define the desired output structure using Pydantic
 class Recipe(BaseModel):
@@ -25,7 +27,8 @@ prompt = ChatPromptTemplate.from_messages(
 ).partial(format_instructions=parser.get_format_instructions())
 
 # 4. Create the Chain and Invoke
-structured_chain = prompt | ollama_model | parser
+# Unclosed tags, stray prose or a bare "&" are repaired locally (outputrepair.py) instead of re-asking
+structured_chain = prompt | ollama_model | repairing(parser)
 
 user_input = "Tell me about a quick recipe for scrambled eggs. It should take about 5 minutes."
 
@@ -33,4 +36,11 @@ print("--- Structured Output Chain Result ---")
 # The result will be a Pydantic object (or a dict if the parser is omitted)
 recipe_object = structured_chain.invoke({"user_input": user_input})
 
-print(recipe_object)
\ No newline at end of file
+print(recipe_object)
+print("Local repair:", repair_stats.report())
+
+# 5. Stream it: each tag's value is printed as soon as the tag closes, and the generation
+# is stopped once all three have closed instead of waiting for the model's closing remarks.
+print("\n--- Streaming XML Tags ---")
+for tag, value in iter_xml_tags((prompt | ollama_model).stream({"user_input": user_input}), parser.tags):
+    print(f"{tag}: {value}")
\ No newline at end of file